@@ -0,0 +1,346 @@
+# async_server.py
+import asyncio
+import logging
+import threading
+import time
+
+import jinja2
+from aiohttp import web
+
+from frame_store import FRAME_STORE
+from mosaic import MOSAIC
+from metrics import REGISTRY
+from stream_clients import STREAM_CLIENTS, STREAM_STALL_TIMEOUT, client_limits, tune_socket
+from web_server import (
+    HOST, PORT, INDEX_HTML, KEEPALIVE_INTERVAL,
+    get_nocam_jpeg, get_variant_jpeg, stream_preset, mjpeg_part,
+    snapshot_response, frame_etag, etag_seq, etag_matches, snapshot_wait_timeout,
+    apply_url_list, publish_shutdown_placeholders, stats_payload, ready_payload, mosaic_layout,
+    cams_payload, cam_payload, health_payload,
+    camera_ids, camera_exists, add_camera, update_camera, delete_camera,
+    parse_time, history_snapshot_response, replay_range, replay_frames,
+)
+
+# ----------------------------------------------------------------------
+# Пробуждение корутин при публикации кадра (из потоков захвата)
+# ----------------------------------------------------------------------
+class FrameNotifier:
+    def __init__(self, loop):
+        self.loop = loop
+        self.events = {}
+        FRAME_STORE.add_listener(self._on_publish)
+
+    def close(self):
+        FRAME_STORE.remove_listener(self._on_publish)
+
+    def _on_publish(self, cam_id, frame):
+        try:
+            self.loop.call_soon_threadsafe(self._wake, cam_id)
+        except RuntimeError:
+            pass  # цикл событий уже закрыт
+
+    def _wake(self, cam_id):
+        event = self.events.pop(cam_id, None)
+        if event:
+            event.set()
+
+    async def wait(self, cam_id, timeout):
+        event = self.events.get(cam_id)
+        if event is None:
+            event = self.events[cam_id] = asyncio.Event()
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+NOTIFIER = web.AppKey("notifier", FrameNotifier)
+STOP = web.AppKey("stop", asyncio.Event)
+
+# ----------------------------------------------------------------------
+# Маршруты
+# ----------------------------------------------------------------------
+INDEX_TEMPLATE = jinja2.Template(INDEX_HTML)
+
+async def index(request):
+    return web.Response(text=INDEX_TEMPLATE.render(request=request, cams=camera_ids()), content_type="text/html")
+
+async def latest_jpeg(cam_id, frame, preset=None):
+    if preset is None and frame.jpeg is not None:
+        return frame.jpeg
+    # Кодирование/перекодирование — в пуле потоков, цикл событий не блокируется
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, get_variant_jpeg, cam_id, frame, preset)
+
+async def mjpeg_stream(request):
+    cam_id = int(request.match_info['cam_id'])
+    if not camera_exists(cam_id):
+        return web.Response(text="Камера не найдена", status=404)
+    limits = client_limits(request.query)
+    if limits is None:
+        return web.Response(text="Неверные fps/kbps", status=400)
+    return await stream_frames(request, cam_id, limits)
+
+async def mosaic_stream(request):
+    layout = mosaic_layout(request.query)
+    if layout is None:
+        return web.Response(text="Неверный список камер", status=400)
+    limits = client_limits(request.query)
+    if limits is None:
+        return web.Response(text="Неверные fps/kbps", status=400)
+    key = MOSAIC.ensure(*layout)
+    if key is None:
+        return web.Response(text="Слишком много мозаик, попробуйте позже", status=503)
+    return await stream_frames(request, key, limits)
+
+async def stream_frames(request, cam_id, limits=None):
+    response = web.StreamResponse(headers={
+        'Content-Type': 'multipart/x-mixed-replace; boundary=frame',
+        'Cache-Control': 'no-cache',
+    })
+    await response.prepare(request)
+    if request.transport is not None:
+        # Таймаут записи — через wait_for ниже, сокет остаётся неблокирующим
+        tune_socket(request.transport.get_extra_info('socket'), blocking_timeout=False)
+
+    notifier = request.app[NOTIFIER]
+    preset = stream_preset(request.query)
+    client = STREAM_CLIENTS.register(cam_id, request.remote, limits)
+    reason = None
+    FRAME_STORE.add_viewer(cam_id)
+    try:
+        last_seq = 0
+        jpeg_data = None
+        frame = FRAME_STORE.get(cam_id)
+
+        while True:
+            if frame is not None:
+                last_seq = frame.seq
+                new_jpeg = await latest_jpeg(cam_id, frame, preset)
+                if new_jpeg:
+                    jpeg_data = new_jpeg
+            else:
+                # frame is None после таймаута — keep-alive: повторяем последний кадр
+                client.caught_up()
+                if jpeg_data is None:
+                    # Кадров ещё нет — отдаём заглушку
+                    jpeg_data = get_nocam_jpeg()
+
+            # Самый свежий кадр — промежуточные пропускаются
+            if jpeg_data:
+                part = mjpeg_part(jpeg_data, cam_id)
+                started = time.time()
+                try:
+                    await asyncio.wait_for(response.write(part), STREAM_STALL_TIMEOUT)
+                except asyncio.TimeoutError:
+                    reason = "stall"
+                    break
+                client.record(frame, len(part), started)
+                if client.stalled():
+                    reason = "lag"
+                    break
+
+            # Лимит кадров/с и полосы клиента
+            delay = client.delay()
+            if delay:
+                await asyncio.sleep(delay)
+
+            frame = FRAME_STORE.get(cam_id)
+            if frame is None or frame.seq <= last_seq:
+                await notifier.wait(cam_id, KEEPALIVE_INTERVAL)
+                frame = FRAME_STORE.get(cam_id)
+                if frame is not None and frame.seq <= last_seq:
+                    frame = None
+    except (ConnectionResetError, asyncio.CancelledError):
+        pass
+    finally:
+        FRAME_STORE.remove_viewer(cam_id)
+        STREAM_CLIENTS.unregister(client, reason)
+    if reason and request.transport is not None:
+        # Недоставленные кадры в буфере не нужны — соединение рвём сразу
+        request.transport.abort()
+    return response
+
+async def snapshot(request):
+    cam_id = int(request.match_info['cam_id'])
+    if not camera_exists(cam_id):
+        return web.Response(text="Камера не найдена", status=404)
+
+    if request.query.get('at'):
+        try:
+            at = parse_time(request.query.get('at'))
+        except ValueError:
+            return web.Response(text="Неверный параметр at", status=400)
+        loop = asyncio.get_running_loop()
+        code, headers, body = await loop.run_in_executor(
+            None, history_snapshot_response, cam_id, at, stream_preset(request.query))
+        return web.Response(body=body, status=code, headers=headers)
+
+    frame = FRAME_STORE.get(cam_id)
+    wait_etag = request.query.get('wait_newer_than')
+    if wait_etag is not None:
+        # Long-poll: ждём кадр новее указанного ETag
+        seq = etag_seq(cam_id, wait_etag)
+        if frame is None or frame.seq <= seq:
+            await request.app[NOTIFIER].wait(cam_id, snapshot_wait_timeout(request.query.get('timeout')))
+            frame = FRAME_STORE.get(cam_id)
+
+    # Таймаут long-poll без нового кадра — тоже 304
+    if_none_match = ", ".join(filter(None, [request.headers.get('If-None-Match'), wait_etag]))
+    preset = stream_preset(request.query)
+    if frame is not None and not etag_matches(if_none_match, frame_etag(cam_id, frame, preset)):
+        # Прогреваем кэш в пуле потоков — snapshot_response возьмёт готовые байты
+        await latest_jpeg(cam_id, frame, preset)
+    code, headers, body = snapshot_response(cam_id, frame, if_none_match, preset)
+    return web.Response(body=body, status=code, headers=headers)
+
+async def replay(request):
+    cam_id = int(request.match_info['cam_id'])
+    replay_args = replay_range(request.query)
+    if replay_args is None:
+        return web.Response(text="Неверные параметры from/to/speed", status=400)
+    start, end, speed = replay_args
+    frames = replay_frames(cam_id, start, end, speed, stream_preset(request.query))
+    # next() и close() генератора — из разных потоков пула: close ждёт незавершённый next,
+    # иначе «generator already executing» и сегмент остаётся открытым
+    frames_lock = threading.Lock()
+
+    def next_frame():
+        with frames_lock:
+            return next(frames, None)
+
+    def close_frames():
+        with frames_lock:
+            frames.close()
+
+    # Чтение сегментов и перекодирование — в пуле потоков
+    loop = asyncio.get_running_loop()
+    item = await loop.run_in_executor(None, next_frame)
+    if item is None:
+        return web.Response(text="Нет записи за этот период", status=404)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'multipart/x-mixed-replace; boundary=frame',
+        'Cache-Control': 'no-cache',
+    })
+    await response.prepare(request)
+    try:
+        while item is not None:
+            delay, part = item
+            if delay:
+                await asyncio.sleep(delay)
+            await response.write(part)
+            item = await loop.run_in_executor(None, next_frame)
+    except (ConnectionResetError, asyncio.CancelledError):
+        pass
+    finally:
+        await loop.run_in_executor(None, close_frames)
+    return response
+
+async def set_urls(request):
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    try:
+        payload, code = apply_url_list(data)
+    except Exception as e:
+        payload, code = {"error": str(e)}, 500
+    return web.json_response(payload, status=code)
+
+async def list_cams(request):
+    return web.json_response(cams_payload())
+
+async def get_cam(request):
+    payload, code = cam_payload(int(request.match_info['cam_id']))
+    return web.json_response(payload, status=code)
+
+async def post_cam(request):
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    payload, code = add_camera(data)
+    return web.json_response(payload, status=code)
+
+async def put_cam(request):
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    payload, code = update_camera(int(request.match_info['cam_id']), data)
+    return web.json_response(payload, status=code)
+
+async def del_cam(request):
+    payload, code = delete_camera(int(request.match_info['cam_id']))
+    return web.json_response(payload, status=code)
+
+async def stats(request):
+    return web.json_response(stats_payload())
+
+async def health(request):
+    return web.json_response(health_payload())
+
+async def ready(request):
+    payload, code = ready_payload()
+    return web.json_response(payload, status=code)
+
+async def metrics(request):
+    body = await asyncio.get_running_loop().run_in_executor(None, REGISTRY.render)
+    return web.Response(text=body, content_type="text/plain", charset="utf-8")
+
+async def shutdown(request):
+    publish_shutdown_placeholders()
+
+    # Даём потокам отправить кадр
+    await asyncio.sleep(2)
+
+    asyncio.get_running_loop().call_later(0.5, request.app[STOP].set)
+    return web.Response(text="Сервер завершается...")
+
+def create_app():
+    app = web.Application()
+    app.router.add_get('/', index)
+    app.router.add_get(r'/stream/cam{cam_id:\d+}', mjpeg_stream)
+    app.router.add_get('/stream/mosaic', mosaic_stream)
+    app.router.add_get(r'/replay/cam{cam_id:\d+}', replay)
+    app.router.add_get(r'/snapshot/cam{cam_id:\d+}', snapshot)
+    app.router.add_post('/api/set_urls', set_urls)
+    app.router.add_get('/api/cams', list_cams)
+    app.router.add_post('/api/cams', post_cam)
+    app.router.add_get(r'/api/cams/{cam_id:\d+}', get_cam)
+    app.router.add_put(r'/api/cams/{cam_id:\d+}', put_cam)
+    app.router.add_delete(r'/api/cams/{cam_id:\d+}', del_cam)
+    app.router.add_get('/api/stats', stats)
+    app.router.add_get('/api/health', health)
+    app.router.add_get('/ready', ready)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/shutdown', shutdown)
+    return app
+
+# ----------------------------------------------------------------------
+# Запуск
+# ----------------------------------------------------------------------
+async def serve(host=HOST, port=PORT):
+    app = create_app()
+    app[NOTIFIER] = FrameNotifier(asyncio.get_running_loop())
+    app[STOP] = asyncio.Event()
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, backlog=1024, shutdown_timeout=1)
+    await site.start()
+    try:
+        await app[STOP].wait()
+    finally:
+        app[NOTIFIER].close()
+        await runner.cleanup()
+
+def run_async_server():
+    print(f"[WEB] async-сервер (aiohttp): http://localhost:{PORT}/stream/cam<N>")
+    print(f"[WEB] API: POST http://localhost:{PORT}/api/set_urls")
+    print(f"[WEB] Завершение: http://localhost:{PORT}/shutdown")
+    try:
+        asyncio.run(serve())
+    except Exception as e:
+        logging.error(f"async-сервер остановлен с ошибкой: {e}")
@@ -0,0 +1,189 @@
+# bench/capture_bench.py
+# Захват без портала камер: локальная страница с той же структурой
+# (#ModalBodyPlayer -> <iframe> -> <video>), реальный BrowserDriver + FrameCapture.
+# Отчёт: кадров/с, задержка по этапам, CPU и RSS (сервер + Chrome) для 1..N камер.
+#
+#   python bench/capture_bench.py --cams 1 3 9 --duration 20
+#
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# ----------------------------------------------------------------------
+# Страница-заменитель: видео из canvas.captureStream(), без сети и файлов
+# ----------------------------------------------------------------------
+PAGE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="UTF-8"><title>bench</title>
+<style>body { margin:0; background:#000; } #ModalBodyPlayer { position:absolute; left:100px; top:60px; }
+iframe { width:1600px; height:900px; border:0; }</style></head>
+<body><div id="ModalBodyPlayer"><iframe src="/player"></iframe></div></body></html>
+"""
+
+PLAYER_HTML = """<!DOCTYPE html>
+<html><head><meta charset="UTF-8">
+<style>body { margin:0; background:#000; } video { width:100%; height:100%; }</style></head>
+<body><video autoplay muted playsinline></video>
+<script>
+var canvas = document.createElement("canvas");
+canvas.width = 1280; canvas.height = 720;
+var ctx = canvas.getContext("2d");
+var n = 0;
+function draw() {
+    // Движущиеся полосы и шум — кадр проходит проверки яркости, детализации и «заморозки»
+    n++;
+    for (var i = 0; i < 16; i++) {
+        ctx.fillStyle = "hsl(" + ((i * 23 + n * 3) % 360) + ",70%," + (25 + (i * 7 + n) % 40) + "%)";
+        ctx.fillRect(i * 80, 0, 80, 720);
+    }
+    for (var j = 0; j < 400; j++) {
+        ctx.fillStyle = "rgba(255,255,255," + Math.random().toFixed(2) + ")";
+        ctx.fillRect(Math.random() * 1280, Math.random() * 720, 6, 6);
+    }
+    ctx.fillStyle = "#fff"; ctx.font = "48px monospace";
+    ctx.fillText(new Date().toISOString(), 40, 680);
+}
+setInterval(draw, 40);
+draw();
+document.querySelector("video").srcObject = canvas.captureStream(25);
+</script></body></html>
+"""
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = PLAYER_HTML if self.path.startswith("/player") else PAGE_HTML
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def start_stand_in(port):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ----------------------------------------------------------------------
+# Замер
+# ----------------------------------------------------------------------
+def tree_usage(proc):
+    # RSS и суммарное CPU-время процесса и всех потомков (Chrome, chromedriver)
+    procs = [proc]
+    try:
+        procs += proc.children(recursive=True)
+    except psutil.Error:
+        pass
+    rss = cpu = 0.0
+    for p in procs:
+        try:
+            rss += p.memory_info().rss
+            times = p.cpu_times()
+            cpu += times.user + times.system
+        except psutil.Error:
+            continue
+    return rss, cpu
+
+def stage_latency(cams):
+    # Средняя задержка этапа по гистограмме из metrics.py
+    from metrics import CAPTURE_STAGE_SECONDS
+    totals = {}
+    wanted = {str(c) for c in cams}
+    for name, key, _, value in CAPTURE_STAGE_SECONDS.samples():
+        cam, stage = key
+        if str(cam) not in wanted:
+            continue
+        if name.endswith("_sum"):
+            totals.setdefault(stage, [0.0, 0])[0] += value
+        elif name.endswith("_count"):
+            totals.setdefault(stage, [0.0, 0])[1] += value
+    return {stage: s / c * 1000 for stage, (s, c) in totals.items() if c}
+
+def run(cam_count, port, duration, interval):
+    import main as camserver
+    from metrics import CAPTURE_FRAMES
+
+    base = 100 * cam_count  # свои номера камер на каждый прогон — метрики не смешиваются
+    cams = [base + i for i in range(1, cam_count + 1)]
+    url = f"http://127.0.0.1:{port}/#bench"
+
+    with ThreadPoolExecutor(max_workers=cam_count) as pool:
+        drivers = list(pool.map(lambda cam: camserver.BrowserDriver(url, cam), cams))
+    captures = [camserver.FrameCapture(d, cam) for d, cam in zip(drivers, cams)]
+    try:
+        if not all(d.driver for d in drivers):
+            print(f"  {cam_count} камер: страница не загрузилась")
+            return None
+        time.sleep(2)  # видео запустилось
+
+        proc = psutil.Process()
+        _, cpu_before = tree_usage(proc)
+        started = time.time()
+        stop = threading.Event()
+
+        def loop(capture):
+            while not stop.is_set():
+                t = time.time()
+                capture.capture()
+                stop.wait(max(0.0, interval - (time.time() - t)))
+
+        threads = [threading.Thread(target=loop, args=(c,), daemon=True) for c in captures]
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        elapsed = time.time() - started
+        rss, cpu_after = tree_usage(proc)
+        live = sum(v for _, key, _, v in CAPTURE_FRAMES.samples() if int(key[0]) in cams and key[1] == "live")
+        failed = sum(v for _, key, _, v in CAPTURE_FRAMES.samples() if int(key[0]) in cams and key[1] == "failed")
+        return {
+            "cams": cam_count,
+            "fps": live / elapsed,
+            "failed": failed,
+            "cpu": (cpu_after - cpu_before) / elapsed * 100,
+            "rss": rss / 1024 / 1024,
+            "stages": stage_latency(cams),
+        }
+    finally:
+        for d in drivers:
+            d.quit()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cams", type=int, nargs="+", default=[1, 3, 9])
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--interval", type=float, default=0, help="пауза между кадрами камеры, сек (0 — максимум)")
+    args = parser.parse_args()
+
+    import main as camserver
+    camserver.SNAPSHOT_INTERVAL = 0  # диск не участвует в замере
+
+    start_stand_in(args.port)
+    stages = ("get_iframe_size", "capture_frame", "validate", "encode", "publish")
+    print(f"{'камеры':>6} {'кадр/с':>8} {'ошибки':>7} {'CPU, %':>7} {'RSS, МБ':>8}  " +
+          " ".join(f"{s[:12]:>12}" for s in stages) + "  (мс)")
+    for n in args.cams:
+        row = run(n, args.port, args.duration, args.interval)
+        if row is None:
+            continue
+        print(f"{row['cams']:>6} {row['fps']:>8.1f} {row['failed']:>7} {row['cpu']:>7.0f} {row['rss']:>8.0f}  " +
+              " ".join(f"{row['stages'].get(s, 0):>12.1f}" for s in stages))
+
+if __name__ == "__main__":
+    main()
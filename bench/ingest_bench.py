@@ -0,0 +1,253 @@
+# bench/ingest_bench.py
+# Прямой приём видеопотока без портала камер: локальный live-HLS (скользящий плейлист
+# из сегментов, закодированных PyAV), реальные StreamDriver + FrameCapture.
+# Отчёт: кадров потока/с, опубликовано кадров/с, кодирование JPEG, CPU; проверка,
+# что stop() закрывает подключение к серверу потока.
+#
+#   python bench/ingest_bench.py --duration 20
+#   python bench/ingest_bench.py --discover      # ещё и поиск адреса потока в Chrome (open_camera)
+#
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# ----------------------------------------------------------------------
+# Сегменты HLS: движущиеся полосы и шум — кадр проходит проверки яркости, детализации и «заморозки»
+# ----------------------------------------------------------------------
+def make_segments(folder, seconds, fps, size=(1280, 720)):
+    import av
+    from PIL import Image, ImageDraw
+    out = av.open(os.path.join(folder, "index.m3u8"), "w", format="hls",
+                  options={"hls_time": "1", "hls_list_size": "0", "hls_segment_filename": os.path.join(folder, "seg%d.ts")})
+    stream = out.add_stream("libx264" if "libx264" in av.codecs_available else "mpeg4", rate=fps)
+    stream.width, stream.height = size
+    stream.pix_fmt = "yuv420p"
+    stream.gop_size = fps   # ключевой кадр раз в секунду — сегменты по hls_time, а не по GOP кодека
+    if stream.codec_context.name == "libx264":
+        stream.options = {"preset": "ultrafast"}
+    noise = [Image.effect_noise(size, 30 + i * 10).convert("RGB") for i in range(5)]
+    for n in range(int(seconds * fps)):
+        img = noise[n % len(noise)].copy()
+        draw = ImageDraw.Draw(img)
+        for i in range(16):
+            x = (i * 80 + n * 8) % size[0]
+            draw.rectangle((x, 0, x + 40, size[1]), fill=((i * 40 + n) % 256, (i * 15) % 256, 200 - i * 10))
+        for packet in stream.encode(av.VideoFrame.from_image(img)):
+            out.mux(packet)
+    for packet in stream.encode():
+        out.mux(packet)
+    out.close()
+    # (файл, длительность) из плейлиста, который записал муксер
+    with open(os.path.join(folder, "index.m3u8")) as f:
+        text = f.read()
+    return [(name, float(duration)) for duration, name in re.findall(r"#EXTINF:([\d.]+),\s*\n(\S+)", text)]
+
+# ----------------------------------------------------------------------
+# Сервер-заменитель: живой плейлист (последние сегменты к текущему моменту), страница портала
+# ----------------------------------------------------------------------
+PAGE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="UTF-8"><title>bench</title></head>
+<body><div id="ModalBodyPlayer"><iframe src="/player" width="1280" height="720"></iframe></div></body></html>
+"""
+
+PLAYER_HTML = """<!DOCTYPE html>
+<html><head><meta charset="UTF-8"></head>
+<body><video autoplay muted playsinline src="/live.m3u8"></video></body></html>
+"""
+
+LIVE_WINDOW = 4     # сегментов в живом плейлисте
+
+class StandIn:
+    def __init__(self, folder, segments):
+        self.folder = folder
+        self.segments = segments
+        self.started = time.time()
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def playlist(self):
+        # Сегменты, «снятые» к этому моменту; без #EXT-X-ENDLIST — ffmpeg перечитывает плейлист
+        elapsed = time.time() - self.started
+        ready, end = 0, 0.0
+        for _, duration in self.segments:
+            end += duration
+            if end > elapsed:
+                break
+            ready += 1
+        first = max(0, ready - LIVE_WINDOW)
+        target = max(1, round(max(d for _, d in self.segments)))
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{target}", f"#EXT-X-MEDIA-SEQUENCE:{first}"]
+        for name, duration in self.segments[first:ready]:
+            lines += [f"#EXTINF:{duration:.3f},", name]
+        return "\n".join(lines) + "\n"
+
+
+def make_handler(stand_in):
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, как у настоящего сервера потока
+
+        def setup(self):
+            super().setup()
+            with stand_in.lock:
+                stand_in.connections += 1
+
+        def handle(self):
+            try:
+                super().handle()
+            except (ConnectionResetError, BrokenPipeError):
+                pass    # ffmpeg закрыл keep-alive подключение
+
+        def finish(self):
+            try:
+                super().finish()
+            finally:
+                with stand_in.lock:
+                    stand_in.connections -= 1
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/live.m3u8":
+                self._send(stand_in.playlist().encode(), "application/vnd.apple.mpegurl")
+            elif path.endswith(".ts") and os.path.basename(path) in {n for n, _ in stand_in.segments}:
+                with open(os.path.join(stand_in.folder, os.path.basename(path)), "rb") as f:
+                    self._send(f.read(), "video/mp2t")
+            elif path.startswith("/player"):
+                self._send(PLAYER_HTML.encode(), "text/html; charset=utf-8")
+            else:
+                self._send(PAGE_HTML.encode(), "text/html; charset=utf-8")
+
+        def _send(self, data, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+    return StandInHandler
+
+def start_stand_in(port, stand_in):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stand_in))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ----------------------------------------------------------------------
+# Замер
+# ----------------------------------------------------------------------
+def encode_latency(path):
+    # Среднее кодирование JPEG, мс, по гистограмме из metrics.py
+    from metrics import JPEG_ENCODE_SECONDS
+    totals = [0.0, 0]
+    for name, key, _, value in JPEG_ENCODE_SECONDS.samples():
+        if key[0] != path:
+            continue
+        if name.endswith("_sum"):
+            totals[0] += value
+        elif name.endswith("_count"):
+            totals[1] += value
+    return totals[0] / totals[1] * 1000 if totals[1] else 0.0
+
+def run(driver, cam, duration, interval, stand_in):
+    import main as camserver
+    from metrics import CAPTURE_FRAMES
+
+    capture = camserver.FrameCapture(driver, cam)
+    # ffmpeg начинает живой поток с нескольких сегментов назад и декодирует их сразу — в замер не входит
+    time.sleep(LIVE_WINDOW)
+    proc = psutil.Process()
+    cpu_before = sum(proc.cpu_times()[:2])
+    seq_before = driver.driver.seq
+    started = time.time()
+    while time.time() - started < duration:
+        t = time.time()
+        capture.capture()
+        time.sleep(max(0.0, interval - (time.time() - t)))
+    elapsed = time.time() - started
+    live = sum(v for _, key, _, v in CAPTURE_FRAMES.samples() if int(key[0]) == cam and key[1] == "live")
+    failed = sum(v for _, key, _, v in CAPTURE_FRAMES.samples() if int(key[0]) == cam and key[1] == "failed")
+    decoded = driver.driver.seq - seq_before
+
+    # stop() ждёт поток чтения: после quit() подключений к серверу потока не остаётся
+    reader = driver.driver
+    stop_started = time.time()
+    driver.quit()
+    stop_time = time.time() - stop_started
+    time.sleep(0.5)
+    return {
+        "decoded_fps": decoded / elapsed,
+        "published_fps": live / elapsed,
+        "failed": failed,
+        "encode_ms": encode_latency("ingest"),
+        "cpu": (sum(proc.cpu_times()[:2]) - cpu_before) / elapsed * 100,
+        "stop_s": stop_time,
+        "reader_alive": reader._thread.is_alive(),
+        "container_open": reader.container is not None,
+        "connections": stand_in.connections,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=5078)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--fps", type=int, default=25, help="кадров/с в потоке-заменителе")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="шаг захвата, сек (по умолчанию STREAM_CAPTURE_INTERVAL из main.py)")
+    parser.add_argument("--discover", action="store_true", help="адрес потока ищет Chrome (open_camera)")
+    args = parser.parse_args()
+
+    import main as camserver
+    import stream_ingest
+    from stream_ingest import StreamDriver, MediaSource
+    if not stream_ingest.available():
+        print("PyAV не установлен (pip install av)")
+        return 1
+    camserver.SNAPSHOT_INTERVAL = 0  # диск не участвует в замере
+    camserver.WARM_POOL_SIZE = 0
+    interval = args.interval if args.interval is not None else (camserver.STREAM_CAPTURE_INTERVAL or camserver.CAPTURE_INTERVAL)
+
+    folder = tempfile.mkdtemp(prefix="ingest_bench_")
+    print(f"Кодирование сегментов ({args.duration + 15:.0f} сек, {args.fps} кадр/с)...")
+    segments = make_segments(folder, args.duration + 15, args.fps)
+    stand_in = StandIn(folder, segments)
+    start_stand_in(args.port, stand_in)
+    time.sleep(segments[0][1] * 2)  # в живом плейлисте есть хотя бы пара сегментов
+
+    page = f"http://127.0.0.1:{args.port}/#bench"
+    cam = 1
+    if args.discover:
+        driver = camserver.open_camera(page, cam)
+        if not isinstance(driver, StreamDriver):
+            print("Chrome не нашёл адрес потока — камера осталась на скриншотах")
+            driver.quit()
+            return 1
+        print(f"Адрес потока найден: {driver.source.url}")
+    else:
+        driver = StreamDriver(page, cam, MediaSource(f"http://127.0.0.1:{args.port}/live.m3u8", referer=page))
+        if not driver.driver:
+            print("Поток не открылся")
+            return 1
+
+    row = run(driver, cam, args.duration, interval, stand_in)
+    print(f"{'поток, кадр/с':>14} {'опубл., кадр/с':>15} {'ошибки':>7} {'JPEG, мс':>9} {'CPU, %':>7}   (шаг {interval} сек)")
+    print(f"{row['decoded_fps']:>14.1f} {row['published_fps']:>15.1f} {row['failed']:>7.0f} "
+          f"{row['encode_ms']:>9.1f} {row['cpu']:>7.0f}")
+    print(f"stop(): {row['stop_s']:.2f} сек, поток чтения {'жив' if row['reader_alive'] else 'завершён'}, "
+          f"контейнер {'открыт' if row['container_open'] else 'закрыт'}, подключений к серверу: {row['connections']}")
+    ok = row["published_fps"] > 0 and not row["reader_alive"] and not row["container_open"] and row["connections"] == 0
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
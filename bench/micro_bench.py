@@ -0,0 +1,102 @@
+# bench/micro_bench.py
+# Микробенчмарки горячих функций (без Chrome и сети):
+# is_image_black, load_and_convert_to_jpeg, generate_mjpeg.
+#
+#   python bench/micro_bench.py --repeat 5
+#
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image
+
+def make_image(size=(1788, 1080), noise=60):
+    return Image.effect_noise(size, noise).convert("RGB")
+
+def encode(img, fmt, **params):
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **params)
+    return buf.getvalue()
+
+def measure(func, number, repeat):
+    # Лучшее и медиана из repeat прогонов по number вызовов, мс на вызов
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - started) / number * 1000)
+    return min(runs), statistics.median(runs)
+
+# ----------------------------------------------------------------------
+# Сценарии
+# ----------------------------------------------------------------------
+def bench_is_image_black(number, repeat):
+    from main import is_image_black
+    rows = []
+    for name, img in (("шум 1788x1080", make_image()), ("чёрный 1788x1080", Image.new("RGB", (1788, 1080)))):
+        rows.append((f"is_image_black [{name}]",) + measure(lambda: is_image_black(img), number, repeat))
+    return rows
+
+def bench_load_and_convert(number, repeat):
+    import web_server
+    img = make_image()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, params in (("PNG", {}), ("JPEG", {"quality": 90})):
+            path = os.path.join(tmp, f"frame.{fmt.lower()}")
+            with open(path, "wb") as f:
+                f.write(encode(img, fmt, **params))
+            rows.append((f"load_and_convert_to_jpeg [{fmt}]",) +
+                        measure(lambda: web_server.load_and_convert_to_jpeg(path), number, repeat))
+    return rows
+
+def bench_generate_mjpeg(number, repeat, clients=(1, 10)):
+    # Публикация кадра -> части MJPEG у всех клиентов; мс на кадр
+    import web_server
+    from frame_store import FRAME_STORE
+    jpeg = encode(make_image(), "JPEG", quality=80)
+    png = encode(make_image(), "PNG")
+    rows = []
+    for label, data in (("JPEG", jpeg), ("PNG", png)):
+        for count in clients:
+            cam_id = f"bench-{label}-{count}"
+            FRAME_STORE.publish(cam_id, data)
+            gens = [web_server.generate_mjpeg(cam_id) for _ in range(count)]
+            for g in gens:
+                next(g)
+
+            def one_frame():
+                FRAME_STORE.publish(cam_id, data)
+                threads = [threading.Thread(target=next, args=(g,)) for g in gens]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+
+            rows.append((f"generate_mjpeg [{label}, клиентов {count}]",) + measure(one_frame, number, repeat))
+            for g in gens:
+                g.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20, help="вызовов в одном прогоне")
+    parser.add_argument("--repeat", type=int, default=5, help="прогонов")
+    args = parser.parse_args()
+
+    print(f"{'сценарий':48} {'лучший, мс':>11} {'медиана, мс':>12}")
+    for bench in (bench_is_image_black, bench_load_and_convert, bench_generate_mjpeg):
+        for name, best, median in bench(args.number, args.repeat):
+            print(f"{name:48} {best:>11.2f} {median:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# bench/stream_compare.py
+# Сравнение Flask (поток на клиента) и async-сервера (корутина на клиента):
+# память на соединение и число клиентов, стабильно получающих кадры.
+#
+#   python bench/stream_compare.py --clients 25 100 300
+#
+import argparse
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# ----------------------------------------------------------------------
+# Сервер с синтетическими кадрами (запускается в отдельном процессе)
+# ----------------------------------------------------------------------
+def make_frames(count=4, size=(1280, 720)):
+    from PIL import Image
+    frames = []
+    for i in range(count):
+        img = Image.effect_noise(size, 40 + i * 10).convert("RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=80)
+        frames.append(buf.getvalue())
+    return frames
+
+def publisher(cams, fps):
+    from frame_store import FRAME_STORE
+    frames = make_frames()
+    n = 0
+    while True:
+        for cam_id in range(1, cams + 1):
+            FRAME_STORE.publish(cam_id, frames[n % len(frames)])
+        n += 1
+        time.sleep(1.0 / fps)
+
+def serve(backend, port, cams, fps):
+    import web_server
+    threading.Thread(target=publisher, args=(cams, fps), daemon=True).start()
+    if backend == "async":
+        import async_server
+        asyncio.run(async_server.serve("127.0.0.1", port))
+    else:
+        web_server.app.run(host="127.0.0.1", port=port, threaded=True, use_reloader=False)
+
+# ----------------------------------------------------------------------
+# Клиенты
+# ----------------------------------------------------------------------
+async def client(port, cam_id, counts, index, stop):
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET /stream/cam{cam_id} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        while not stop.is_set():
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            counts[index] += chunk.count(b"--frame\r\n")
+        writer.close()
+    except Exception:
+        pass
+
+async def measure(port, clients, cams, window, fps, proc):
+    counts = [0] * clients
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(client(port, i % cams + 1, counts, i, stop)) for i in range(clients)]
+
+    await asyncio.sleep(3)  # прогрев: все подключились
+    before = list(counts)
+    await asyncio.sleep(window)
+    after = list(counts)
+
+    rss = proc.memory_info().rss
+    threads = proc.num_threads()
+    stop.set()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    expected = window * fps
+    sustained = sum(1 for b, a in zip(before, after) if a - b >= expected * 0.5)
+    return rss, threads, sustained
+
+def run_backend(backend, port, client_counts, cams, fps, window):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", backend, "--port", str(port),
+         "--cams", str(cams), "--fps", str(fps)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        time.sleep(3)
+        ps = psutil.Process(proc.pid)
+        base_rss = ps.memory_info().rss
+        rows = []
+        for n in client_counts:
+            rss, threads, sustained = asyncio.run(measure(port, n, cams, window, fps, ps))
+            per_conn = (rss - base_rss) / n / 1024
+            rows.append((backend, n, sustained, threads, rss / 1024 / 1024, per_conn))
+            time.sleep(2)
+        return rows
+    finally:
+        proc.kill()
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", choices=["flask", "async"])
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--cams", type=int, default=9)
+    parser.add_argument("--fps", type=float, default=2)
+    parser.add_argument("--window", type=float, default=10)
+    parser.add_argument("--clients", type=int, nargs="+", default=[25, 100, 300])
+    parser.add_argument("--backends", nargs="+", default=["flask", "async"])
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.cams, args.fps)
+        return
+
+    print(f"{'сервер':8} {'клиенты':>8} {'стабильно':>10} {'потоки':>7} {'RSS, МБ':>9} {'КБ/соед.':>9}")
+    for i, backend in enumerate(args.backends):
+        for row in run_backend(backend, args.port + i, args.clients, args.cams, args.fps, args.window):
+            print(f"{row[0]:8} {row[1]:>8} {row[2]:>10} {row[3]:>7} {row[4]:>9.1f} {row[5]:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# browser_pool.py
+import os
+import sys
+import time
+import logging
+import threading
+
+import psutil
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+
+from metrics import REGISTRY
+
+# ----------------------------------------------------------------------
+# Запуск Chrome
+# ----------------------------------------------------------------------
+def create_chrome(shared=False):
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    if shared:
+        # Фоновые вкладки не должны замораживать видео
+        chrome_options.add_argument("--disable-background-timer-throttling")
+        chrome_options.add_argument("--disable-backgrounding-occluded-windows")
+        chrome_options.add_argument("--disable-renderer-backgrounding")
+        # get() не блокирует сессию на время загрузки — ожидание в BrowserDriver._wait_for
+        chrome_options.page_load_strategy = "none"
+    chromedriver_path = os.path.join(sys._MEIPASS, "chromedriver.exe") if getattr(sys, 'frozen', False) else "chromedriver.exe"
+    service = Service(executable_path=chromedriver_path)
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+# ----------------------------------------------------------------------
+# Общий Chrome: несколько камер во вкладках одного процесса
+# ----------------------------------------------------------------------
+class SharedBrowser:
+    def __init__(self):
+        self.driver = create_chrome(shared=True)
+        self.lock = threading.RLock()
+        self.handles = set()
+        self.current = self.driver.current_window_handle
+        self.blank = self.current  # стартовая вкладка, отдаётся первой камере
+
+class BrowserPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._browsers = []
+
+    def acquire(self, per_browser):
+        with self._lock:
+            browser = next((b for b in self._browsers if len(b.handles) < per_browser), None)
+            if browser is None:
+                browser = SharedBrowser()
+                self._browsers.append(browser)
+                logging.info(f"Пул браузеров: запущен Chrome #{len(self._browsers)}")
+            with browser.lock:
+                if browser.blank:
+                    handle, browser.blank = browser.blank, None
+                else:
+                    browser.driver.switch_to.new_window('tab')
+                    handle = browser.current = browser.driver.current_window_handle
+                browser.handles.add(handle)
+            return browser, handle
+
+    def release(self, browser, handle):
+        with self._lock:
+            with browser.lock:
+                browser.handles.discard(handle)
+                if browser.handles:
+                    try:
+                        browser.driver.switch_to.window(handle)
+                        browser.driver.close()
+                        browser.current = None
+                    except Exception as e:
+                        logging.warning(f"Пул браузеров: не удалось закрыть вкладку: {e}")
+                    return
+            self._browsers.remove(browser)
+            try:
+                browser.driver.quit()
+            except:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return [len(b.handles) for b in self._browsers]
+
+BROWSER_POOL = BrowserPool()
+
+# ----------------------------------------------------------------------
+# Тёплый резерв: заранее запущенные Chrome для быстрого перезапуска камер
+# ----------------------------------------------------------------------
+class WarmPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = []
+        self._wanted = threading.Event()
+        self._thread = None
+        self.size = 0
+        self.warm_url = None
+        self.launched = 0
+        self.taken = 0
+        self.misses = 0
+
+    def start(self, size, warm_url=None):
+        self.size = size
+        self.warm_url = warm_url
+        if size > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._replenish, daemon=True, name="warm-pool")
+            self._thread.start()
+
+    def take(self):
+        with self._lock:
+            if self._ready:
+                self.taken += 1
+                driver = self._ready.pop(0)
+            else:
+                if self.size:
+                    self.misses += 1
+                driver = None
+        self._wanted.set()
+        return driver
+
+    def _replenish(self):
+        while True:
+            with self._lock:
+                missing = self.size - len(self._ready)
+            if missing <= 0:
+                self._wanted.wait(30)
+                self._wanted.clear()
+                continue
+
+            try:
+                driver = create_chrome()
+                # Прогрев: страница портала в кэше, следующая загрузка камеры быстрее
+                if self.warm_url:
+                    driver.get(self.warm_url)
+            except Exception as e:
+                logging.error(f"Тёплый резерв: не удалось запустить Chrome: {e}")
+                time.sleep(30)
+                continue
+
+            with self._lock:
+                self._ready.append(driver)
+                self.launched += 1
+
+    def shutdown(self):
+        with self._lock:
+            drivers, self._ready = self._ready, []
+            self.size = 0
+        for driver in drivers:
+            try:
+                driver.quit()
+            except:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "ready": len(self._ready),
+                "launched": self.launched,
+                "taken": self.taken,
+                "misses": self.misses,
+            }
+
+WARM_POOL = WarmPool()
+
+# ----------------------------------------------------------------------
+# Память Chrome: все дочерние процессы chrome/chromedriver этого сервера
+# ----------------------------------------------------------------------
+def browser_rss():
+    total = {}
+    try:
+        children = psutil.Process().children(recursive=True)
+    except psutil.Error:
+        return total
+    for proc in children:
+        try:
+            name = proc.name().lower()
+            if "chrome" not in name:
+                continue
+            kind = "chromedriver" if "chromedriver" in name else "chrome"
+            total[kind] = total.get(kind, 0) + proc.memory_info().rss
+        except psutil.Error:
+            continue
+    return total
+
+REGISTRY.gauge("camserver_browser_rss_bytes", "RSS процессов Chrome и chromedriver", ("process",), browser_rss)
+REGISTRY.gauge("camserver_warm_pool_ready", "Готовых Chrome в тёплом резерве", (),
+               lambda: {(): len(WARM_POOL._ready)})
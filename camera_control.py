@@ -0,0 +1,235 @@
+# camera_control.py
+import itertools
+import math
+import threading
+import time
+from queue import Queue, Empty
+
+# ----------------------------------------------------------------------
+# Настройки камеры (url.yaml / API): интервал захвата, качество JPEG, обрезка,
+# очередность запуска (меньше — раньше)
+# ----------------------------------------------------------------------
+SETTINGS_KEYS = ("interval", "quality", "crop", "priority")
+
+def normalize_settings(data):
+    # {ключ: значение} без None; ValueError — неверное значение
+    settings = {}
+    for key in SETTINGS_KEYS:
+        value = data.get(key) if data else None
+        if value is None:
+            continue
+        # Только конечные числа: NaN/inf ломают планировщик, JSON-ответ и url.yaml;
+        # списки и словари из JSON — тоже ValueError (ответ 400)
+        try:
+            if isinstance(value, bool) or not math.isfinite(float(value)):
+                raise ValueError
+            value = float(value) if key == "interval" else int(value)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"{key}: ожидается число") from None
+        if key == "interval":
+            if value <= 0:
+                raise ValueError("interval должен быть больше 0")
+        elif key == "quality":
+            if not 1 <= value <= 100:
+                raise ValueError("quality должен быть от 1 до 100")
+        elif key == "crop":
+            if value < 0:
+                raise ValueError("crop не может быть отрицательным")
+        settings[key] = value
+    return settings
+
+# ----------------------------------------------------------------------
+# Команды смены URL: отдельный почтовый ящик на каждую камеру
+# ----------------------------------------------------------------------
+class UrlCommand:
+    __slots__ = ('id', 'cam_id', 'url', 'status', 'error', 'created', 'applied_at', 'live_at')
+
+    def __init__(self, command_id, cam_id, url):
+        self.id = command_id
+        self.cam_id = cam_id
+        self.url = url
+        self.status = "pending"  # pending -> applying -> applied -> live | failed | superseded
+        self.error = None
+        self.created = time.time()
+        self.applied_at = None
+        self.live_at = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "cam": self.cam_id,
+            "url": self.url,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "applied_at": self.applied_at,
+            "live_at": self.live_at,
+        }
+
+
+class CameraControl:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._mailboxes = {}
+        self._urls = {}
+        self._last_command = {}
+        self._first_frame = {}
+        self._health = {}
+        self._settings = {}
+        self._next_id = 1
+        self.on_command = None  # вызывается с cam_id после постановки команды (пробуждение планировщика)
+        self.on_add = None      # (cam_id, url) — камера добавлена через API, запустить захват
+        self.on_remove = None   # cam_id — камера удалена, остановить захват
+        self.on_update = None   # command — статус команды изменился (процесс захвата -> веб-процесс)
+        self.on_settings = None  # (cam_id, settings) — изменились настройки камеры
+        self.on_config_change = None  # без аргументов — камеры/URL/настройки изменились (запись url.yaml)
+
+    def _changed(self):
+        if self.on_config_change:
+            self.on_config_change()
+
+    def register(self, cam_id, url, settings=None):
+        with self._lock:
+            self._register(cam_id, url, settings)
+
+    def _register(self, cam_id, url, settings):
+        self._mailboxes.setdefault(cam_id, Queue())
+        self._urls[cam_id] = url
+        self._settings[cam_id] = dict(settings or {})
+        # Номер удалённой камеры не выдаётся повторно
+        self._next_id = max(self._next_id, cam_id + 1)
+
+    def add(self, url, cam_id=None, settings=None):
+        # Выбор номера и регистрация — под одной блокировкой: параллельные добавления
+        # не получат один номер и не затрут почтовый ящик друг друга
+        with self._lock:
+            if cam_id is None:
+                cam_id = self._next_id
+            elif cam_id in self._urls:
+                raise ValueError(f"cam{cam_id} уже существует")
+            elif cam_id < 1:
+                raise ValueError("номер камеры должен быть больше 0")
+            self._register(cam_id, url, settings)
+        if self.on_add:
+            self.on_add(cam_id, url)
+        self._changed()
+        return cam_id
+
+    def remove(self, cam_id):
+        with self._lock:
+            if cam_id not in self._urls:
+                raise KeyError(cam_id)
+            del self._urls[cam_id]
+            mailbox = self._mailboxes.pop(cam_id)
+            self._last_command.pop(cam_id, None)
+            self._first_frame.pop(cam_id, None)
+            self._health.pop(cam_id, None)
+            self._settings.pop(cam_id, None)
+        # Непримененные команды больше не выполнятся
+        while True:
+            try:
+                self.update(mailbox.get_nowait(), "superseded")
+            except Empty:
+                break
+        if self.on_remove:
+            self.on_remove(cam_id)
+        self._changed()
+
+    def exists(self, cam_id):
+        with self._lock:
+            return cam_id in self._urls
+
+    def cameras(self):
+        with self._lock:
+            return sorted(self._urls)
+
+    def urls(self):
+        with self._lock:
+            return dict(self._urls)
+
+    def settings(self, cam_id=None):
+        with self._lock:
+            if cam_id is None:
+                return {c: dict(s) for c, s in self._settings.items()}
+            return dict(self._settings.get(cam_id, {}))
+
+    def set_settings(self, cam_id, settings):
+        settings = dict(settings)
+        with self._lock:
+            if cam_id not in self._urls:
+                raise KeyError(cam_id)
+            if self._settings.get(cam_id, {}) == settings:
+                return False
+            self._settings[cam_id] = settings
+        if self.on_settings:
+            self.on_settings(cam_id, settings)
+        self._changed()
+        return True
+
+    def set_url(self, cam_id, url):
+        with self._lock:
+            if cam_id not in self._mailboxes:
+                raise KeyError(cam_id)
+            # Без изменений — камеру не трогаем
+            if self._urls.get(cam_id) == url:
+                return None
+            self._urls[cam_id] = url
+            command = UrlCommand(next(self._ids), cam_id, url)
+            self._last_command[cam_id] = command
+            self._mailboxes[cam_id].put(command)
+        if self.on_command:
+            self.on_command(cam_id)
+        self._changed()
+        return command
+
+    def take(self, cam_id):
+        # Берём последнюю команду, предыдущие устарели
+        mailbox = self._mailboxes.get(cam_id)
+        command = None
+        while mailbox is not None:
+            try:
+                newer = mailbox.get_nowait()
+            except Empty:
+                break
+            if command is not None:
+                self.update(command, "superseded")
+            command = newer
+        return command
+
+    def update(self, command, status, error=None):
+        with self._lock:
+            command.status = status
+            command.error = error
+            if status == "applied":
+                command.applied_at = time.time()
+            elif status == "live":
+                command.live_at = time.time()
+        if self.on_update:
+            self.on_update(command)
+
+    def attach_health(self, cam_id, health):
+        with self._lock:
+            self._health[cam_id] = health
+
+    def report_first_frame(self, cam_id, seconds):
+        with self._lock:
+            self._first_frame[cam_id] = seconds
+
+    def status(self, cam_id):
+        with self._lock:
+            if cam_id not in self._urls:
+                return None
+            command = self._last_command.get(cam_id)
+            health = self._health.get(cam_id)
+            return {
+                "cam": cam_id,
+                "url": self._urls[cam_id],
+                "settings": dict(self._settings.get(cam_id, {})),
+                "command": command.to_dict() if command else None,
+                "time_to_first_frame": self._first_frame.get(cam_id),
+                "health": health.to_dict() if health else None,
+            }
+
+
+CAMERA_CONTROL = CameraControl()
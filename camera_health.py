@@ -0,0 +1,120 @@
+# camera_health.py
+import random
+import threading
+import time
+
+# ----------------------------------------------------------------------
+# Конфигурация
+# ----------------------------------------------------------------------
+DEGRADED_TOLERANCE = 2      # неудачных кадров подряд до перехода к переподключению
+RELOAD_BASE_DELAY = 2       # сек, первая пауза между перезагрузками
+RELOAD_MAX_DELAY = 120      # сек, потолок паузы
+RELOAD_JITTER = 0.3         # ±30% к паузе, чтобы камеры не перезагружались синхронно
+RECREATE_EVERY = 3          # каждая N-я попытка — полный перезапуск Chrome вместо перезагрузки
+OPEN_AFTER = 8              # столько неудачных попыток — цепь разомкнута
+OPEN_PROBE_INTERVAL = 300   # сек, пробное переподключение при разомкнутой цепи
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+RECONNECTING = "reconnecting"
+OPEN = "open"
+
+# ----------------------------------------------------------------------
+# Состояние камеры: healthy -> degraded -> reconnecting -> open
+# ----------------------------------------------------------------------
+class CameraHealth:
+    def __init__(self, cam_id):
+        self.cam_id = cam_id
+        self._lock = threading.Lock()
+        self.state = HEALTHY
+        self.failures = 0           # неудачных кадров подряд
+        self.attempts = 0           # попыток переподключения подряд
+        self.awaiting_capture = False
+        self.next_attempt = 0.0
+        self.last_error = None
+        self.changed_at = time.time()
+        self.reloads = 0
+        self.recreates = 0
+
+    def reset(self):
+        with self._lock:
+            self.failures = 0
+            self.attempts = 0
+            self.awaiting_capture = False
+            self.next_attempt = 0.0
+            self.last_error = None
+            self._set_state(HEALTHY)
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.changed_at = time.time()
+
+    def _backoff(self):
+        delay = min(RELOAD_MAX_DELAY, RELOAD_BASE_DELAY * 2 ** max(0, self.attempts - 1))
+        return delay * random.uniform(1 - RELOAD_JITTER, 1 + RELOAD_JITTER)
+
+    def action(self, now=None):
+        # "capture" | "wait" | "reload" | "recreate"
+        now = now or time.time()
+        with self._lock:
+            if self.state in (HEALTHY, DEGRADED) or self.awaiting_capture:
+                return "capture"
+            if now < self.next_attempt:
+                return "wait"
+            if self.state == OPEN or (self.attempts and self.attempts % RECREATE_EVERY == 0):
+                return "recreate"
+            return "reload"
+
+    def record_success(self):
+        with self._lock:
+            previous = self.state
+            self.failures = 0
+            self.attempts = 0
+            self.awaiting_capture = False
+            self.last_error = None
+            self._set_state(HEALTHY)
+            return previous
+
+    def record_failure(self, reason, now=None):
+        now = now or time.time()
+        with self._lock:
+            previous = self.state
+            self.failures += 1
+            self.last_error = reason
+            self.awaiting_capture = False
+
+            if self.state in (HEALTHY, DEGRADED):
+                if self.failures >= DEGRADED_TOLERANCE:
+                    self._set_state(RECONNECTING)
+                    self.next_attempt = now
+                else:
+                    self._set_state(DEGRADED)
+            elif self.attempts >= OPEN_AFTER:
+                self._set_state(OPEN)
+                self.next_attempt = now + OPEN_PROBE_INTERVAL * random.uniform(1 - RELOAD_JITTER, 1 + RELOAD_JITTER)
+            else:
+                self.next_attempt = now + self._backoff()
+            return previous
+
+    def record_attempt(self, kind):
+        with self._lock:
+            self.attempts += 1
+            self.awaiting_capture = True
+            if kind == "reload":
+                self.reloads += 1
+            else:
+                self.recreates += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "since": self.changed_at,
+                "failures": self.failures,
+                "attempts": self.attempts,
+                "next_attempt": self.next_attempt if self.state in (RECONNECTING, OPEN) else None,
+                "last_error": self.last_error,
+                "reloads": self.reloads,
+                "recreates": self.recreates,
+            }
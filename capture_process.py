@@ -0,0 +1,466 @@
+# capture_process.py
+import logging
+import multiprocessing as mp
+import queue
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from frame_store import FRAME_STORE
+from camera_control import CAMERA_CONTROL
+
+# ----------------------------------------------------------------------
+# Конфигурация
+# ----------------------------------------------------------------------
+RING_SLOTS = 3                      # кадров в кольце камеры
+RING_SLOT_BYTES = 4 * 1024 * 1024   # максимум на кадр; больше — кадр пропускается
+STATUS_INTERVAL = 1.0               # сек, отчёт процесса захвата (здоровье, частота)
+RESTART_BASE_DELAY = 2              # сек, пауза перед перезапуском упавшего процесса
+RESTART_MAX_DELAY = 60
+STABLE_AFTER = 60                   # сек работы — счётчик падений подряд сбрасывается
+
+KINDS = ("live", "nocam", "noconnect")
+
+# ----------------------------------------------------------------------
+# Кольцевой буфер кадров камеры в общей памяти
+# ----------------------------------------------------------------------
+# Заголовок: последний записанный seq, зрителей (пишет веб-процесс)
+# Слот:      seq, timestamp, длина, тип кадра + данные
+_HEADER = struct.Struct("<QI")
+_SLOT = struct.Struct("<QdIB")
+
+class RingFrame:
+    __slots__ = ('seq', 'timestamp', 'kind', 'data')
+
+    def __init__(self, seq, timestamp, kind, data):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.kind = kind
+        self.data = data
+
+
+class FrameRing:
+    SIZE = _HEADER.size + RING_SLOTS * (_SLOT.size + RING_SLOT_BYTES)
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.name = shm.name
+        self.buf = shm.buf
+
+    @classmethod
+    def create(cls):
+        shm = shared_memory.SharedMemory(create=True, size=cls.SIZE)
+        _HEADER.pack_into(shm.buf, 0, 0, 0)
+        for slot in range(RING_SLOTS):
+            _SLOT.pack_into(shm.buf, cls._offset(slot), 0, 0.0, 0, 0)
+        return cls(shm, True)
+
+    @classmethod
+    def attach(cls, name):
+        # Памятью владеет веб-процесс; resource_tracker у процессов захвата общий с ним (spawn)
+        return cls(shared_memory.SharedMemory(name=name), False)
+
+    @staticmethod
+    def _offset(slot):
+        return _HEADER.size + slot * (_SLOT.size + RING_SLOT_BYTES)
+
+    def write(self, seq, timestamp, kind, data):
+        if len(data) > RING_SLOT_BYTES:
+            logging.warning(f"Кадр {len(data)} байт больше слота {RING_SLOT_BYTES}, пропущен")
+            return False
+        offset = self._offset(seq % RING_SLOTS)
+        # Слот помечается пустым на время записи — читатель не возьмёт половину кадра
+        _SLOT.pack_into(self.buf, offset, 0, 0.0, 0, 0)
+        start = offset + _SLOT.size
+        self.buf[start:start + len(data)] = data
+        _SLOT.pack_into(self.buf, offset, seq, timestamp, len(data),
+                        KINDS.index(kind) if kind in KINDS else 0)
+        struct.pack_into("<Q", self.buf, 0, seq)
+        return True
+
+    def latest(self):
+        return struct.unpack_from("<Q", self.buf, 0)[0]
+
+    def read(self, seq=None):
+        seq = seq or self.latest()
+        if not seq:
+            return None
+        offset = self._offset(seq % RING_SLOTS)
+        slot_seq, timestamp, length, kind = _SLOT.unpack_from(self.buf, offset)
+        if slot_seq != seq:
+            return None
+        start = offset + _SLOT.size
+        # Одно копирование в bytes кадра хранилища; без сериализации
+        data = bytes(self.buf[start:start + length])
+        if _SLOT.unpack_from(self.buf, offset)[0] != seq:
+            return None  # слот перезаписан во время чтения
+        return RingFrame(seq, timestamp, KINDS[kind] if kind < len(KINDS) else "live", data)
+
+    def viewers(self):
+        return struct.unpack_from("<I", self.buf, 8)[0]
+
+    def set_viewers(self, count):
+        struct.pack_into("<I", self.buf, 8, min(count, 0xFFFFFFFF))
+
+    def release(self):
+        self.buf = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception as e:
+            logging.warning(f"Кольцо {self.name}: ошибка освобождения: {e}")
+
+# ----------------------------------------------------------------------
+# Процесс захвата: команды из веб-процесса, кадры — в кольца
+# ----------------------------------------------------------------------
+WORKER_RINGS = {}
+
+def ring_viewers(cam_id):
+    ring = WORKER_RINGS.get(cam_id)
+    return ring.viewers() if ring else 0
+
+def run_worker(index, cameras, commands, events, scheduler, start_camera, stop_camera, apply_settings):
+    links = {}  # номер команды в процессе захвата -> номер команды веб-процесса
+
+    def on_publish(cam_id, frame):
+        ring = WORKER_RINGS.get(cam_id)
+        if ring is not None and ring.write(frame.seq, frame.timestamp, frame.kind, frame.data):
+            events.put(("frame", cam_id, frame.seq))
+
+    def on_update(command):
+        parent_id = links.get(command.id)
+        if parent_id is not None:
+            events.put(("command", parent_id, command.status, command.error))
+
+    def add(cam_id, url, ring_name, settings):
+        WORKER_RINGS[cam_id] = FrameRing.attach(ring_name)
+        CAMERA_CONTROL.register(cam_id, url, settings)
+        start_camera(scheduler, cam_id, url)
+
+    FRAME_STORE.add_listener(on_publish)
+    CAMERA_CONTROL.on_command = scheduler.wake
+    CAMERA_CONTROL.on_update = on_update
+    CAMERA_CONTROL.on_remove = lambda cam_id: stop_camera(scheduler, cam_id)
+    CAMERA_CONTROL.on_settings = lambda cam_id, settings: apply_settings(scheduler, cam_id, settings)
+    for cam_id, (url, ring_name, settings) in sorted(cameras.items()):
+        add(cam_id, url, ring_name, settings)
+    scheduler.start()
+    logging.info(f"Процесс захвата {index}: камеры {sorted(cameras)}")
+
+    parent = mp.parent_process()
+    last_status = 0
+    while parent is None or parent.is_alive():
+        try:
+            message = commands.get(timeout=STATUS_INTERVAL)
+        except queue.Empty:
+            message = None
+
+        if message:
+            op = message[0]
+            if op == "stop":
+                break
+            if op == "set_url":
+                _, cam_id, url, parent_id = message
+                try:
+                    command = CAMERA_CONTROL.set_url(cam_id, url)
+                except KeyError:
+                    command = None
+                if command is None:
+                    events.put(("command", parent_id, "applied", None))
+                else:
+                    links[command.id] = parent_id
+            elif op == "add":
+                add(*message[1:])
+            elif op == "settings":
+                try:
+                    CAMERA_CONTROL.set_settings(message[1], message[2])
+                except KeyError:
+                    pass
+            elif op == "remove":
+                try:
+                    CAMERA_CONTROL.remove(message[1])
+                except KeyError:
+                    pass
+                ring = WORKER_RINGS.pop(message[1], None)
+                if ring:
+                    # Шаг камеры мог ещё писать в кольцо — отображение закрываем с задержкой
+                    threading.Timer(5, ring.release).start()
+
+        now = time.time()
+        if now - last_status >= STATUS_INTERVAL:
+            last_status = now
+            status = {cam_id: CAMERA_CONTROL.status(cam_id) for cam_id in CAMERA_CONTROL.cameras()}
+            events.put(("status", status, scheduler.stats()))
+    logging.info(f"Процесс захвата {index}: остановлен")
+
+# ----------------------------------------------------------------------
+# Веб-процесс: запуск, наблюдение и перезапуск процессов захвата
+# ----------------------------------------------------------------------
+class RemoteHealth:
+    # Последнее состояние CameraHealth из процесса захвата (для CAMERA_CONTROL.status)
+    def __init__(self):
+        self.snapshot = None
+
+    def to_dict(self):
+        return self.snapshot
+
+
+class WorkerHandle:
+    def __init__(self, index):
+        self.index = index
+        self.cams = set()
+        self.process = None
+        self.commands = None
+        self.events = None
+        self.generation = 0
+        self.started = 0.0
+        self.restarts = 0
+        self.crashes = 0            # падений подряд (для паузы перезапуска)
+        self.restart_at = None
+        self.scheduler_stats = {}
+
+    def send(self, message):
+        try:
+            self.commands.put(message)
+        except Exception as e:
+            logging.warning(f"Процесс захвата {self.index}: команда не отправлена: {e}")
+
+
+class CaptureSupervisor:
+    def __init__(self, processes, target):
+        # target(index, cameras, commands, events) — функция процесса захвата (уровня модуля)
+        self.target = target
+        self.ctx = mp.get_context("spawn")
+        self.handles = [WorkerHandle(i) for i in range(processes)]
+        self.rings = {}
+        self.health = {}
+        self.commands = {}
+        self.published = {}
+        self.awaiting_live = {}     # cam_id -> команда, повторённая после перезапуска процесса
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    # === Камеры ===
+    def _assign(self, cam_id):
+        self.rings[cam_id] = FrameRing.create()
+        self.health[cam_id] = RemoteHealth()
+        CAMERA_CONTROL.attach_health(cam_id, self.health[cam_id])
+        handle = min(self.handles, key=lambda h: (len(h.cams), h.index))
+        handle.cams.add(cam_id)
+        return handle
+
+    def _owner(self, cam_id):
+        return next((h for h in self.handles if cam_id in h.cams), None)
+
+    def start(self, urls):
+        with self._lock:
+            for cam_id in sorted(urls):
+                self._assign(cam_id)
+            for handle in self.handles:
+                self._prepare(handle)
+        for handle in self.handles:
+            self._launch(handle)
+        threading.Thread(target=self._supervise, daemon=True, name="capture-supervisor").start()
+
+    def add_camera(self, cam_id, url):
+        with self._lock:
+            handle = self._assign(cam_id)
+            handle.send(("add", cam_id, url, self.rings[cam_id].name, CAMERA_CONTROL.settings(cam_id)))
+
+    def remove_camera(self, cam_id, placeholder=None):
+        with self._lock:
+            handle = self._owner(cam_id)
+            if handle:
+                handle.cams.discard(cam_id)
+                handle.send(("remove", cam_id))
+            ring = self.rings.pop(cam_id, None)
+            self.health.pop(cam_id, None)
+            self.published.pop(cam_id, None)
+            self.awaiting_live.pop(cam_id, None)
+        if placeholder:
+            placeholder(cam_id)
+        FRAME_STORE.discard(cam_id)
+        if ring:
+            # Читатель событий мог ещё не закончить чтение из кольца
+            threading.Timer(5, ring.release).start()
+
+    def forward_command(self, cam_id):
+        # CAMERA_CONTROL.on_command: команду веб-процесса выполняет процесс-владелец камеры
+        command = CAMERA_CONTROL.take(cam_id)
+        if command is None:
+            return
+        with self._lock:
+            handle = self._owner(cam_id)
+            self.commands[command.id] = command
+        if handle:
+            handle.send(("set_url", cam_id, command.url, command.id))
+
+    def forward_settings(self, cam_id, settings):
+        with self._lock:
+            handle = self._owner(cam_id)
+        if handle:
+            handle.send(("settings", cam_id, settings))
+
+    # === Процессы ===
+    def _prepare(self, handle):
+        # Под self._lock: новые очереди и актуальные URL/настройки камер процесса.
+        # Очередь команд не переиспользуется — упавший процесс мог оставить её блокировку занятой
+        handle.generation += 1
+        handle.commands = self.ctx.Queue()
+        handle.events = self.ctx.Queue()
+        urls = CAMERA_CONTROL.urls()
+        settings = CAMERA_CONTROL.settings()
+        cameras = {cam_id: (urls.get(cam_id), self.rings[cam_id].name, settings.get(cam_id, {}))
+                   for cam_id in handle.cams}
+        handle.process = self.ctx.Process(
+            target=self.target, args=(handle.index, cameras, handle.commands, handle.events),
+            daemon=True, name=f"capture-{handle.index}")
+        handle.started = time.time()
+        handle.restart_at = None
+        self._replay_commands(handle)
+
+    def _replay_commands(self, handle):
+        # Команды, не выполненные упавшим процессом: новый процесс сразу стартует с нужным URL,
+        # команда считается применённой и ждёт первого живого кадра
+        latest = {}
+        for command_id in sorted(self.commands):
+            command = self.commands[command_id]
+            if command.cam_id not in handle.cams:
+                continue
+            self.commands.pop(command_id)
+            if command.cam_id in latest:
+                CAMERA_CONTROL.update(latest[command.cam_id], "superseded")
+            latest[command.cam_id] = command
+        for cam_id, command in latest.items():
+            CAMERA_CONTROL.update(command, "applied")
+            if command.url:
+                self.awaiting_live[cam_id] = command
+
+    def _launch(self, handle):
+        # Без self._lock: запуск spawn-процесса долгий, команды и добавление камер не ждут
+        if self._stopping:
+            return
+        handle.process.start()
+        threading.Thread(target=self._read_events, args=(handle, handle.generation, handle.events),
+                         daemon=True, name=f"capture-events-{handle.index}").start()
+        logging.info(f"Процесс захвата {handle.index} запущен (PID {handle.process.pid}), камеры {sorted(handle.cams)}")
+
+    def _read_events(self, handle, generation, events):
+        while handle.generation == generation and not self._stopping:
+            try:
+                event = events.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            try:
+                self._handle_event(handle, event)
+            except Exception as e:
+                logging.error(f"Процесс захвата {handle.index}: ошибка обработки события: {e}")
+
+    def _handle_event(self, handle, event):
+        kind = event[0]
+        if kind == "frame":
+            cam_id = event[1]
+            ring = self.rings.get(cam_id)
+            if ring is None:
+                return
+            # События могли накопиться — берём самый свежий кадр кольца один раз
+            frame = ring.read()
+            if frame is None or (frame.seq, handle.generation) == self.published.get(cam_id):
+                return
+            self.published[cam_id] = (frame.seq, handle.generation)
+            FRAME_STORE.publish(cam_id, frame.data, kind=frame.kind)
+            if frame.kind == "live":
+                command = self.awaiting_live.pop(cam_id, None)
+                if command is not None:
+                    CAMERA_CONTROL.update(command, "live")
+        elif kind == "command":
+            _, command_id, status, error = event
+            command = self.commands.get(command_id)
+            if command is not None:
+                CAMERA_CONTROL.update(command, status, error)
+                if status in ("live", "failed", "superseded"):
+                    self.commands.pop(command_id, None)
+        elif kind == "log":
+            # Запись лога процесса захвата — в общую очередь, файл пишет один поток
+            logging.getLogger().handle(event[1])
+        elif kind == "status":
+            _, cams, scheduler_stats = event
+            handle.scheduler_stats = scheduler_stats
+            for cam_id, status in cams.items():
+                health = self.health.get(cam_id)
+                if health is None or status is None:
+                    continue
+                health.snapshot = status.get("health")
+                if status.get("time_to_first_frame") is not None:
+                    CAMERA_CONTROL.report_first_frame(cam_id, status["time_to_first_frame"])
+
+    def _supervise(self):
+        while not self._stopping:
+            respawn = []
+            with self._lock:
+                # Число зрителей — процессу захвата для выбора частоты
+                for cam_id, ring in self.rings.items():
+                    ring.set_viewers(FRAME_STORE.viewers(cam_id))
+
+                now = time.time()
+                for handle in self.handles:
+                    if handle.process.is_alive():
+                        if handle.crashes and now - handle.started >= STABLE_AFTER:
+                            handle.crashes = 0
+                        continue
+                    if handle.restart_at is None:
+                        handle.crashes += 1
+                        delay = min(RESTART_MAX_DELAY, RESTART_BASE_DELAY * 2 ** (handle.crashes - 1))
+                        handle.restart_at = now + delay
+                        handle.generation += 1  # старый читатель событий завершается
+                        logging.error(f"Процесс захвата {handle.index} завершился (код {handle.process.exitcode}), "
+                                      f"перезапуск через {delay} сек")
+                    elif now >= handle.restart_at:
+                        handle.restarts += 1
+                        self._prepare(handle)
+                        respawn.append(handle)
+            for handle in respawn:
+                self._launch(handle)
+            time.sleep(1)
+
+    def shutdown(self, timeout=10):
+        self._stopping = True
+        with self._lock:
+            handles = list(self.handles)
+        for handle in handles:
+            handle.send(("stop",))
+        deadline = time.time() + timeout
+        for handle in handles:
+            if handle.process.pid is None:
+                continue  # не успел запуститься
+            handle.process.join(max(0.1, deadline - time.time()))
+            if handle.process.is_alive():
+                handle.process.terminate()
+        for ring in list(self.rings.values()):
+            ring.release()
+        self.rings.clear()
+
+    def stats(self):
+        # Формат CaptureScheduler.stats() + состояние процессов
+        with self._lock:
+            cams = {}
+            busy = workers = 0
+            processes = []
+            for handle in self.handles:
+                stats = handle.scheduler_stats or {}
+                cams.update(stats.get("cams", {}))
+                busy += stats.get("busy", 0)
+                workers += stats.get("workers", 0)
+                processes.append({
+                    "index": handle.index,
+                    "pid": handle.process.pid if handle.process else None,
+                    "alive": bool(handle.process and handle.process.is_alive()),
+                    "cams": sorted(handle.cams),
+                    "restarts": handle.restarts,
+                })
+            return {"workers": workers, "busy": busy, "cams": cams, "processes": processes}
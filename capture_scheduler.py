@@ -0,0 +1,155 @@
+# capture_scheduler.py
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# ----------------------------------------------------------------------
+# Планировщик захвата: дедлайны, приоритет камер со зрителями, пул потоков
+# ----------------------------------------------------------------------
+class ScheduledCamera:
+    def __init__(self, cam_id, task, fps):
+        self.cam_id = cam_id
+        self.task = task
+        self.fps = fps              # None — частота по умолчанию (зависит от зрителей)
+        self.active_fps = None      # частота при зрителях, если источник даёт кадры чаще (видеопоток)
+        self.scheduled = None       # дедлайн последнего запуска
+        self.running = False
+        self.starts = deque(maxlen=30)
+        self.last_duration = 0.0
+        self.overruns = 0
+
+
+class CaptureScheduler:
+    def __init__(self, max_workers, active_fps, idle_fps, viewers=None):
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.viewers = viewers or (lambda cam_id: 0)
+        self._cams = {}
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="capture")
+        self._max_workers = max_workers
+        self._busy = 0
+        self._thread = None
+
+    def add(self, cam_id, task, fps=None):
+        with self._cond:
+            self._cams[cam_id] = ScheduledCamera(cam_id, task, fps)
+            self._cond.notify()
+
+    def set_fps(self, cam_id, fps):
+        # None — частота по умолчанию (зависит от зрителей)
+        with self._cond:
+            cam = self._cams.get(cam_id)
+            if cam:
+                cam.fps = fps
+            self._cond.notify()
+
+    def set_active_fps(self, cam_id, fps):
+        # None — общая active_fps; без зрителей камера всё равно снимается с idle_fps
+        with self._cond:
+            cam = self._cams.get(cam_id)
+            if cam:
+                cam.active_fps = fps
+            self._cond.notify()
+
+    def remove(self, cam_id):
+        with self._cond:
+            return self._cams.pop(cam_id, None)
+
+    def wait_idle(self, cam, timeout=None):
+        # Ждём завершения уже запущенной задачи снятой с расписания камеры
+        with self._cond:
+            return self._cond.wait_for(lambda: not cam.running, timeout)
+
+    def wake(self, cam_id):
+        # Внеочередной запуск (например, сменился URL)
+        with self._cond:
+            cam = self._cams.get(cam_id)
+            if cam:
+                cam.scheduled = None
+            self._cond.notify()
+
+    def target_fps(self, cam):
+        if cam.fps:
+            return cam.fps
+        if self.viewers(cam.cam_id) > 0:
+            return cam.active_fps or self.active_fps
+        return self.idle_fps
+
+    def _due(self, cam):
+        if cam.scheduled is None:
+            return 0
+        return cam.scheduled + 1.0 / self.target_fps(cam)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="capture-scheduler")
+        self._thread.start()
+        return self._thread
+
+    def _run(self):
+        with self._cond:
+            while True:
+                now = time.time()
+                idle = [c for c in self._cams.values() if not c.running]
+                due = [c for c in idle if self._due(c) <= now]
+
+                # Сначала камеры со зрителями, затем самые просроченные
+                due.sort(key=lambda c: (-self.viewers(c.cam_id), self._due(c)))
+                for cam in due[:self._max_workers - self._busy]:
+                    self._launch(cam, now)
+
+                # Просыпаемся к ближайшему дедлайну, по завершению задачи или wake()/add();
+                # не реже раза в секунду — частота зависит от числа зрителей
+                waiting = [self._due(c) for c in idle if not c.running]
+                timeout = 1.0
+                if waiting and self._busy < self._max_workers:
+                    timeout = min(timeout, max(0.01, min(waiting) - now))
+                self._cond.wait(timeout)
+
+    def _launch(self, cam, now):
+        due = self._due(cam)
+        period = 1.0 / self.target_fps(cam)
+        # Дедлайн без дрейфа; если отстали больше чем на период — не догоняем
+        cam.scheduled = due if due and now - due < period else now
+        if due and now - due >= period:
+            cam.overruns += 1
+        cam.running = True
+        cam.starts.append(now)
+        self._busy += 1
+        try:
+            self._pool.submit(self._execute, cam)
+        except RuntimeError:
+            # Пул закрыт — интерпретатор завершается
+            cam.running = False
+            self._busy -= 1
+
+    def _execute(self, cam):
+        started = time.time()
+        try:
+            cam.task()
+        except Exception as e:
+            logging.error(f"Планировщик: ошибка задачи cam{cam.cam_id}: {e}")
+        finally:
+            with self._cond:
+                cam.last_duration = time.time() - started
+                cam.running = False
+                self._busy -= 1
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            result = {}
+            for cam_id, cam in self._cams.items():
+                starts = list(cam.starts)
+                achieved = (len(starts) - 1) / (starts[-1] - starts[0]) if len(starts) > 1 and starts[-1] > starts[0] else 0.0
+                result[cam_id] = {
+                    "target_fps": round(self.target_fps(cam), 3),
+                    "achieved_fps": round(achieved, 3),
+                    "viewers": self.viewers(cam_id),
+                    "last_duration": round(cam.last_duration, 3),
+                    "overruns": cam.overruns,
+                    "running": cam.running,
+                }
+            return {"workers": self._max_workers, "busy": self._busy, "cams": result}
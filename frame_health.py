@@ -0,0 +1,67 @@
+# frame_health.py
+from PIL import Image, ImageChops, ImageStat
+
+# ----------------------------------------------------------------------
+# Пороги
+# ----------------------------------------------------------------------
+SAMPLE_SIZE = (160, 90)   # анализ идёт по уменьшенной копии кадра
+BLACK_LEVEL = 8           # макс. яркость не выше — кадр чёрный (ночная сцена светлее)
+MIN_ENTROPY = 1.0         # бит, ниже — однотонный кадр без деталей (серый/белый экран плеера)
+FROZEN_DIFF = 0.5         # средняя разница яркости с прошлым кадром ниже — кадр не изменился
+FROZEN_FRAMES = 30        # столько одинаковых кадров подряд — поток завис
+
+# ----------------------------------------------------------------------
+# Оценка кадра
+# ----------------------------------------------------------------------
+class FrameReport:
+    __slots__ = ('brightness', 'max_level', 'stddev', 'entropy', 'diff', 'same_count', 'reason')
+
+    def __init__(self, brightness, max_level, stddev, entropy, diff, same_count, reason):
+        self.brightness = brightness
+        self.max_level = max_level
+        self.stddev = stddev
+        self.entropy = entropy
+        self.diff = diff
+        self.same_count = same_count
+        self.reason = reason
+
+    @property
+    def ok(self):
+        return self.reason is None
+
+
+class FrameHealth:
+    def __init__(self, frozen_frames=FROZEN_FRAMES):
+        self.frozen_frames = frozen_frames
+        self.previous = None
+        self.same_count = 0
+
+    def reset(self):
+        self.previous = None
+        self.same_count = 0
+
+    def analyze(self, img):
+        # Один проход в C: уменьшение + яркость, дальше только статистика по гистограмме
+        if img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGB")
+        sample = img.resize(SAMPLE_SIZE, Image.BOX).convert("L")
+        stat = ImageStat.Stat(sample)
+        max_level = sample.getextrema()[1]
+        entropy = sample.entropy()
+
+        diff = None
+        if self.previous is not None:
+            diff = ImageStat.Stat(ImageChops.difference(sample, self.previous)).mean[0]
+            self.same_count = self.same_count + 1 if diff < FROZEN_DIFF else 0
+        self.previous = sample
+
+        if max_level <= BLACK_LEVEL:
+            reason = "black"
+        elif entropy < MIN_ENTROPY:
+            reason = "low-detail"
+        elif self.same_count >= self.frozen_frames:
+            reason = "frozen"
+        else:
+            reason = None
+
+        return FrameReport(stat.mean[0], max_level, stat.stddev[0], entropy, diff, self.same_count, reason)
@@ -0,0 +1,136 @@
+# frame_pipeline.py
+import io
+import threading
+import time
+
+from PIL import Image
+
+from frame_health import FrameHealth, SAMPLE_SIZE
+from metrics import CAPTURE_STAGE_SECONDS, JPEG_ENCODE_SECONDS, JPEG_BYTES
+
+# ----------------------------------------------------------------------
+# Конфигурация
+# ----------------------------------------------------------------------
+CROP_X = 66               # обрезка слева и справа (рамка плеера)
+OUTPUT_FORMAT = "JPEG"    # формат публикуемого кадра: "JPEG" — веб отдаёт без перекодирования, "PNG"
+OUTPUT_QUALITY = 80
+
+def sniff_format(data):
+    if data[:3] == b'\xff\xd8\xff':
+        return "JPEG"
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return "PNG"
+    return None
+
+# ----------------------------------------------------------------------
+# Счётчики декодирования/кодирования
+# ----------------------------------------------------------------------
+class PipelineCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.decodes = 0
+        self.encodes = 0
+        self.passthrough = 0
+
+    def add(self, decodes, encodes, passthrough):
+        with self._lock:
+            self.frames += 1
+            self.decodes += decodes
+            self.encodes += encodes
+            self.passthrough += passthrough
+
+    def to_dict(self):
+        with self._lock:
+            frames = self.frames or 1
+            return {
+                "frames": self.frames,
+                "decodes": self.decodes,
+                "encodes": self.encodes,
+                "passthrough": self.passthrough,
+                "decodes_per_frame": round(self.decodes / frames, 3),
+                "encodes_per_frame": round(self.encodes / frames, 3),
+            }
+
+
+PIPELINE_COUNTERS = {}
+
+def pipeline_stats():
+    return {cam_id: counters.to_dict() for cam_id, counters in list(PIPELINE_COUNTERS.items())}
+
+# ----------------------------------------------------------------------
+# Конвейер: байты захвата -> декодирование -> проверка -> обрезка -> кодирование
+# ----------------------------------------------------------------------
+class PipelineResult:
+    __slots__ = ('data', 'report', 'reason')
+
+    def __init__(self, data=None, report=None, reason=None):
+        self.data = data
+        self.report = report
+        self.reason = reason
+
+    @property
+    def ok(self):
+        return self.reason is None
+
+
+class FramePipeline:
+    def __init__(self, cam_index, health=None, crop_x=CROP_X, output_format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY):
+        self.cam_index = cam_index
+        self.health = health or FrameHealth()
+        self.crop_x = crop_x
+        self.output_format = output_format
+        self.quality = quality
+        self.counters = PIPELINE_COUNTERS.setdefault(cam_index, PipelineCounters())
+
+    def process(self, data, cropped=False):
+        decodes = encodes = passthrough = 0
+        started = time.perf_counter()
+        try:
+            img = Image.open(io.BytesIO(data))
+            w, h = img.size
+            crop_x = 0 if cropped else self.crop_x
+            if w <= 2 * crop_x:
+                return PipelineResult(reason="narrow")
+
+            # JPEG уже обрезан источником и нужен JPEG — проверяем уменьшенную копию
+            # (масштабирование при декодировании DCT) и публикуем исходные байты
+            if not crop_x and img.format == "JPEG" and self.output_format == "JPEG":
+                img.draft("RGB", (SAMPLE_SIZE[0] * 2, SAMPLE_SIZE[1] * 2))
+                img.load()
+                decodes += 1
+                report = self.health.analyze(img)
+                self._observe("validate", started)
+                if not report.ok:
+                    return PipelineResult(report=report, reason=report.reason)
+                passthrough = 1
+                JPEG_BYTES.observe(len(data), path="capture")
+                return PipelineResult(data=data, report=report)
+
+            # Полный путь: одно декодирование, обрезка, одно кодирование
+            img.load()
+            decodes += 1
+            report = self.health.analyze(img)
+            self._observe("validate", started)
+            if not report.ok:
+                return PipelineResult(report=report, reason=report.reason)
+
+            encode_started = time.perf_counter()
+            if crop_x:
+                img = img.crop((crop_x, 0, w - crop_x, h))
+            buf = io.BytesIO()
+            if self.output_format == "JPEG":
+                img.convert("RGB").save(buf, format="JPEG", quality=self.quality)
+            else:
+                img.save(buf, format=self.output_format)
+            encodes += 1
+            self._observe("encode", encode_started)
+            if self.output_format == "JPEG":
+                JPEG_ENCODE_SECONDS.observe(time.perf_counter() - encode_started, path="capture")
+                JPEG_BYTES.observe(buf.tell(), path="capture")
+            return PipelineResult(data=buf.getvalue(), report=report)
+        finally:
+            self.counters.add(decodes, encodes, passthrough)
+
+    def _observe(self, stage, started):
+        CAPTURE_STAGE_SECONDS.observe(time.perf_counter() - started, cam=self.cam_index, stage=stage)
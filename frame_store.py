@@ -0,0 +1,187 @@
+# frame_store.py
+import threading
+import time
+from collections import OrderedDict
+
+# ----------------------------------------------------------------------
+# Общее хранилище кадров (захват -> веб-сервер без диска)
+# ----------------------------------------------------------------------
+class Frame:
+    __slots__ = ('data', 'seq', 'timestamp', 'kind', 'jpeg')
+
+    def __init__(self, data, seq, timestamp, kind):
+        self.data = data
+        self.seq = seq
+        self.timestamp = timestamp
+        self.kind = kind
+        self.jpeg = None  # JPEG кодируется один раз на кадр и отдаётся всем зрителям
+
+
+class FrameStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._seq = {}
+        self._conditions = {}
+        self._encode_locks = {}
+        self._encode_count = {}
+        self._viewers = {}
+        self._listeners = []
+
+    def publish(self, cam_id, data, kind="live"):
+        with self._lock:
+            seq = self._seq.get(cam_id, 0) + 1
+            self._seq[cam_id] = seq
+            frame = Frame(data, seq, time.time(), kind)
+            self._frames[cam_id] = frame
+            # Будим всех зрителей этой камеры
+            self._condition(cam_id).notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(cam_id, frame)
+        return frame
+
+    def add_listener(self, listener):
+        # listener(cam_id, frame) вызывается в потоке публикации — без долгой работы
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _condition(self, cam_id):
+        cond = self._conditions.get(cam_id)
+        if cond is None:
+            cond = self._conditions[cam_id] = threading.Condition(self._lock)
+        return cond
+
+    def get(self, cam_id):
+        with self._lock:
+            return self._frames.get(cam_id)
+
+    def wait_newer(self, cam_id, seq, timeout=None):
+        with self._lock:
+            cond = self._condition(cam_id)
+            cond.wait_for(lambda: self._seq.get(cam_id, 0) > seq, timeout)
+            frame = self._frames.get(cam_id)
+        if frame is None or frame.seq <= seq:
+            return None
+        return frame
+
+    def get_jpeg(self, cam_id, encoder, frame=None):
+        if frame is None:
+            frame = self.get(cam_id)
+        if frame is None:
+            return None, None
+        if frame.jpeg is not None:
+            return frame, frame.jpeg
+
+        with self._lock:
+            encode_lock = self._encode_locks.setdefault(cam_id, threading.Lock())
+
+        # === ОДНО КОДИРОВАНИЕ НА ВЕРСИЮ КАДРА, ОСТАЛЬНЫЕ ЗРИТЕЛИ ЖДУТ ===
+        with encode_lock:
+            if frame.jpeg is None:
+                frame.jpeg = encoder(frame.data)
+                # Кадр уже был в JPEG — перекодирования не было
+                if frame.jpeg is not None and frame.jpeg is not frame.data:
+                    with self._lock:
+                        self._encode_count[cam_id] = self._encode_count.get(cam_id, 0) + 1
+        return frame, frame.jpeg
+
+    def discard(self, cam_id):
+        # Камера удалена: кадр больше не отдаётся; номер кадра сохраняется (ETag не повторится)
+        with self._lock:
+            self._frames.pop(cam_id, None)
+            self._encode_locks.pop(cam_id, None)
+            self._encode_count.pop(cam_id, None)
+
+    def add_viewer(self, cam_id):
+        with self._lock:
+            self._viewers[cam_id] = self._viewers.get(cam_id, 0) + 1
+
+    def remove_viewer(self, cam_id):
+        with self._lock:
+            self._viewers[cam_id] = max(0, self._viewers.get(cam_id, 0) - 1)
+
+    def viewers(self, cam_id):
+        with self._lock:
+            return self._viewers.get(cam_id, 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                cam_id: {
+                    "seq": frame.seq,
+                    "timestamp": frame.timestamp,
+                    "kind": frame.kind,
+                    "encodes": self._encode_count.get(cam_id, 0),
+                    "viewers": self._viewers.get(cam_id, 0),
+                }
+                for cam_id, frame in self._frames.items()
+            }
+
+
+# ----------------------------------------------------------------------
+# LRU-кэш вариантов кадра (размер/качество) с лимитом памяти
+# ----------------------------------------------------------------------
+class TranscodeCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._inflight = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, factory):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+
+        # Один вариант кодируется один раз, остальные клиенты ждут результат
+        with key_lock:
+            with self._lock:
+                data = self._items.get(key)
+                if data is not None:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return data
+                self.misses += 1
+
+            data = factory()
+
+            with self._lock:
+                self._inflight.pop(key, None)
+                if data is not None and len(data) <= self.max_bytes:
+                    self._items[key] = data
+                    self.bytes += len(data)
+                    while self.bytes > self.max_bytes:
+                        _, old = self._items.popitem(last=False)
+                        self.bytes -= len(old)
+                        self.evictions += 1
+        return data
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+            }
+
+
+FRAME_STORE = FrameStore()
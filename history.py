@@ -0,0 +1,293 @@
+# history.py
+import bisect
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from frame_store import FRAME_STORE
+from frame_pipeline import sniff_format
+
+# ----------------------------------------------------------------------
+# Конфигурация
+# ----------------------------------------------------------------------
+HISTORY_SECONDS = 120               # сек последних кадров в памяти на камеру
+HISTORY_MAX_BYTES = 64 * 1024 * 1024  # потолок памяти истории одной камеры
+RECORD_ENABLED = False              # запись на диск
+RECORD_DIR = "recordings"
+RECORD_INTERVAL = 1.0               # сек, не чаще одного кадра на диск
+SEGMENT_SECONDS = 600               # новый сегмент каждые 10 минут
+RECORD_MAX_DAYS = 5                 # старые сегменты удаляются, как логи
+
+SEGMENT_EXT = ".seg"                # JPEG-кадры подряд, только дописывание
+INDEX_EXT = ".idx"                  # записи (время, смещение, длина) на каждый кадр
+_INDEX = struct.Struct("<dQI")
+
+# ----------------------------------------------------------------------
+# Кадры за последние HISTORY_SECONDS в памяти
+# ----------------------------------------------------------------------
+class CameraHistory:
+    def __init__(self):
+        self.frames = deque()   # (timestamp, jpeg)
+        self.bytes = 0
+
+    def append(self, timestamp, data):
+        self.frames.append((timestamp, data))
+        self.bytes += len(data)
+        cutoff = timestamp - HISTORY_SECONDS
+        while self.frames and (self.frames[0][0] < cutoff or self.bytes > HISTORY_MAX_BYTES):
+            self.bytes -= len(self.frames.popleft()[1])
+
+# ----------------------------------------------------------------------
+# Сегменты на диске: cam<N>/<YYYYmmdd_HHMMSS>.seg + .idx
+# ----------------------------------------------------------------------
+def segment_start(path):
+    try:
+        return datetime.strptime(Path(path).stem, "%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        return None
+
+class SegmentWriter:
+    def __init__(self, folder):
+        self.folder = folder
+        self.started = None
+        self.data = None
+        self.index = None
+
+    def append(self, timestamp, data):
+        if self.started is None or timestamp - self.started >= SEGMENT_SECONDS:
+            self.close()
+            os.makedirs(self.folder, exist_ok=True)
+            name = datetime.fromtimestamp(timestamp).strftime("%Y%m%d_%H%M%S")
+            base = os.path.join(self.folder, name)
+            self.data = open(base + SEGMENT_EXT, "ab")
+            self.index = open(base + INDEX_EXT, "ab")
+            self.started = timestamp
+        offset = self.data.tell()
+        self.data.write(data)
+        self.data.flush()
+        # Запись индекса — после данных: читатель не увидит кадр, которого ещё нет в сегменте
+        self.index.write(_INDEX.pack(timestamp, offset, len(data)))
+        self.index.flush()
+
+    def close(self):
+        for f in (self.data, self.index):
+            if f:
+                f.close()
+        self.data = self.index = None
+        self.started = None
+
+
+class SegmentReader:
+    def __init__(self, base):
+        self.base = base
+        with open(base + INDEX_EXT, "rb") as f:
+            raw = f.read()
+        count = len(raw) // _INDEX.size
+        entries = [_INDEX.unpack_from(raw, i * _INDEX.size) for i in range(count)]
+        self.times = [e[0] for e in entries]
+        self.entries = entries
+        self._file = None
+        self._map = None
+
+    def __enter__(self):
+        if self.entries:
+            self._file = open(self.base + SEGMENT_EXT, "rb")
+            try:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError) as e:
+                # Пустой .seg (запись оборвалась до первого кадра) — mmap длины 0 даёт ValueError;
+                # для вызывающих это тот же недоступный сегмент, что и OSError при открытии
+                self._file.close()
+                self._file = None
+                raise OSError(f"сегмент не отображается в память: {e}") from e
+        return self
+
+    def __exit__(self, *exc):
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+    def frame(self, i):
+        timestamp, offset, length = self.entries[i]
+        if offset + length > len(self._map):
+            return None  # сегмент дописывается — индекс опередил отображение
+        return timestamp, self._map[offset:offset + length]
+
+    def between(self, start, end):
+        i = bisect.bisect_left(self.times, start)
+        while i < len(self.entries) and self.entries[i][0] <= end:
+            item = self.frame(i)
+            if item:
+                yield item
+            i += 1
+
+
+def camera_segments(cam_id):
+    folder = Path(RECORD_DIR) / f"cam{cam_id}"
+    if not folder.exists():
+        return []
+    result = []
+    for path in folder.glob(f"*{INDEX_EXT}"):
+        start = segment_start(path)
+        if start is not None:
+            result.append((start, str(path.with_suffix(""))))
+    return sorted(result)
+
+# ----------------------------------------------------------------------
+# История всех камер: память + запись на диск в отдельном потоке
+# ----------------------------------------------------------------------
+class FrameHistory:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cams = {}
+        self._writers = {}
+        self._last_recorded = {}
+        self._queue = queue.Queue(maxsize=256)
+        self._thread = None
+        self.dropped = 0
+
+    def start(self):
+        FRAME_STORE.add_listener(self._on_publish)
+        if RECORD_ENABLED and self._thread is None:
+            self._thread = threading.Thread(target=self._record_loop, daemon=True, name="history-recorder")
+            self._thread.start()
+
+    def _on_publish(self, cam_id, frame):
+        # Только живые кадры в JPEG (заглушки и мозаика не сохраняются)
+        if not isinstance(cam_id, int) or frame.kind != "live" or sniff_format(frame.data) != "JPEG":
+            return
+        with self._lock:
+            history = self._cams.get(cam_id)
+            if history is None:
+                history = self._cams[cam_id] = CameraHistory()
+            history.append(frame.timestamp, frame.data)
+
+        if self._thread is not None and frame.timestamp - self._last_recorded.get(cam_id, 0) >= RECORD_INTERVAL:
+            self._last_recorded[cam_id] = frame.timestamp
+            try:
+                self._queue.put_nowait((cam_id, frame.timestamp, frame.data))
+            except queue.Full:
+                self.dropped += 1
+
+    def _record_loop(self):
+        last_prune = 0
+        while True:
+            cam_id, timestamp, data = self._queue.get()
+            if data is None:
+                # Камера удалена: сегмент дописан, файлы закрываются
+                writer = self._writers.pop(cam_id, None)
+                if writer:
+                    writer.close()
+                continue
+            try:
+                writer = self._writers.get(cam_id)
+                if writer is None:
+                    writer = self._writers[cam_id] = SegmentWriter(os.path.join(RECORD_DIR, f"cam{cam_id}"))
+                writer.append(timestamp, data)
+            except Exception as e:
+                logging.error(f"[REC] cam{cam_id}: ошибка записи: {e}")
+            if time.time() - last_prune >= 3600:
+                last_prune = time.time()
+                self.prune()
+
+    def prune(self):
+        # Как старые логи (logs.prune_old_logs): сегменты старше RECORD_MAX_DAYS удаляются
+        cutoff = (datetime.now() - timedelta(days=RECORD_MAX_DAYS)).timestamp()
+        for path in Path(RECORD_DIR).glob(f"cam*/*{INDEX_EXT}"):
+            start = segment_start(path)
+            if start is None or start + SEGMENT_SECONDS >= cutoff:
+                continue
+            try:
+                path.unlink()
+                path.with_suffix(SEGMENT_EXT).unlink(missing_ok=True)
+                logging.info(f"[REC] Удалён старый сегмент: {path.parent.name}/{path.stem}")
+            except Exception as e:
+                logging.warning(f"[REC] Ошибка при удалении сегмента {path.name}: {e}")
+
+    def forget(self, cam_id):
+        # Камера удалена: история из памяти, сегмент на диске закрывается потоком записи
+        with self._lock:
+            self._cams.pop(cam_id, None)
+        self._last_recorded.pop(cam_id, None)
+        if self._thread is not None:
+            self._queue.put((cam_id, None, None))
+
+    def has_frames(self, cam_id, start, end):
+        frames = self.frames(cam_id, start, end)
+        try:
+            return next(frames, None) is not None
+        finally:
+            frames.close()  # закрывает открытый сегмент (mmap) сразу, а не при сборке мусора
+
+    # === Чтение ===
+    def _memory(self, cam_id):
+        with self._lock:
+            history = self._cams.get(cam_id)
+            return list(history.frames) if history else []
+
+    def frames(self, cam_id, start, end):
+        # (время, JPEG) по возрастанию: с диска — до начала истории в памяти, дальше из памяти
+        memory = self._memory(cam_id)
+        memory_start = memory[0][0] if memory else float("inf")
+        if start < memory_start:
+            segments = camera_segments(cam_id)
+            for i, (seg_start, base) in enumerate(segments):
+                seg_end = segments[i + 1][0] if i + 1 < len(segments) else float("inf")
+                if seg_end < start or seg_start > min(end, memory_start):
+                    continue
+                try:
+                    with SegmentReader(base) as reader:
+                        for timestamp, data in reader.between(start, min(end, memory_start)):
+                            if timestamp >= memory_start:
+                                break
+                            yield timestamp, bytes(data)
+                except OSError as e:
+                    logging.warning(f"[REC] cam{cam_id}: сегмент {base} недоступен: {e}")
+        for timestamp, data in memory:
+            if start <= timestamp <= end:
+                yield timestamp, data
+
+    def frame_at(self, cam_id, at):
+        # Последний кадр не позже момента at
+        memory = self._memory(cam_id)
+        if memory and memory[0][0] <= at:
+            i = bisect.bisect_right([t for t, _ in memory], at)
+            return memory[i - 1]
+        for seg_start, base in reversed(camera_segments(cam_id)):
+            if seg_start > at:
+                continue
+            try:
+                with SegmentReader(base) as reader:
+                    i = bisect.bisect_right(reader.times, at)
+                    while i > 0:
+                        item = reader.frame(i - 1)
+                        if item:
+                            return item[0], bytes(item[1])
+                        i -= 1
+            except OSError as e:
+                logging.warning(f"[REC] cam{cam_id}: сегмент {base} недоступен: {e}")
+        return None
+
+    def stats(self):
+        with self._lock:
+            cams = {
+                cam_id: {
+                    "frames": len(h.frames),
+                    "bytes": h.bytes,
+                    "oldest": h.frames[0][0] if h.frames else None,
+                }
+                for cam_id, h in self._cams.items()
+            }
+        return {"recording": self._thread is not None, "queue": self._queue.qsize(),
+                "dropped": self.dropped, "cams": cams}
+
+
+FRAME_HISTORY = FrameHistory()
@@ -0,0 +1,192 @@
+# logs.py
+import atexit
+import logging
+import os
+import queue
+import re
+import threading
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+# ----------------------------------------------------------------------
+# Конфигурация
+# ----------------------------------------------------------------------
+LOG_DIR = "."
+LOG_BASE = "capture"
+LOG_EXT = ".log"
+MAX_LOG_DAYS = 5
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_QUEUE_SIZE = 10000      # записей в очереди; при переполнении новые отбрасываются — захват не ждёт диск
+RATE_LIMIT_WINDOW = 60      # сек
+RATE_LIMIT_BURST = 3        # одинаковых сообщений за окно, остальные — одним счётчиком в следующем
+
+def get_current_log_path():
+    return os.path.join(LOG_DIR, f"{LOG_BASE}{LOG_EXT}")
+
+def get_dated_log_path(date_str):
+    return os.path.join(LOG_DIR, f"{LOG_BASE}_{date_str}{LOG_EXT}")
+
+# ----------------------------------------------------------------------
+# Файл лога: пишет только поток QueueListener, поэтому ротация (по суткам
+# и по размеру) не гоняется с записью из потоков захвата
+# ----------------------------------------------------------------------
+class DailyFileHandler(RotatingFileHandler):
+    def __init__(self):
+        super().__init__(get_current_log_path(), maxBytes=LOG_MAX_BYTES, backupCount=1,
+                         delay=True, encoding='utf-8')
+        try:
+            # Лог с прошлого запуска за вчера — переименуется при первой записи
+            self.day = datetime.fromtimestamp(os.path.getmtime(self.baseFilename)).date()
+        except OSError:
+            self.day = datetime.now().date()
+
+    def emit(self, record):
+        day = datetime.fromtimestamp(record.created).date()
+        if day != self.day:
+            self.rotate_daily()
+            self.day = day
+        super().emit(record)
+
+    def rotate_daily(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        dated_log = get_dated_log_path(self.day.strftime("%Y%m%d"))
+        try:
+            if os.path.exists(self.baseFilename) and not os.path.exists(dated_log):
+                os.rename(self.baseFilename, dated_log)
+                logging.info(f"Лог переименован: {self.baseFilename} → {dated_log}")
+        except OSError as e:
+            logging.warning(f"Не удалось ротировать лог: {e}")
+        prune_old_logs()
+
+
+def prune_old_logs():
+    cutoff = datetime.now() - timedelta(days=MAX_LOG_DAYS)
+    for file in Path(LOG_DIR).glob(f"{LOG_BASE}_*{LOG_EXT}"):
+        try:
+            file_date = datetime.strptime(file.stem.split("_")[-1], "%Y%m%d")
+            if file_date < cutoff:
+                file.unlink()
+                logging.info(f"Удалён старый лог: {file.name}")
+        except Exception as e:
+            logging.warning(f"Ошибка при удалении старого лога {file.name}: {e}")
+
+# ----------------------------------------------------------------------
+# Повторы: мёртвая камера не пишет одно и то же каждую секунду
+# ----------------------------------------------------------------------
+_NUMBERS = re.compile(r"\bcam\d+|\d+")
+
+def _message_key(record):
+    # Числа (таймауты, порты, id сессий) сообщения не различают, номер камеры — различает
+    message = _NUMBERS.sub(lambda m: m.group() if m.group().startswith("cam") else "#", record.getMessage())
+    return record.levelno, message
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, window=RATE_LIMIT_WINDOW, burst=RATE_LIMIT_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._seen = {}     # ключ -> [начало окна, сообщений в окне, подавлено]
+        self.suppressed = 0
+
+    def filter(self, record):
+        key = _message_key(record)
+        with self._lock:
+            state = self._seen.get(key)
+            if state is not None and record.created - state[0] < self.window:
+                state[1] += 1
+                if state[1] <= self.burst:
+                    return True
+                state[2] += 1
+                self.suppressed += 1
+                return False
+            repeated = state[2] if state else 0
+            self._seen[key] = [record.created, 1, 0]
+            if len(self._seen) > 5000:
+                self._seen = {k: s for k, s in self._seen.items() if record.created - s[0] < self.window}
+        if repeated:
+            record.msg = f"{record.getMessage()} (ещё {repeated} таких же за {self.window} сек пропущено)"
+            record.args = None
+        return True
+
+# ----------------------------------------------------------------------
+# Очередь: потоки захвата и раздачи только кладут запись, файл пишет один поток
+# ----------------------------------------------------------------------
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._reported < self.dropped:
+            lost, self._reported = self.dropped - self._reported, self.dropped
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"Лог: {lost} записей отброшено (очередь переполнена)",
+                }))
+            except queue.Full:
+                pass
+
+
+class EventQueueHandler(QueueHandler):
+    # Процесс захвата: записи уходят в веб-процесс по очереди событий ("log", запись)
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(("log", record))
+        except Exception:
+            pass
+
+
+LOG_QUEUE = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+RATE_LIMIT = RateLimitFilter()
+_queue_handler = None
+_listener = None
+
+def _replace_root_handler(handler, level):
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        h.close()
+        root.removeHandler(h)
+    handler.addFilter(RATE_LIMIT)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+def setup_logging(level=logging.INFO):
+    global _queue_handler, _listener
+    if _listener is not None:
+        return
+    file_handler = DailyFileHandler()
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    _queue_handler = DroppingQueueHandler(LOG_QUEUE)
+    _replace_root_handler(_queue_handler, level)
+    _listener = QueueListener(LOG_QUEUE, file_handler)
+    _listener.start()
+    # Дописываем очередь при выходе (sys.exit после Ctrl+C)
+    atexit.register(stop_logging)
+
+def setup_worker_logging(events, level=logging.INFO):
+    _replace_root_handler(EventQueueHandler(events), level)
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def log_stats():
+    return {
+        "queued": LOG_QUEUE.qsize(),
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+        "suppressed": RATE_LIMIT.suppressed,
+    }
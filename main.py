@@ -5,24 +5,34 @@ import time
 import psutil
 import logging
 import requests
-import shutil
 import socket
-from datetime import datetime, timedelta
-from logging.handlers import RotatingFileHandler
-from pathlib import Path
+import base64
+import math
+import multiprocessing
 import threading
-from queue import Queue
+from contextlib import contextmanager
 
 from ruamel.yaml import YAML
+from ruamel.yaml.comments import CommentedMap
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-
-from PIL import Image
+from selenium.common.exceptions import TimeoutException
+
+
+from frame_store import FRAME_STORE
+from frame_pipeline import FramePipeline, CROP_X, OUTPUT_QUALITY, sniff_format
+from capture_scheduler import CaptureScheduler
+from camera_control import CAMERA_CONTROL, normalize_settings
+from camera_health import CameraHealth, HEALTHY, RECONNECTING, OPEN
+from browser_pool import BROWSER_POOL, WARM_POOL, create_chrome
+from metrics import CAPTURE_STAGE_SECONDS, CAPTURE_FRAMES, RELOADS, NOCONNECT
+from history import FRAME_HISTORY
+from logs import setup_logging, setup_worker_logging
+from stream_ingest import StreamDriver, MediaSource, MEDIA_URL_JS, STREAM_DISCOVERY_TIMEOUT
+import stream_ingest
+from startup import LAUNCH_GATE, STARTUP_CONCURRENCY, LAST_GOOD_NAME, READINESS, publish_last_good
 
 import urllib3
 from selenium.webdriver.remote.remote_connection import LOGGER as SELENIUM_LOGGER
@@ -32,89 +42,35 @@ logging.getLogger("urllib3").setLevel(logging.ERROR)
 logging.getLogger("selenium").setLevel(logging.ERROR)
 SELENIUM_LOGGER.setLevel(logging.ERROR)
 
-# ----------------------------------------------------------------------
-# === ГЛОБАЛЬНЫЕ ПЕРЕМЕННЫЕ ДЛЯ API ===
-# ----------------------------------------------------------------------
-CAM_URLS = [None] * 9
-URL_UPDATE_QUEUE = Queue()
-
 # ----------------------------------------------------------------------
 # === КОНФИГУРАЦИЯ ===
 # ----------------------------------------------------------------------
-CAPTURE_INTERVAL = 1
+CAPTURE_INTERVAL = 1  # сек, можно дробное (например 0.5) при CAPTURE_BACKEND = "cdp"
+CAPTURE_BACKEND = "cdp"  # "cdp" — Page.captureScreenshot в память, "element" — скриншот элемента через WebDriver
+INGEST_BACKEND = "auto"  # "auto" — видеопоток плеера напрямую (PyAV), Chrome только для поиска адреса; при неудаче — скриншоты
+                         # "screenshot" — всегда скриншоты в Chrome
+STREAM_CAPTURE_INTERVAL = 0.2  # сек, шаг захвата камер с прямым приёмом видеопотока при зрителях (0 — как CAPTURE_INTERVAL);
+                               # не чаще кадров самого потока, interval в настройках камеры важнее
+CDP_JPEG_QUALITY = 90
+CAPTURE_WORKERS = 6  # потоков захвата на все камеры
+IDLE_CAPTURE_INTERVAL = 5  # сек, интервал для камер без зрителей
+CAMERA_FPS = {}  # {номер камеры: кадров/сек} — фиксированная частота отдельных камер
+CAMERAS_PER_BROWSER = 1  # сколько камер (вкладок) в одном Chrome; 1 — отдельный Chrome на камеру
+WARM_POOL_SIZE = 2  # запущенных заранее Chrome для быстрой смены/перезапуска камер (0 — выключено)
+WARM_URL = None  # страница прогрева; None — адрес портала из первого URL без #...
+SNAPSHOT_INTERVAL = 10  # сек, периодическая запись current.png на диск (0 — не писать)
+DEFAULT_CAMERA_COUNT = 9  # камер без url.yaml; иначе число камер задаёт конфиг
+CAPTURE_PROCESSES = 0  # 0 — захват в потоках веб-процесса; N — N процессов захвата, кадры через общую память
+CONFIG_POLL_INTERVAL = 2  # сек, проверка изменений url.yaml (0 — не следить)
 
 # ----------------------------------------------------------------------
-# Логи (ротация по суткам)
+# Логи: очередь и один поток записи в файл, ротация по суткам (logs.py)
 # ----------------------------------------------------------------------
-LOG_DIR = "."
-LOG_BASE = "capture"
-LOG_EXT = ".log"
-MAX_LOG_DAYS = 5
-
-def get_current_log_path():
-    return os.path.join(LOG_DIR, f"{LOG_BASE}{LOG_EXT}")
-
-def get_dated_log_path(date_str):
-    return os.path.join(LOG_DIR, f"{LOG_BASE}_{date_str}{LOG_EXT}")
-
-def create_new_handler():
-    handler = RotatingFileHandler(
-        get_current_log_path(),
-        maxBytes=5 * 1024 * 1024,
-        backupCount=1,
-        delay=True,
-        encoding='utf-8'
-    )
-    handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-    return handler
-
-def replace_log_handler():
-    root = logging.getLogger()
-    for h in list(root.handlers):
-        h.close()
-        root.removeHandler(h)
-    root.addHandler(create_new_handler())
-    root.setLevel(logging.INFO)
-
-replace_log_handler()
-logging.info("=== КОНСОЛЬНОЕ ПРИЛОЖЕНИЕ ЗАПУЩЕНО ===")
-
-def rotate_log_if_needed():
-    current_log = get_current_log_path()
-    if not os.path.exists(current_log):
-        return
-
-    yesterday = datetime.now() - timedelta(days=1)
-    yesterday_str = yesterday.strftime("%Y%m%d")
-    dated_log = get_dated_log_path(yesterday_str)
-    if os.path.exists(dated_log):
-        return
-
-    try:
-        root = logging.getLogger()
-        for h in root.handlers[:]:
-            h.close()
-            root.removeHandler(h)
-        os.rename(current_log, dated_log)
-        logging.info(f"Лог переименован: {current_log} → {dated_log}")
-        replace_log_handler()
-    except Exception as e:
-        try:
-            replace_log_handler()
-        except:
-            pass
-        logging.warning(f"Не удалось ротировать лог: {e}")
-
-    cutoff = datetime.now() - timedelta(days=MAX_LOG_DAYS)
-    for file in Path(LOG_DIR).glob(f"{LOG_BASE}_*{LOG_EXT}"):
-        try:
-            file_date_str = file.stem.split("_")[-1]
-            file_date = datetime.strptime(file_date_str, "%Y%m%d")
-            if file_date < cutoff:
-                file.unlink()
-                logging.info(f"Удалён старый лог: {file.name}")
-        except Exception as e:
-            logging.warning(f"Ошибка при удалении старого лога {file.name}: {e}")
+if multiprocessing.current_process().name == "MainProcess":
+    # Процессы захвата пишут в лог через веб-процесс (capture_process_main). parent_process() тут
+    # не подходит: при spawn он ещё None, пока процесс захвата импортирует main как __mp_main__
+    setup_logging()
+    logging.info("=== КОНСОЛЬНОЕ ПРИЛОЖЕНИЕ ЗАПУЩЕНО ===")
 
 # ----------------------------------------------------------------------
 # Проверка порта 5000
@@ -149,12 +105,8 @@ def cleanup_processes():
 
 def is_image_black(img):
     try:
-        w, h = img.size
-        for x in range(0, w, 10):
-            for y in range(0, h, 10):
-                if img.getpixel((x, y))[:3] != (0, 0, 0):
-                    return False
-        return True
+        extrema = img.convert("RGB").getextrema()
+        return all(band_max == 0 for _, band_max in extrema)
     except:
         return False
 
@@ -165,30 +117,215 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+_RESOURCE_CACHE = {}
+
+def load_resource(name):
+    if name not in _RESOURCE_CACHE:
+        path = resource_path(os.path.join("resource", name))
+        try:
+            with open(path, 'rb') as f:
+                _RESOURCE_CACHE[name] = f.read()
+        except OSError:
+            _RESOURCE_CACHE[name] = None
+    return _RESOURCE_CACHE[name]
+
+def write_snapshot(cam_index, data, name="current"):
+    folder = os.path.join("capture", f"cam{cam_index}")
+    ext = "jpg" if sniff_format(data) == "JPEG" else "png"
+    target = os.path.join(folder, f"{name}.{ext}")
+    # Снимок другого формата (заглушка PNG после живого JPEG и наоборот) — устаревший, убираем
+    sibling = os.path.join(folder, f"{name}.{'png' if ext == 'jpg' else 'jpg'}")
+    temp = target + ".tmp"
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, target)
+        if os.path.exists(sibling):
+            os.remove(sibling)
+    except Exception as e:
+        logging.warning(f"Не удалось записать снимок cam{cam_index}: {e}")
+
+def publish_placeholder(cam_index, name="nocam.png"):
+    data = load_resource(name)
+    if data is None:
+        return False
+    FRAME_STORE.publish(cam_index, data, kind=name.split(".")[0])
+    if SNAPSHOT_INTERVAL:
+        write_snapshot(cam_index, data)
+    return True
+
 # ----------------------------------------------------------------------
 # Конфиг
 # ----------------------------------------------------------------------
 class ConfigManager:
-    DEFAULT_URLS = [None] * 9
+    # url.yaml:
+    #   urls: [url1, url2, ...]          — камеры 1..N по порядку
+    #   cameras:                         — явные постоянные номера камер и их настройки
+    #     1: url1
+    #     12: {url: url12, interval: 0.5, quality: 70, crop: 40}
     def __init__(self, filename='url.yaml'):
         self.filename = filename
         self.yaml = YAML()
         self.yaml.preserve_quotes = False
-        self.urls = self.DEFAULT_URLS.copy()
+        self.cameras = {i: None for i in range(1, DEFAULT_CAMERA_COUNT + 1)}
+        self.settings = {}
+        self.doc = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self._save_timer = None
+        self._applying = threading.local()
         self._load()
 
+    def _stat(self):
+        try:
+            st = os.stat(self.filename)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _read(self):
+        # (документ, камеры, настройки); None вместо камер — в файле нет ни cameras, ни urls
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            doc = self.yaml.load(f) or CommentedMap()
+        cameras, settings = None, {}
+        if isinstance(doc.get('cameras'), dict):
+            cameras = {}
+            for cam_id, entry in doc['cameras'].items():
+                cam_id = int(cam_id)
+                if isinstance(entry, dict):
+                    cameras[cam_id] = entry.get('url') or None
+                    settings[cam_id] = normalize_settings(entry)
+                else:
+                    cameras[cam_id] = entry or None
+        elif isinstance(doc.get('urls'), list):
+            cameras = {i + 1: url or None for i, url in enumerate(doc['urls'])}
+        return doc, cameras, settings
+
     def _load(self):
         if not os.path.exists(self.filename):
             logging.warning(f"Файл {self.filename} не найден")
             return
         try:
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                loaded = self.yaml.load(f) or {}
-            if 'urls' in loaded and isinstance(loaded['urls'], list):
-                self.urls = loaded['urls'][:9] + [None] * (9 - len(loaded['urls']))
+            stamp = self._stat()
+            doc, cameras, settings = self._read()
+            self.doc, self._stamp = doc, stamp
+            if cameras is not None:
+                self.cameras, self.settings = cameras, settings
         except Exception as e:
             logging.error(f"Ошибка загрузки url.yaml: {e}")
 
+    # === Слежение за файлом: изменения применяются только к затронутым камерам ===
+    def watch(self):
+        if CONFIG_POLL_INTERVAL:
+            threading.Thread(target=self._watch_loop, daemon=True, name="config-watch").start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(CONFIG_POLL_INTERVAL)
+            stamp = self._stat()
+            with self._lock:
+                changed = stamp is not None and stamp != self._stamp
+            if changed:
+                try:
+                    self.reload(stamp)
+                except Exception as e:
+                    logging.error(f"url.yaml: ошибка применения изменений: {e}")
+
+    def reload(self, stamp=None):
+        try:
+            doc, cameras, settings = self._read()
+            if cameras is None:
+                raise ValueError("нет списка urls или cameras")
+        except Exception as e:
+            logging.error(f"url.yaml: ошибка разбора, изменения не применены: {e}")
+            with self._lock:
+                self._stamp = stamp
+            return
+        with self._lock:
+            self.doc, self._stamp = doc, stamp
+            self.cameras, self.settings = cameras, settings
+
+        # Изменения из файла не записываются обратно в файл
+        self._applying.active = True
+        try:
+            self.apply(cameras, settings)
+        finally:
+            self._applying.active = False
+
+    def apply(self, cameras, settings):
+        current = CAMERA_CONTROL.urls()
+        added, removed, changed = [], [], []
+        for cam_id in sorted(set(current) - set(cameras)):
+            CAMERA_CONTROL.remove(cam_id)
+            removed.append(cam_id)
+        for cam_id, url in sorted(cameras.items()):
+            cam_settings = settings.get(cam_id, {})
+            if cam_id not in current:
+                CAMERA_CONTROL.add(url, cam_id, cam_settings)
+                added.append(cam_id)
+                continue
+            settings_changed = CAMERA_CONTROL.set_settings(cam_id, cam_settings)
+            if CAMERA_CONTROL.set_url(cam_id, url) or settings_changed:
+                changed.append(cam_id)
+        if added or removed or changed:
+            logging.info(f"url.yaml перечитан: добавлены {added}, удалены {removed}, изменены {changed}")
+        else:
+            logging.info("url.yaml перечитан: изменений нет")
+
+    # === Запись изменений из API обратно в url.yaml ===
+    def schedule_save(self):
+        if getattr(self._applying, "active", False):
+            return
+        # Пачка изменений (/api/set_urls) — одна запись файла
+        with self._lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(0.5, self.save)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def save(self):
+        urls = CAMERA_CONTROL.urls()
+        settings = CAMERA_CONTROL.settings()
+        ids = sorted(urls)
+        with self._lock:
+            self._save_timer = None
+            doc = self.doc if self.doc is not None else CommentedMap()
+            if 'cameras' not in doc and ids == list(range(1, len(ids) + 1)) and not any(settings.values()):
+                existing = doc.get('urls')
+                if isinstance(existing, list):
+                    # Правка на месте — комментарии в файле сохраняются
+                    del existing[len(ids):]
+                    for i, cam_id in enumerate(ids):
+                        if i < len(existing):
+                            existing[i] = urls[cam_id]
+                        else:
+                            existing.append(urls[cam_id])
+                else:
+                    doc['urls'] = [urls[cam_id] for cam_id in ids]
+            else:
+                cams = doc.get('cameras')
+                if not isinstance(cams, dict):
+                    cams = doc['cameras'] = CommentedMap()
+                for cam_id in [c for c in cams if int(c) not in urls]:
+                    del cams[cam_id]
+                for cam_id in ids:
+                    entry = settings.get(cam_id)
+                    cams[cam_id] = dict(url=urls[cam_id], **entry) if entry else urls[cam_id]
+                doc.pop('urls', None)
+
+            temp = self.filename + ".tmp"
+            try:
+                with open(temp, 'w', encoding='utf-8') as f:
+                    self.yaml.dump(doc, f)
+                os.replace(temp, self.filename)
+                self.doc = doc
+                self.cameras, self.settings = urls, settings
+                self._stamp = self._stat()  # свою запись не перечитываем
+                logging.info(f"url.yaml сохранён ({len(ids)} камер)")
+            except Exception as e:
+                logging.error(f"Не удалось сохранить url.yaml: {e}")
+
 # ----------------------------------------------------------------------
 # Драйвер
 # ----------------------------------------------------------------------
@@ -197,27 +334,62 @@ class BrowserDriver:
         self.url = url
         self.cam_index = cam_index
         self.driver = None
+        self.browser = None
+        self.handle = None
         self.iframe_element = None
+        self.iframe_rect = None
+        self.clip = None
+        self.last_cropped = False  # последний кадр уже обрезан на стороне браузера
+        self.prewarmed = False
+        self.crop_x = CROP_X
+        self.quality = CDP_JPEG_QUALITY
         if self.url:
             self._setup_driver()
             self._init_page()
 
     def _setup_driver(self):
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chromedriver_path = os.path.join(sys._MEIPASS, "chromedriver.exe") if getattr(sys, 'frozen', False) else "chromedriver.exe"
-        service = Service(executable_path=chromedriver_path)
-        self.driver = webdriver.Chrome(service=service, options=chrome_options)
+        if CAMERAS_PER_BROWSER > 1:
+            self.browser, self.handle = BROWSER_POOL.acquire(CAMERAS_PER_BROWSER)
+            self.driver = self.browser.driver
+        else:
+            self.driver = WARM_POOL.take()
+            self.prewarmed = self.driver is not None
+            if self.driver is None:
+                self.driver = create_chrome()
+
+    @contextmanager
+    def _tab(self):
+        # Общий Chrome: команды вкладки идут под замком браузера после переключения окна
+        if self.browser is None:
+            yield self.driver
+            return
+        with self.browser.lock:
+            if self.browser.current != self.handle:
+                self.driver.switch_to.window(self.handle)
+                self.browser.current = self.handle
+            yield self.driver
+
+    def _wait_for(self, by, value, timeout):
+        deadline = time.time() + timeout
+        while True:
+            with self._tab() as driver:
+                found = driver.find_elements(by, value)
+            if found:
+                return found[0]
+            if time.time() >= deadline:
+                raise TimeoutException(f"{value} не найден за {timeout} сек")
+            time.sleep(0.5)
 
     def _init_page(self):
         try:
-            self.driver.get(self.url)
-            WebDriverWait(self.driver, 20).until(EC.presence_of_element_located((By.ID, "ModalBodyPlayer")))
-            self.iframe_element = WebDriverWait(self.driver, 20).until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
+            with self._tab() as driver:
+                driver.get(self.url)
+                if self.prewarmed:
+                    # Портал уже открыт на странице прогрева — смена #... без перезагрузки не срабатывает
+                    driver.refresh()
+            self._wait_for(By.ID, "ModalBodyPlayer", 20)
+            self.iframe_element = self._wait_for(By.TAG_NAME, "iframe", 20)
+            self.clip = None
         except Exception as e:
             logging.error(f"Не загрузилась страница для cam{self.cam_index}: {e}")
             self.driver = None
@@ -225,196 +397,489 @@ class BrowserDriver:
     def reload_via_url(self):
         try:
             logging.info(f"Перезагрузка cam{self.cam_index}")
-            self.driver.get(self.url)
-            self.driver.refresh()
+            with self._tab() as driver:
+                driver.get(self.url)
+                driver.refresh()
             time.sleep(1)
-            WebDriverWait(self.driver, 25).until(EC.presence_of_element_located((By.ID, "ModalBodyPlayer")))
-            self.iframe_element = WebDriverWait(self.driver, 25).until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
-            return "about:blank" not in self.iframe_element.get_attribute("src")
+            self._wait_for(By.ID, "ModalBodyPlayer", 25)
+            self.iframe_element = self._wait_for(By.TAG_NAME, "iframe", 25)
+            self.clip = None
+            with self._tab():
+                return "about:blank" not in self.iframe_element.get_attribute("src")
         except Exception as e:
             logging.error(f"Ошибка перезагрузки cam{self.cam_index}: {e}")
             return False
 
+    def media_source(self, timeout=STREAM_DISCOVERY_TIMEOUT):
+        # Адрес видеопотока плеера (HLS/DASH/MJPEG); ждём, пока плеер его запросит
+        deadline = time.time() + timeout
+        while True:
+            url = None
+            try:
+                with self._tab() as driver:
+                    referer = self.iframe_element.get_attribute("src")
+                    driver.switch_to.frame(self.iframe_element)
+                    try:
+                        url = driver.execute_script(MEDIA_URL_JS)
+                        if url:
+                            user_agent = driver.execute_script("return navigator.userAgent")
+                            cookies = driver.get_cookies()
+                    finally:
+                        driver.switch_to.default_content()
+            except Exception as e:
+                logging.warning(f"cam{self.cam_index}: поиск видеопотока: {e}")
+                return None
+            if url:
+                return MediaSource(url, referer, user_agent, cookies)
+            if time.time() >= deadline:
+                return None
+            time.sleep(1)
+
     def get_iframe_size(self):
         try:
-            return self.driver.execute_script("return arguments[0].getBoundingClientRect()", self.iframe_element)
+            with self._tab() as driver:
+                rect = driver.execute_script("return arguments[0].getBoundingClientRect()", self.iframe_element)
         except Exception as e:
             logging.warning(f"get_iframe_size error cam{self.cam_index}: {e}")
             return None
+        # Плеер сдвинулся или изменил размер — область захвата нужно пересчитать
+        key = (rect['x'], rect['y'], rect['width'], rect['height']) if rect else None
+        if key != self.iframe_rect:
+            self.iframe_rect = key
+            self.clip = None
+        return rect
+
+    def capture_frame(self):
+        with self._tab():
+            if CAPTURE_BACKEND == "cdp":
+                data = self._capture_frame_cdp()
+                if data:
+                    self.last_cropped = True
+                    return data
+            self.last_cropped = False
+            return self._capture_frame_element()
+
+    def _get_clip(self):
+        if self.clip is not None:
+            return self.clip
+
+        # Координаты iframe на странице + смещение <video> внутри iframe
+        frame = self.driver.execute_script(
+            "var f = arguments[0], r = f.getBoundingClientRect();"
+            "return {x: r.left + f.clientLeft + window.scrollX, y: r.top + f.clientTop + window.scrollY,"
+            " width: f.clientWidth, height: f.clientHeight};",
+            self.iframe_element)
+        clip = dict(frame)
+        self.driver.switch_to.frame(self.iframe_element)
+        try:
+            videos = self.driver.find_elements(By.TAG_NAME, "video")
+            if videos:
+                video = self.driver.execute_script(
+                    "var r = arguments[0].getBoundingClientRect();"
+                    "return {x: r.left, y: r.top, width: r.width, height: r.height};",
+                    videos[0])
+                if video['width'] >= 1 and video['height'] >= 1:
+                    clip = {
+                        'x': frame['x'] + video['x'],
+                        'y': frame['y'] + video['y'],
+                        'width': video['width'],
+                        'height': video['height'],
+                    }
+        finally:
+            self.driver.switch_to.default_content()
+
+        # Рамку плеера отрезаем прямо в области захвата — без копирования пикселей
+        if clip['width'] <= 2 * self.crop_x or clip['height'] < 1:
+            return None
+        clip['x'] += self.crop_x
+        clip['width'] -= 2 * self.crop_x
+        clip['scale'] = 1
+        self.clip = clip
+        return clip
+
+    def _capture_frame_cdp(self):
+        try:
+            clip = self._get_clip()
+            if not clip:
+                return None
+            result = self.driver.execute_cdp_cmd("Page.captureScreenshot", {
+                "format": "jpeg",
+                "quality": self.quality,
+                "clip": clip,
+                "fromSurface": True,
+            })
+            return base64.b64decode(result['data'])
+        except Exception as e:
+            self.clip = None
+            logging.warning(f"CDP capture error cam{self.cam_index}: {e}")
+            return None
 
-    def capture_frame(self, file_path):
+    def _capture_frame_element(self):
         try:
             self.driver.switch_to.frame(self.iframe_element)
             try:
                 video = WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((By.TAG_NAME, "video")))
-                video.screenshot(file_path)
+                data = video.screenshot_as_png
             except:
                 self.driver.switch_to.default_content()
-                self.iframe_element.screenshot(file_path)
+                data = self.iframe_element.screenshot_as_png
             else:
                 self.driver.switch_to.default_content()
-            return True
+            return data
         except Exception as e:
             logging.warning(f"capture_frame error cam{self.cam_index}: {e}")
-            return False
+            return None
 
     def quit(self):
-        if self.driver:
+        if self.browser:
+            BROWSER_POOL.release(self.browser, self.handle)
+            self.browser = None
+        elif self.driver:
             try:
                 self.driver.quit()
             except:
                 pass
 
+def open_camera(url, cam_index):
+    # Страница портала в Chrome; при INGEST_BACKEND="auto" Chrome только находит адрес потока,
+    # кадры декодируются напрямую, а Chrome закрывается. Не вышло — остаёмся на скриншотах
+    driver = BrowserDriver(url, cam_index)
+    if INGEST_BACKEND != "auto" or not stream_ingest.available() or not driver.driver:
+        return driver
+    source = driver.media_source()
+    if source is None:
+        logging.info(f"cam{cam_index}: адрес видеопотока не найден — захват скриншотами")
+        return driver
+    stream = StreamDriver(url, cam_index, source, driver.quality)
+    if not stream.driver:
+        logging.warning(f"cam{cam_index}: видеопоток {source.url} не открылся — захват скриншотами")
+        return driver
+    logging.info(f"cam{cam_index}: прямой приём видеопотока {source.url}")
+    threading.Thread(target=driver.quit, daemon=True).start()
+    return stream
+
 # ----------------------------------------------------------------------
 # Захват
 # ----------------------------------------------------------------------
 class FrameCapture:
-    CURRENT_FILE = "current.png"
-    TEMP_FILE = "temp_capture.png"
-
     def __init__(self, driver, cam_index):
         self.driver = driver
         self.cam_index = cam_index
-        self.folder = os.path.join("capture", f"cam{cam_index}")
-        os.makedirs(self.folder, exist_ok=True)
-        self.current_path = os.path.join(self.folder, self.CURRENT_FILE)
-        self.temp_path = os.path.join(self.folder, self.TEMP_FILE)
+        self.last_snapshot = 0
+        self.last_kind = None
+        self.pipeline = FramePipeline(cam_index)
+        self.last_error = None
 
     def capture(self):
+        # Только захват и публикация; перезагрузками управляет CameraWorker через CameraHealth
         if not self.driver or not self.driver.url:
-            src = resource_path(os.path.join("resource", "nocam.png"))
-            if os.path.exists(src):
-                shutil.copy(src, self.current_path)
-            return True
+            return self._publish(load_resource("nocam.png"), "nocam")
 
         try:
-            size = self.driver.get_iframe_size()
+            with CAPTURE_STAGE_SECONDS.time(cam=self.cam_index, stage="get_iframe_size"):
+                size = self.driver.get_iframe_size()
             if not size or size['width'] < 1:
-                if self.driver.reload_via_url():
-                    time.sleep(1)
-                return self._save_noconnect()
-
-            if not self.driver.capture_frame(self.temp_path):
-                if self.driver.reload_via_url():
-                    time.sleep(1)
-                return self._save_noconnect()
-
-            if is_image_black(Image.open(self.temp_path)):
-                self._safe_remove(self.temp_path)
-                if self.driver.reload_via_url():
-                    time.sleep(1)
-                return self._save_noconnect()
-
-            with Image.open(self.temp_path) as img:
-                w, h = img.size
-                if w < 132:
-                    self._safe_remove(self.temp_path)
-                    if self.driver.reload_via_url():
-                        time.sleep(1)
-                    return self._save_noconnect()
-                img.crop((66, 0, w-66, h)).save(self.temp_path, format='PNG', quality=95)
-
-            if os.path.getsize(self.temp_path) / 1024 < 100:
-                self._safe_remove(self.temp_path)
-                if self.driver.reload_via_url():
-                    time.sleep(1)
-                return self._save_noconnect()
-
-            if os.path.exists(self.current_path):
-                os.replace(self.temp_path, self.current_path)
-            else:
-                os.rename(self.temp_path, self.current_path)
+                return self._fail("iframe не найден")
+
+            with CAPTURE_STAGE_SECONDS.time(cam=self.cam_index, stage="capture_frame"):
+                data = self.driver.capture_frame()
+            if not data:
+                return self._fail("нет скриншота")
+
+            result = self.pipeline.process(data, cropped=self.driver.last_cropped)
+            if not result.ok:
+                report = result.report
+                if report:
+                    logging.info(f"Кадр cam{self.cam_index} отклонён: {result.reason} "
+                                 f"(яркость {report.brightness:.1f}, энтропия {report.entropy:.2f})")
+                # Счётчик одинаковых кадров не сбрасываем: следующий такой же кадр — снова "frozen",
+                # неудачи идут подряд и доходят до переподключения. Ожившая картинка сбросит его сама
+                return self._fail(result.reason)
+            data = result.data
+
             # УБРАНО: logging.info(f"Кадр обновлён: cam{self.cam_index}")
-            return True
+            self.last_error = None
+            with CAPTURE_STAGE_SECONDS.time(cam=self.cam_index, stage="publish"):
+                return self._publish(data, "live")
 
         except Exception as e:
-            self._safe_remove(self.temp_path)
             logging.error(f"Ошибка захвата cam{self.cam_index}: {e}")
-            if self.driver and self.driver.reload_via_url():
-                time.sleep(1)
-            return self._save_noconnect()
-
-    def _save_noconnect(self):
-        src = resource_path(os.path.join("resource", "noconnect.png"))
-        if os.path.exists(src):
-            shutil.copy2(src, self.current_path)
-            os.utime(self.current_path, None)
+            return self._fail(str(e))
+
+    def _fail(self, reason):
+        self.last_error = reason
+        CAPTURE_FRAMES.inc(cam=self.cam_index, result="failed")
+        return False
+
+    def _publish(self, data, kind):
+        if data is None:
+            return False
+        CAPTURE_FRAMES.inc(cam=self.cam_index, result=kind)
+        FRAME_STORE.publish(self.cam_index, data, kind=kind)
+
+        # === СНИМОК НА ДИСК: ПЕРИОДИЧЕСКИ ИЛИ ПРИ СМЕНЕ ТИПА КАДРА ===
+        now = time.time()
+        if SNAPSHOT_INTERVAL and (kind != self.last_kind or now - self.last_snapshot >= SNAPSHOT_INTERVAL):
+            write_snapshot(self.cam_index, data)
+            if kind == "live":
+                # Его покажем (с пометкой stale) после перезапуска, пока нет живого кадра
+                write_snapshot(self.cam_index, data, LAST_GOOD_NAME)
+            self.last_snapshot = now
+        self.last_kind = kind
+        return True
+
+    def save_noconnect(self):
+        if self._publish(load_resource("noconnect.png"), "noconnect"):
+            NOCONNECT.inc(cam=self.cam_index)
             logging.info(f"noconnect.png -> cam{self.cam_index}")
             return True
         return False
 
-    def _safe_remove(self, path):
-        try:
-            if os.path.exists(path):
-                os.remove(path)
-        except:
-            pass
-
 # ----------------------------------------------------------------------
-# Поток захвата
+# Камера: драйвер + захват, шаг выполняется планировщиком
 # ----------------------------------------------------------------------
-def capture_thread(cam_index, initial_url):
-    url = initial_url
-    driver = None
-    capture = None
+class CameraWorker:
+    def __init__(self, cam_index, initial_url, scheduler=None):
+        self.cam_index = cam_index
+        self.scheduler = scheduler
+        self.url = initial_url
+        self.driver = None
+        self.capture = None
+        self.started = False
+        self.pending_live = None  # команда смены URL, ждущая первого живого кадра
+        self.switch_started = None
+        self.switch_seq = 0
+        self.health = CameraHealth(cam_index)
+        self.created = time.time()
+        self.settings = CAMERA_CONTROL.settings(cam_index)
+        self.pending_settings = None  # применяются в начале следующего шага камеры
+        CAMERA_CONTROL.attach_health(cam_index, self.health)
+
+    def update_settings(self, settings):
+        self.pending_settings = dict(settings)
+
+    def apply_settings(self):
+        crop = self.settings.get("crop", CROP_X)
+        if self.driver:
+            self.driver.crop_x = crop
+            self.driver.quality = self.settings.get("quality", CDP_JPEG_QUALITY)
+            self.driver.clip = None
+        if self.capture:
+            self.capture.pipeline.crop_x = crop
+            self.capture.pipeline.quality = self.settings.get("quality", OUTPUT_QUALITY)
+
+    def restart_driver(self, new_url):
+        frame = FRAME_STORE.get(self.cam_index)
+        self.switch_seq = frame.seq if frame else 0
+        self.switch_started = time.time() if new_url else None
+
+        # === ЗАКРЫВАЕМ СТАРЫЙ ДРАЙВЕР ===
+        if self.driver:
+            old_driver, self.driver = self.driver, None
+            if WARM_POOL.size:
+                # Есть тёплый резерв — не ждём завершения старого Chrome
+                threading.Thread(target=old_driver.quit, daemon=True).start()
+            else:
+                try: old_driver.quit()
+                except: pass
+                time.sleep(1.5)
+
+        # === ЗАПУСКАЕМ НОВЫЙ ===
+        if new_url:
+            self.driver = open_camera(new_url, self.cam_index)
+            self.capture = FrameCapture(self.driver, self.cam_index)
+            self.apply_settings()
+            if self.scheduler:
+                # Видеопоток даёт кадры чаще скриншотов — при зрителях снимаем чаще CAPTURE_INTERVAL
+                streaming = isinstance(self.driver, StreamDriver) and STREAM_CAPTURE_INTERVAL
+                self.scheduler.set_active_fps(self.cam_index, 1.0 / STREAM_CAPTURE_INTERVAL if streaming else None)
+        else:
+            self.driver = None
+            self.capture = None
+            # При отключении — nocam.png
+            publish_placeholder(self.cam_index, "nocam.png")
 
-    def restart_driver(new_url):
-        nonlocal driver, capture
+    def launch(self):
+        # Запуск Chrome через общую очередь запусков: False — камера ждёт своей очереди
+        if not LAUNCH_GATE.acquire(self.cam_index, self.settings.get("priority", 0)):
+            return False
+        try:
+            self.restart_driver(self.url)
+        finally:
+            LAUNCH_GATE.release(self.cam_index)
+        return True
 
-        # === ПРОСТО ЗАКРЫВАЕМ СТАРЫЙ ДРАЙВЕР ===
+    def stop(self):
+        # Камера удалена: закрываем Chrome, зрителям — заглушка, кадр из хранилища убираем
+        driver, self.driver, self.capture = self.driver, None, None
         if driver:
             try: driver.quit()
             except: pass
-            driver = None
-        if capture:
-            capture._safe_remove(capture.temp_path)
+        publish_placeholder(self.cam_index, "nocam.png")
+        FRAME_STORE.discard(self.cam_index)
+        FRAME_HISTORY.forget(self.cam_index)
+        logging.info(f"cam{self.cam_index}: удалена")
+
+    def check_first_frame(self):
+        if self.switch_started is None:
+            return
+        frame = FRAME_STORE.get(self.cam_index)
+        if frame and frame.kind == "live" and frame.seq > self.switch_seq:
+            elapsed = frame.timestamp - self.switch_started
+            self.switch_started = None
+            CAMERA_CONTROL.report_first_frame(self.cam_index, elapsed)
+            logging.info(f"cam{self.cam_index}: первый кадр через {elapsed:.1f} сек")
+            # === ПОДТВЕРЖДЕНИЕ: НОВЫЙ URL ОТДАЁТ ЖИВЫЕ КАДРЫ ===
+            if self.pending_live:
+                CAMERA_CONTROL.update(self.pending_live, "live")
+                self.pending_live = None
+
+    def check_updates(self):
+        command = CAMERA_CONTROL.take(self.cam_index)
+        if command is None:
+            return False
 
-        time.sleep(1.5)
+        logging.info(f"API: cam{self.cam_index} → {command.url or 'отключена'}")
+        CAMERA_CONTROL.update(command, "applying")
+        self.url = command.url
+        logging.info(f"Перезапуск cam{self.cam_index} → {self.url or 'отключена'}")
+        self.health.reset()
+        # Chrome запускается мимо очереди запусков — место в ней (после неудачного recreate) освобождаем,
+        # иначе оно навсегда занимает очередь перед камерами с меньшим приоритетом
+        LAUNCH_GATE.cancel(self.cam_index)
+        try:
+            self.restart_driver(self.url)
+        except Exception as e:
+            CAMERA_CONTROL.update(command, "failed", str(e))
+            logging.error(f"Не удалось перезапустить cam{self.cam_index}: {e}")
+            return True
 
-        # === ЗАПУСКАЕМ НОВЫЙ ===
-        if new_url:
-            driver = BrowserDriver(new_url, cam_index)
-            capture = FrameCapture(driver, cam_index)
+        if self.url and not (self.driver and self.driver.driver):
+            CAMERA_CONTROL.update(command, "failed", "страница не загрузилась")
         else:
-            driver = None
-            capture = None
-            # При отключении — nocam.png
-            nocam_src = resource_path(os.path.join("resource", "nocam.png"))
-            target = os.path.join("capture", f"cam{cam_index}", "current.png")
-            if os.path.exists(nocam_src):
-                shutil.copy2(nocam_src, target)
-                os.utime(target, None)
+            CAMERA_CONTROL.update(command, "applied")
+            self.pending_live = command if self.url else None
+        return True
 
-    restart_driver(url)
+    def tick(self):
+        if self.pending_settings is not None:
+            self.settings, self.pending_settings = self.pending_settings, None
+            self.apply_settings()
+            logging.info(f"cam{self.cam_index}: новые настройки {self.settings}")
+
+        if not self.started:
+            if self.url:
+                if not self.launch():
+                    return
+                # Время до первого кадра — от создания камеры, вместе с ожиданием очереди
+                self.switch_started = self.created
+            else:
+                self.restart_driver(None)
+            self.started = True
+            return
 
-    while True:
-        updated = False
-        try:
-            while True:
-                event = URL_UPDATE_QUEUE.get_nowait()
-                if isinstance(event, tuple) and len(event) == 2:
-                    cam_id, new_url = event
-                    if cam_id == cam_index:
-                        logging.info(f"API: cam{cam_index} → {new_url or 'отключена'}")
-                        if new_url != url:
-                            url = new_url
-                            logging.info(f"Перезапуск cam{cam_index} → {url or 'отключена'}")
-                            restart_driver(url)
-                        updated = True
-                        break
-                    else:
-                        # Чужое событие — возвращаем в очередь
-                        URL_UPDATE_QUEUE.put(event)
-        except:
-            pass
-
-        if updated:
-            time.sleep(CAPTURE_INTERVAL)
-            continue
-
-        if capture:
-            capture.capture()
-        time.sleep(CAPTURE_INTERVAL)
+        if self.check_updates():
+            return
+
+        if not self.capture:
+            return
+
+        # === ПЕРЕЗАГРУЗКИ С ЭКСПОНЕНЦИАЛЬНОЙ ПАУЗОЙ И РАЗМЫКАНИЕМ ЦЕПИ ===
+        action = self.health.action()
+        if action == "wait":
+            return
+        if action == "reload":
+            self.health.record_attempt("reload")
+            RELOADS.inc(cam=self.cam_index, kind="reload")
+            self.driver.reload_via_url()
+            return
+        if action == "recreate":
+            if not LAUNCH_GATE.acquire(self.cam_index, self.settings.get("priority", 0)):
+                return
+            logging.info(f"cam{self.cam_index}: полный перезапуск Chrome ({self.health.state})")
+            self.health.record_attempt("recreate")
+            RELOADS.inc(cam=self.cam_index, kind="recreate")
+            try:
+                self.restart_driver(self.url)
+            finally:
+                LAUNCH_GATE.release(self.cam_index)
+            return
+
+        if self.capture.capture():
+            previous = self.health.record_success()
+            if previous != HEALTHY:
+                logging.info(f"cam{self.cam_index}: восстановлена ({previous} -> {HEALTHY})")
+            self.check_first_frame()
+            return
+
+        previous = self.health.record_failure(self.capture.last_error)
+        state = self.health.state
+        if state != previous:
+            logging.warning(f"cam{self.cam_index}: {previous} -> {state} ({self.capture.last_error})")
+            # Заглушку показываем один раз при потере связи, а не на каждом кадре
+            if state in (RECONNECTING, OPEN) and previous not in (RECONNECTING, OPEN):
+                self.capture.save_noconnect()
+
+# ----------------------------------------------------------------------
+# Добавление/удаление камер на лету (остальные камеры не перезапускаются)
+# ----------------------------------------------------------------------
+WORKERS = {}
+
+def camera_fps(cam_id, settings):
+    interval = settings.get("interval")
+    return 1.0 / interval if interval else CAMERA_FPS.get(cam_id)
+
+def start_camera(scheduler, cam_id, url):
+    worker = CameraWorker(cam_id, url, scheduler)
+    WORKERS[cam_id] = worker
+    if url:
+        # Место в очереди запусков — сразу, чтобы приоритет учитывался до первого шага
+        LAUNCH_GATE.enqueue(cam_id, worker.settings.get("priority", 0))
+    scheduler.add(cam_id, worker.tick, fps=camera_fps(cam_id, worker.settings))
+    return worker
+
+def apply_camera_settings(scheduler, cam_id, settings):
+    # Интервал — сразу в планировщик; качество и обрезка — на следующем шаге камеры
+    scheduler.set_fps(cam_id, camera_fps(cam_id, settings))
+    worker = WORKERS.get(cam_id)
+    if worker:
+        worker.update_settings(settings)
+
+def stop_camera(scheduler, cam_id):
+    scheduled = scheduler.remove(cam_id)
+    worker = WORKERS.pop(cam_id, None)
+    LAUNCH_GATE.cancel(cam_id)
+
+    def _stop():
+        # Ждём текущий шаг камеры, затем закрываем её Chrome
+        if scheduled:
+            scheduler.wait_idle(scheduled, 60)
+        if worker:
+            worker.stop()
+    threading.Thread(target=_stop, daemon=True, name=f"stop-cam{cam_id}").start()
+
+def capture_process_main(index, cameras, commands, events):
+    # Процесс захвата (CAPTURE_PROCESSES > 0): свои Chrome, планировщик и CameraWorker
+    setup_worker_logging(events)
+    import capture_process
+    if CAMERAS_PER_BROWSER <= 1:
+        warm_url = WARM_URL or next((u.split("#")[0] for u, *_ in cameras.values() if u), None)
+        WARM_POOL.start(math.ceil(WARM_POOL_SIZE / CAPTURE_PROCESSES), warm_url)
+    scheduler = CaptureScheduler(
+        max_workers=math.ceil(CAPTURE_WORKERS / CAPTURE_PROCESSES),
+        active_fps=1.0 / CAPTURE_INTERVAL,
+        idle_fps=1.0 / IDLE_CAPTURE_INTERVAL,
+        viewers=capture_process.ring_viewers,
+    )
+    LAUNCH_GATE.limit = math.ceil(STARTUP_CONCURRENCY / CAPTURE_PROCESSES)
+    LAUNCH_GATE.on_wake = scheduler.wake
+    try:
+        capture_process.run_worker(index, cameras, commands, events, scheduler,
+                                   start_camera, stop_camera, apply_camera_settings)
+    finally:
+        for cam_id in list(WORKERS):
+            WORKERS.pop(cam_id).stop()
+        WARM_POOL.shutdown()
 
 # ----------------------------------------------------------------------
 # Веб-сервер
@@ -433,65 +898,115 @@ if __name__ == "__main__":
     exit_if_port_busy()
 
     config = ConfigManager()
-    threads = []
-
-    for i in range(9):
-        url = config.urls[i] if i < len(config.urls) else None
-        CAM_URLS[i] = url
 
-    for i in range(9):
-        url = CAM_URLS[i]
-        t = threading.Thread(target=capture_thread, args=(i+1, url), daemon=True)
-        t.start()
-        threads.append(t)
+    for cam_id, url in sorted(config.cameras.items()):
+        CAMERA_CONTROL.register(cam_id, url, config.settings.get(cam_id))
+    urls = CAMERA_CONTROL.urls()
+
+    # История кадров (и запись на диск) — в веб-процессе, куда приходят все кадры
+    FRAME_HISTORY.start()
+
+    # === ДО ЗАПУСКА CHROME: ПОСЛЕДНИЕ ЖИВЫЕ КАДРЫ С ПРОШЛОГО ЗАПУСКА (STALE) ===
+    READINESS.start()
+    publish_last_good([cam_id for cam_id, url in sorted(urls.items()) if url])
+
+    if CAPTURE_PROCESSES > 0:
+        # === ЗАХВАТ В ОТДЕЛЬНЫХ ПРОЦЕССАХ, КАДРЫ ЧЕРЕЗ ОБЩУЮ ПАМЯТЬ ===
+        from capture_process import CaptureSupervisor
+        scheduler = CaptureSupervisor(CAPTURE_PROCESSES, capture_process_main)
+        CAMERA_CONTROL.on_command = scheduler.forward_command
+        add_camera = scheduler.add_camera
+
+        def remove_camera(cam_id):
+            # После удаления кадры камеры не приходят — историю можно забыть сразу
+            scheduler.remove_camera(cam_id, publish_placeholder)
+            FRAME_HISTORY.forget(cam_id)
+
+        CAMERA_CONTROL.on_settings = scheduler.forward_settings
+        scheduler.start(urls)
+    else:
+        if CAMERAS_PER_BROWSER <= 1:
+            warm_url = WARM_URL or next((u.split("#")[0] for u in urls.values() if u), None)
+            WARM_POOL.start(WARM_POOL_SIZE, warm_url)
+
+        scheduler = CaptureScheduler(
+            max_workers=CAPTURE_WORKERS,
+            active_fps=1.0 / CAPTURE_INTERVAL,
+            idle_fps=1.0 / IDLE_CAPTURE_INTERVAL,
+            viewers=FRAME_STORE.viewers,
+        )
+        LAUNCH_GATE.on_wake = scheduler.wake
+        for cam_id, url in sorted(urls.items()):
+            start_camera(scheduler, cam_id, url)
+        CAMERA_CONTROL.on_command = scheduler.wake
+        add_camera = lambda cam_id, url: start_camera(scheduler, cam_id, url)
+        remove_camera = lambda cam_id: stop_camera(scheduler, cam_id)
+        CAMERA_CONTROL.on_settings = lambda cam_id, settings: apply_camera_settings(scheduler, cam_id, settings)
+        scheduler.start()
+
+    # === Добавление/удаление камер на лету (время до первого кадра — в /ready) ===
+    def on_add(cam_id, url):
+        READINESS.camera_started(cam_id)
+        add_camera(cam_id, url)
+
+    def on_remove(cam_id):
+        READINESS.forget(cam_id)
+        remove_camera(cam_id)
+
+    CAMERA_CONTROL.on_add = on_add
+    CAMERA_CONTROL.on_remove = on_remove
+
+    # === url.yaml: изменения файла применяются на лету, изменения API записываются в файл ===
+    CAMERA_CONTROL.on_config_change = config.schedule_save
+    config.watch()
 
     web_thread = start_web_server()
 
     try:
-        from web_server import set_update_queue
-        set_update_queue(URL_UPDATE_QUEUE)
-        logging.info("Очередь обновлений URL передана в web_server")
+        from web_server import set_capture_scheduler
+        set_capture_scheduler(scheduler)
+        logging.info("Планировщик захвата передан в web_server")
     except Exception as e:
-        logging.error(f"Не удалось передать очередь: {e}")
+        logging.error(f"Не удалось передать планировщик: {e}")
 
-    last_log_date = datetime.now().strftime("%Y%m%d")
     NOCAM_PATH = resource_path(os.path.join("resource", "nocam.png"))
     if not os.path.exists(NOCAM_PATH):
         logging.warning("Заглушка nocam.png не найдена")
 
     try:
         print(f"\nПриложение запущено.")
-        print(f"Интервал захвата: {CAPTURE_INTERVAL} сек")
+        print(f"Интервал захвата: {CAPTURE_INTERVAL} сек (без зрителей: {IDLE_CAPTURE_INTERVAL} сек)")
+        print(f"Потоков захвата: {CAPTURE_WORKERS}")
+        print(f"Процессов захвата: {CAPTURE_PROCESSES or 'нет (потоки веб-процесса)'}")
+        print(f"Способ захвата: {CAPTURE_BACKEND}")
+        print(f"Прямой приём видеопотока: {INGEST_BACKEND == 'auto' and stream_ingest.available() and f'да (PyAV), интервал {STREAM_CAPTURE_INTERVAL or CAPTURE_INTERVAL} сек' or 'нет'}")
+        print(f"Камер на один Chrome: {CAMERAS_PER_BROWSER}")
+        print(f"Тёплый резерв Chrome: {WARM_POOL.size}")
+        print(f"Одновременных запусков Chrome: {STARTUP_CONCURRENCY}")
         print(f"Веб: http://localhost:5000")
-        print(f"VLC: http://localhost:5000/stream/cam1 ... /stream/cam9")
-        print(f"API: POST /api/set_urls → сменить URL")
+        print(f"Камер: {len(urls)} ({', '.join(f'cam{c}' for c in sorted(urls))})")
+        print(f"VLC: http://localhost:5000/stream/cam<N>")
+        print(f"Готовность: http://localhost:5000/ready")
+        print(f"API: POST /api/set_urls → сменить URL, PUT /api/cams/<N> → одна камера")
+        print(f"API: POST /api/cams → добавить камеру, DELETE /api/cams/<N> → удалить")
         print(f"Для остановки: Ctrl+C\n")
 
         while True:
-            now = datetime.now()
-            today_str = now.strftime("%Y%m%d")
-            if last_log_date != today_str:
-                rotate_log_if_needed()
-                last_log_date = today_str
             time.sleep(60)
 
     except KeyboardInterrupt:
         print("\n\nПолучен сигнал завершения (Ctrl+C)...")
         logging.info("Инициация graceful shutdown...")
 
-        # === 1. КОПИРУЕМ ЗАГЛУШКУ СРАЗУ ===
+        # === 1. ПУБЛИКУЕМ ЗАГЛУШКУ СРАЗУ ===
         if os.path.exists(NOCAM_PATH):
-            for cam_id in range(1, 10):
-                folder = os.path.join("capture", f"cam{cam_id}")
-                target = os.path.join(folder, "current.png")
+            for cam_id in CAMERA_CONTROL.cameras():
                 try:
-                    if os.path.exists(folder):
-                        shutil.copy2(NOCAM_PATH, target)
-                        os.utime(target, None)  # Обновляем mtime
+                    if publish_placeholder(cam_id, "nocam.png"):
                         logging.info(f"Заглушка -> cam{cam_id}")
                         print(f"  cam{cam_id} → заглушка")
                 except Exception as e:
-                    logging.error(f"Ошибка копирования в cam{cam_id}: {e}")
+                    logging.error(f"Ошибка публикации заглушки cam{cam_id}: {e}")
 
         # === 2. ЖДЁМ, ЧТОБЫ MJPEG ОТПРАВИЛ ЗАГЛУШКУ ===
         print("  Ожидание 3 сек для доставки заглушки клиентам...")
@@ -505,6 +1020,9 @@ if __name__ == "__main__":
             logging.warning(f"Не удалось завершить сервер: {e}")
 
         time.sleep(3)
+        if CAPTURE_PROCESSES > 0:
+            scheduler.shutdown()
+        WARM_POOL.shutdown()
         cleanup_processes()
         print("Приложение завершено.\n")
         sys.exit(0)
\ No newline at end of file
@@ -0,0 +1,173 @@
+# metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# ----------------------------------------------------------------------
+# Метрики в текстовом формате Prometheus (без внешних зависимостей)
+# ----------------------------------------------------------------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (16384, 32768, 65536, 131072, 262144, 524288, 1048576, 2097152)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, None, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_labels(self.label_names, key, extra)} {_number(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        super().__init__(name, help_text, labels)
+        # callback() -> {(значения меток): значение} — вычисляется при опросе /metrics
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.callback is None:
+            return super().samples()
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return [(self.name, tuple(key) if isinstance(key, tuple) else (key,), None, value)
+                for key, value in values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [счётчики по корзинам (последняя — +Inf), сумма]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        result = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                result.append((f"{self.name}_bucket", key, f'le="{_number(float(bound))}"', cumulative))
+            result.append((f"{self.name}_sum", key, None, round(total, 6)))
+            result.append((f"{self.name}_count", key, None, cumulative))
+        return result
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), callback=None):
+        return self.register(Gauge(name, help_text, labels, callback))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# ----------------------------------------------------------------------
+# Общие метрики захвата и раздачи
+# ----------------------------------------------------------------------
+CAPTURE_STAGE_SECONDS = REGISTRY.histogram(
+    "camserver_capture_stage_seconds", "Длительность этапа захвата кадра", ("cam", "stage"))
+CAPTURE_FRAMES = REGISTRY.counter(
+    "camserver_capture_frames_total", "Результаты захвата кадра", ("cam", "result"))
+RELOADS = REGISTRY.counter(
+    "camserver_reloads_total", "Перезагрузки страницы и перезапуски Chrome", ("cam", "kind"))
+NOCONNECT = REGISTRY.counter(
+    "camserver_noconnect_total", "Показы заглушки noconnect", ("cam",))
+JPEG_ENCODE_SECONDS = REGISTRY.histogram(
+    "camserver_jpeg_encode_seconds", "Время кодирования JPEG", ("path",))
+JPEG_BYTES = REGISTRY.histogram(
+    "camserver_jpeg_bytes", "Размер закодированного JPEG", ("path",), SIZE_BUCKETS)
+STREAM_BYTES = REGISTRY.counter(
+    "camserver_stream_bytes_total", "Отправлено байт MJPEG-клиентам", ("cam",))
+STREAM_FRAMES = REGISTRY.counter(
+    "camserver_stream_frames_total", "Отправлено кадров MJPEG-клиентам", ("cam",))
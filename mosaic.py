@@ -0,0 +1,200 @@
+# mosaic.py
+import io
+import logging
+import math
+import os
+import threading
+import time
+
+from PIL import Image
+
+from frame_store import FRAME_STORE
+from frame_pipeline import sniff_format
+
+# ----------------------------------------------------------------------
+# Импорт resource_path
+# ----------------------------------------------------------------------
+try:
+    from main import resource_path
+except ImportError:
+    def resource_path(relative_path):
+        return os.path.join(os.path.abspath("."), relative_path)
+
+# ----------------------------------------------------------------------
+# Конфигурация
+# ----------------------------------------------------------------------
+MOSAIC_TILE = (640, 360)      # размер ячейки, кадр вписывается с сохранением пропорций
+MOSAIC_FPS = 2                # частота сборки мозаики
+MOSAIC_QUALITY = 75
+MOSAIC_IDLE_TIMEOUT = 10      # сек без зрителей — сборка останавливается
+MOSAIC_MAX_CAMS = 16
+MOSAIC_MAX_LAYOUTS = 8        # одновременных сборок; у каждой свой поток и кодирование JPEG
+
+# ----------------------------------------------------------------------
+# Ячейки: кадр камеры -> уменьшенное изображение (кэш по номеру кадра)
+# ----------------------------------------------------------------------
+_PLACEHOLDER_TILES = {}
+_PLACEHOLDER_LOCK = threading.Lock()
+
+def fit_tile(img, tile=MOSAIC_TILE):
+    img = img.convert("RGB")
+    scale = min(tile[0] / img.width, tile[1] / img.height)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    canvas = Image.new("RGB", tile)
+    canvas.paste(img.resize(size, Image.BILINEAR), ((tile[0] - size[0]) // 2, (tile[1] - size[1]) // 2))
+    return canvas
+
+def decode_tile(data, tile=MOSAIC_TILE):
+    with Image.open(io.BytesIO(data)) as img:
+        if sniff_format(data) == "JPEG":
+            # Декодируем сразу в уменьшенном масштабе
+            img.draft("RGB", tile)
+        return fit_tile(img, tile)
+
+def placeholder_tile(name, tile=MOSAIC_TILE):
+    key = (name, tile)
+    with _PLACEHOLDER_LOCK:
+        cached = _PLACEHOLDER_TILES.get(key)
+        if cached is not None:
+            return cached
+        try:
+            with open(resource_path(os.path.join("resource", name)), 'rb') as f:
+                cached = decode_tile(f.read(), tile)
+        except Exception as e:
+            logging.warning(f"[MOSAIC] Заглушка {name} недоступна: {e}")
+            cached = Image.new("RGB", tile)
+        _PLACEHOLDER_TILES[key] = cached
+        return cached
+
+# ----------------------------------------------------------------------
+# Сборщик мозаики: одна сборка и одно кодирование на всех зрителей
+# ----------------------------------------------------------------------
+def mosaic_key(cams, cols):
+    return f"mosaic-{cols}x{','.join(map(str, cams))}"
+
+class MosaicLayout:
+    def __init__(self, key, cams, cols):
+        self.key = key
+        self.cams = tuple(cams)
+        self.cols = cols
+        self.rows = math.ceil(len(self.cams) / cols)
+        self.tiles = {}        # cam_id -> (seq, tile)
+        self.composed = 0
+        self.tile_decodes = 0
+        self.last_seen = time.time()  # последний зритель или запрос мозаики
+        self.thread = None
+
+    def _tile(self, cam_id):
+        frame = FRAME_STORE.get(cam_id)
+        if frame is None:
+            return placeholder_tile("nocam.png")
+        if frame.kind in ("nocam", "noconnect"):
+            return placeholder_tile(f"{frame.kind}.png")
+        cached = self.tiles.get(cam_id)
+        if cached and cached[0] == frame.seq:
+            return cached[1]
+        try:
+            tile = decode_tile(frame.data)
+        except Exception as e:
+            logging.warning(f"[MOSAIC] cam{cam_id}: кадр не декодирован: {e}")
+            return cached[1] if cached else placeholder_tile("noconnect.png")
+        self.tile_decodes += 1
+        self.tiles[cam_id] = (frame.seq, tile)
+        return tile
+
+    def _version(self):
+        version = []
+        for cam_id in self.cams:
+            frame = FRAME_STORE.get(cam_id)
+            version.append(frame.seq if frame else 0)
+        return tuple(version)
+
+    def compose(self):
+        width, height = MOSAIC_TILE
+        canvas = Image.new("RGB", (self.cols * width, self.rows * height))
+        for i, cam_id in enumerate(self.cams):
+            canvas.paste(self._tile(cam_id), ((i % self.cols) * width, (i // self.cols) * height))
+        buf = io.BytesIO()
+        canvas.save(buf, format="JPEG", quality=MOSAIC_QUALITY)
+        self.composed += 1
+        return buf.getvalue()
+
+    def publish(self):
+        version = self._version()
+        FRAME_STORE.publish(self.key, self.compose(), kind="mosaic")
+        return version
+
+    def run(self, manager, last_version=None):
+        interval = 1.0 / MOSAIC_FPS
+        while True:
+            started = time.time()
+            if FRAME_STORE.viewers(self.key) > 0:
+                self.last_seen = started
+            elif started - self.last_seen >= MOSAIC_IDLE_TIMEOUT and manager._retire(self):
+                return
+
+            # Пересобираем только если у какой-то камеры новый кадр
+            if self._version() != last_version:
+                try:
+                    last_version = self.publish()
+                except Exception as e:
+                    logging.error(f"[MOSAIC] {self.key}: ошибка сборки: {e}")
+            time.sleep(max(0.0, interval - (time.time() - started)))
+
+    def to_dict(self):
+        return {
+            "cams": list(self.cams),
+            "cols": self.cols,
+            "rows": self.rows,
+            "composed": self.composed,
+            "tile_decodes": self.tile_decodes,
+            "viewers": FRAME_STORE.viewers(self.key),
+        }
+
+
+class MosaicManager:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._layouts = {}
+
+    def ensure(self, cams, cols=None):
+        # Ключ мозаики в FRAME_STORE (None — сборок уже MOSAIC_MAX_LAYOUTS); сборка запускается при первом зрителе
+        cams = tuple(cams)[:MOSAIC_MAX_CAMS]
+        cols = min(cols or math.ceil(math.sqrt(len(cams))), len(cams))
+        key = mosaic_key(cams, cols)
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is None:
+                if len(self._layouts) >= MOSAIC_MAX_LAYOUTS:
+                    logging.warning(f"[MOSAIC] {key}: отказ, уже {len(self._layouts)} сборок")
+                    return None
+                layout = self._layouts[key] = MosaicLayout(key, cams, cols)
+                # Первый кадр собираем сразу — зритель не увидит заглушку
+                try:
+                    version = layout.publish()
+                except Exception as e:
+                    logging.error(f"[MOSAIC] {key}: ошибка сборки: {e}")
+                    version = None
+                layout.thread = threading.Thread(target=layout.run, args=(self, version), daemon=True)
+                layout.thread.start()
+                logging.info(f"[MOSAIC] Запущена сборка {key}")
+            layout.last_seen = time.time()
+        return key
+
+    def _retire(self, layout):
+        with self._lock:
+            if FRAME_STORE.viewers(layout.key) > 0 or time.time() - layout.last_seen < MOSAIC_IDLE_TIMEOUT:
+                return False
+            self._layouts.pop(layout.key, None)
+            # Под блокировкой: ensure того же ключа не успеет опубликовать новый кадр до discard
+            FRAME_STORE.discard(layout.key)
+        logging.info(f"[MOSAIC] Остановлена сборка {layout.key}: нет зрителей")
+        return True
+
+    def stats(self):
+        with self._lock:
+            layouts = list(self._layouts.values())
+        return {layout.key: layout.to_dict() for layout in layouts}
+
+
+MOSAIC = MosaicManager()
@@ -0,0 +1,226 @@
+# startup.py
+import io
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from PIL import Image, ImageDraw, ImageFont
+
+from frame_store import FRAME_STORE
+from camera_control import CAMERA_CONTROL
+
+# ----------------------------------------------------------------------
+# Конфигурация
+# ----------------------------------------------------------------------
+STARTUP_CONCURRENCY = 3             # одновременных запусков Chrome/загрузок страницы
+SNAPSHOT_DIR = "capture"            # capture/cam<N>/current.* и last_good.*
+LAST_GOOD_NAME = "last_good"        # последний живой кадр — показывается после перезапуска
+LAST_GOOD_MAX_AGE = 24 * 3600       # сек, более старый кадр не показываем
+STALE_QUALITY = 80
+
+# ----------------------------------------------------------------------
+# Очередь запусков: не больше STARTUP_CONCURRENCY Chrome одновременно,
+# камеры с меньшим priority — первыми
+# ----------------------------------------------------------------------
+class LaunchGate:
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._pending = {}      # cam_id -> (priority, время постановки)
+        self._active = {}       # cam_id -> время начала запуска
+        self.on_wake = None     # on_wake(cam_id) — слот освободился, камера может запускаться
+        self.launches = 0
+        self.waited = 0.0
+
+    def enqueue(self, cam_id, priority=0):
+        with self._lock:
+            if cam_id not in self._active:
+                self._pending.setdefault(cam_id, (priority, time.time()))
+
+    def _ranked(self):
+        return sorted(self._pending, key=lambda c: (self._pending[c][0], self._pending[c][1], c))
+
+    def acquire(self, cam_id, priority=0):
+        # Без ожидания: False — камера ждёт своей очереди, шаг планировщика не занимается
+        with self._lock:
+            self._pending.setdefault(cam_id, (priority, time.time()))
+            free = self.limit - len(self._active)
+            if free <= 0 or cam_id not in self._ranked()[:free]:
+                return False
+            _, queued = self._pending.pop(cam_id)
+            now = time.time()
+            self._active[cam_id] = now
+            self.launches += 1
+            self.waited += now - queued
+            return True
+
+    def release(self, cam_id):
+        # Будим запущенную камеру (первый кадр — сразу, а не через период) и следующие в очереди
+        with self._lock:
+            launched = self._active.pop(cam_id, None) is not None
+            wake = self._ranked()[:max(0, self.limit - len(self._active))]
+        if launched:
+            wake.insert(0, cam_id)
+        if self.on_wake:
+            for next_cam in wake:
+                self.on_wake(next_cam)
+
+    def cancel(self, cam_id):
+        with self._lock:
+            self._pending.pop(cam_id, None)
+        self.release(cam_id)
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            return {
+                "limit": self.limit,
+                "launching": {c: round(now - t, 1) for c, t in self._active.items()},
+                "queued": self._ranked(),
+                "launches": self.launches,
+                "avg_wait": round(self.waited / self.launches, 2) if self.launches else None,
+            }
+
+
+LAUNCH_GATE = LaunchGate(STARTUP_CONCURRENCY)
+
+# ----------------------------------------------------------------------
+# Последний живой кадр с прошлого запуска — до первого живого кадра, с пометкой
+# ----------------------------------------------------------------------
+def last_good_path(cam_id):
+    folder = os.path.join(SNAPSHOT_DIR, f"cam{cam_id}")
+    for ext in ("jpg", "png"):
+        path = os.path.join(folder, f"{LAST_GOOD_NAME}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def mark_stale(data, taken_at):
+    # Полоса сверху: «STALE» и время снятия кадра — видно в VLC, мозаике и на снимке
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    draw = ImageDraw.Draw(img, "RGBA")
+    height = max(24, img.height // 18)
+    try:
+        font = ImageFont.load_default(size=int(height * 0.7))
+    except TypeError:
+        font = ImageFont.load_default()
+    draw.rectangle((0, 0, img.width, height), fill=(180, 0, 0, 170))
+    label = f"STALE  {datetime.fromtimestamp(taken_at):%Y-%m-%d %H:%M:%S}"
+    draw.text((height // 3, height // 8), label, fill=(255, 255, 255), font=font)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=STALE_QUALITY)
+    return buf.getvalue()
+
+def publish_last_good(cam_ids):
+    # Вызывается до запуска захвата; живой кадр заменит заглушку сам
+    published = []
+    for cam_id in cam_ids:
+        path = last_good_path(cam_id)
+        if path is None:
+            continue
+        try:
+            taken_at = os.path.getmtime(path)
+            if time.time() - taken_at > LAST_GOOD_MAX_AGE:
+                continue
+            with open(path, "rb") as f:
+                data = mark_stale(f.read(), taken_at)
+        except Exception as e:
+            logging.warning(f"cam{cam_id}: не удалось загрузить последний кадр {path}: {e}")
+            continue
+        FRAME_STORE.publish(cam_id, data, kind="stale")
+        published.append(cam_id)
+    if published:
+        logging.info(f"Последние кадры с прошлого запуска (stale): {published}")
+    return published
+
+# ----------------------------------------------------------------------
+# Готовность: у каждой включённой камеры был живой кадр или она уже в переподключении.
+# Однажды готовый сервер остаётся готовым — новая камера не возвращает /ready в 503
+# ----------------------------------------------------------------------
+class Readiness:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.ready_at = None
+        self._since = {}        # cam_id -> время запуска камеры
+        self._first_live = {}   # cam_id -> сек от запуска до первого живого кадра
+
+    def start(self):
+        self.started = time.time()
+        FRAME_STORE.add_listener(self._on_publish)
+
+    def _on_publish(self, cam_id, frame):
+        if not isinstance(cam_id, int):
+            return
+        if frame.kind == "live":
+            with self._lock:
+                if cam_id not in self._first_live:
+                    since = self._since.get(cam_id, self.started)
+                    self._first_live[cam_id] = round(frame.timestamp - since, 2)
+        # Первый живой кадр или заглушка noconnect (переход в переподключение) — момент готовности
+        # фиксируется здесь, а не при первом опросе /ready
+        if self.ready_at is None:
+            self._check_ready(self._states(frame.timestamp), frame.timestamp)
+
+    def camera_started(self, cam_id):
+        # Камера добавлена на ходу — время до первого кадра считаем от добавления
+        with self._lock:
+            self._since[cam_id] = time.time()
+            self._first_live.pop(cam_id, None)
+
+    def forget(self, cam_id):
+        with self._lock:
+            self._since.pop(cam_id, None)
+            self._first_live.pop(cam_id, None)
+
+    def _states(self, now):
+        cams = {}
+        for cam_id in CAMERA_CONTROL.cameras():
+            status = CAMERA_CONTROL.status(cam_id)
+            if status is None:
+                continue
+            frame = FRAME_STORE.get(cam_id)
+            with self._lock:
+                first_live = self._first_live.get(cam_id)
+                since = self._since.get(cam_id, self.started)
+            health = status.get("health") or {}
+            if not status["url"]:
+                state = "disabled"
+            elif first_live is not None:
+                state = "live"
+            elif health.get("state") in ("reconnecting", "open") or (frame and frame.kind == "noconnect"):
+                state = "failed"
+            else:
+                state = "starting"
+            cams[f"cam{cam_id}"] = {
+                "state": state,
+                "frame": frame.kind if frame else None,
+                "time_to_first_frame": first_live,
+                "waiting": round(now - since, 1) if state == "starting" else None,
+            }
+        return cams
+
+    def _check_ready(self, cams, now):
+        with self._lock:
+            if self.ready_at is not None or any(c["state"] == "starting" for c in cams.values()):
+                return
+            self.ready_at = now
+        logging.info(f"Все камеры запущены за {now - self.started:.1f} сек")
+
+    def payload(self):
+        now = time.time()
+        cams = self._states(now)
+        # Без новых кадров (камеру удалили, состояние здоровья пришло позже кадра) — при опросе
+        self._check_ready(cams, now)
+        return {
+            "ready": self.ready_at is not None,
+            "uptime": round(now - self.started, 1),
+            "ready_after": round(self.ready_at - self.started, 1) if self.ready_at else None,
+            "launch": LAUNCH_GATE.stats(),
+            "cams": cams,
+        }
+
+
+READINESS = Readiness()
@@ -0,0 +1,171 @@
+# stream_clients.py
+import itertools
+import logging
+import socket
+import threading
+import time
+
+from metrics import REGISTRY, LATENCY_BUCKETS
+
+# ----------------------------------------------------------------------
+# Конфигурация
+# ----------------------------------------------------------------------
+STREAM_MAX_LAG = 5.0            # сек от публикации кадра до записи в сокет; больше — клиент отстаёт
+STREAM_STALL_TIMEOUT = 20       # сек: запись не завершилась или клиент отстаёт дольше — отключаем
+STREAM_MAX_FPS = 0              # кадров/с на клиента (0 — без ограничения); ?fps= может только снизить
+STREAM_MAX_KBPS = 0             # Кбит/с на клиента (0 — без ограничения); ?kbps= может только снизить
+STREAM_SNDBUF = 128 * 1024      # буфер отправки сокета: меньше буфер — меньше старых кадров «в пути»
+
+STREAM_LAG_SECONDS = REGISTRY.histogram(
+    "camserver_stream_lag_seconds", "Задержка от публикации кадра до записи клиенту", ("cam",),
+    LATENCY_BUCKETS + (30, 60))
+STREAM_DROPPED = REGISTRY.counter(
+    "camserver_stream_dropped_frames_total", "Кадры, пропущенные медленными клиентами", ("cam",))
+STREAM_DISCONNECTS = REGISTRY.counter(
+    "camserver_stream_disconnects_total", "Отключения MJPEG-клиентов сервером", ("cam", "reason"))
+
+def client_limits(args):
+    # (кадров/с, байт/с) для клиента; None — ошибка в параметрах
+    try:
+        fps = float(args.get('fps')) if args.get('fps') else 0.0
+        kbps = float(args.get('kbps')) if args.get('kbps') else 0.0
+    except (TypeError, ValueError):
+        return None
+    if fps < 0 or kbps < 0:
+        return None
+    fps = min(c for c in (fps, STREAM_MAX_FPS) if c) if fps or STREAM_MAX_FPS else 0.0
+    kbps = min(c for c in (kbps, STREAM_MAX_KBPS) if c) if kbps or STREAM_MAX_KBPS else 0.0
+    return fps, kbps * 1000 / 8
+
+def tune_socket(sock, blocking_timeout=True):
+    # Маленький буфер отправки: медленный клиент не копит в ядре минуты видео
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, STREAM_SNDBUF)
+        if blocking_timeout:
+            # Зависшая запись (клиент не читает) завершится ошибкой — поток сервера освободится
+            sock.settimeout(STREAM_STALL_TIMEOUT)
+    except (OSError, AttributeError) as e:
+        logging.debug(f"Настройка сокета клиента: {e}")
+
+# ----------------------------------------------------------------------
+# Клиент потока: темп отправки, задержка и пропуски
+# ----------------------------------------------------------------------
+class StreamClient:
+    def __init__(self, client_id, cam_id, peer=None, fps=0.0, bytes_per_sec=0.0):
+        self.id = client_id
+        self.cam_id = cam_id
+        self.peer = peer
+        self.fps = fps
+        self.bytes_per_sec = bytes_per_sec
+        self.started = time.time()
+        self.last_seq = 0
+        self.next_send = 0.0
+        self.sent = 0
+        self.dropped = 0
+        self.bytes = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.write_time = 0.0
+        self.behind_since = None
+        self.closed_reason = None
+
+    def delay(self, now=None):
+        # Сколько ждать до следующей отправки (ограничения кадров/с и полосы)
+        return max(0.0, self.next_send - (now or time.time()))
+
+    def record(self, frame, size, write_started, now=None):
+        # Кадр записан в сокет; frame None — повтор (keep-alive), задержку не считаем
+        now = now or time.time()
+        self.sent += 1
+        self.bytes += size
+        self.write_time = now - write_started
+        interval = 1.0 / self.fps if self.fps else 0.0
+        if self.bytes_per_sec:
+            interval = max(interval, size / self.bytes_per_sec)
+        self.next_send = write_started + interval
+        if frame is None:
+            return
+        if self.last_seq and frame.seq > self.last_seq + 1:
+            skipped = frame.seq - self.last_seq - 1
+            self.dropped += skipped
+            STREAM_DROPPED.inc(skipped, cam=self.cam_id)
+        self.last_seq = frame.seq
+        # Кадр старше подключения (камера стоит или отключена) — считаем от подключения:
+        # возраст кадра — не очередь к клиенту
+        self.lag = now - max(frame.timestamp, self.started)
+        self.max_lag = max(self.max_lag, self.lag)
+        STREAM_LAG_SECONDS.observe(self.lag, cam=self.cam_id)
+        if self.lag <= STREAM_MAX_LAG:
+            self.behind_since = None
+        elif self.behind_since is None:
+            self.behind_since = now
+
+    def caught_up(self):
+        # Новых кадров нет — к клиенту ничего не копится, отставание кончилось
+        self.behind_since = None
+
+    def stalled(self, now=None):
+        # Отстаёт дольше STREAM_STALL_TIMEOUT — отключаем, клиент переподключится к живому потоку
+        return self.behind_since is not None and (now or time.time()) - self.behind_since > STREAM_STALL_TIMEOUT
+
+    def behind(self):
+        return self.behind_since is not None
+
+    def to_dict(self, now=None):
+        now = now or time.time()
+        return {
+            "id": self.id,
+            "cam": self.cam_id,
+            "peer": self.peer,
+            "connected": round(now - self.started, 1),
+            "fps_limit": self.fps or None,
+            "kbps_limit": round(self.bytes_per_sec * 8 / 1000) if self.bytes_per_sec else None,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "bytes": self.bytes,
+            "lag": round(self.lag, 3),
+            "max_lag": round(self.max_lag, 3),
+            "write_time": round(self.write_time, 3),
+            "behind": self.behind(),
+        }
+
+
+class StreamClients:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._ids = itertools.count(1)
+        self.disconnected = 0
+
+    def register(self, cam_id, peer=None, limits=None):
+        fps, bytes_per_sec = limits or (STREAM_MAX_FPS, STREAM_MAX_KBPS * 1000 / 8)
+        with self._lock:
+            client = StreamClient(next(self._ids), cam_id, peer, fps, bytes_per_sec)
+            self._clients[client.id] = client
+        return client
+
+    def unregister(self, client, reason=None):
+        with self._lock:
+            self._clients.pop(client.id, None)
+        if reason:
+            self.disconnected += 1
+            client.closed_reason = reason
+            STREAM_DISCONNECTS.inc(cam=client.cam_id, reason=reason)
+            logging.warning(f"Клиент {client.peer or client.id} cam{client.cam_id} отключён: {reason} "
+                            f"(задержка {client.lag:.1f} сек, пропущено кадров {client.dropped})")
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            clients = list(self._clients.values())
+        return {
+            "count": len(clients),
+            "behind": sum(1 for c in clients if c.behind()),
+            "disconnected": self.disconnected,
+            "clients": [c.to_dict(now) for c in clients],
+        }
+
+
+STREAM_CLIENTS = StreamClients()
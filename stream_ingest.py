@@ -0,0 +1,197 @@
+# stream_ingest.py
+import io
+import logging
+import threading
+import time
+
+from metrics import REGISTRY, JPEG_ENCODE_SECONDS, JPEG_BYTES
+
+try:
+    import av  # PyAV (ffmpeg): прямой приём HLS/DASH/MJPEG
+except ImportError:
+    av = None
+
+# ----------------------------------------------------------------------
+# Конфигурация
+# ----------------------------------------------------------------------
+STREAM_DISCOVERY_TIMEOUT = 15   # сек: ждём, пока плеер запросит поток
+STREAM_OPEN_TIMEOUT = 10        # сек на подключение и первый кадр
+STREAM_FRAME_TIMEOUT = 10       # сек без нового кадра — поток оборвался
+STREAM_READ_TIMEOUT = 10        # сек, таймаут чтения ffmpeg (rw_timeout) — за это время stop() дождётся закрытия
+
+INGEST_FRAMES = REGISTRY.counter(
+    "camserver_ingest_frames_total", "Кадры, декодированные из видеопотока напрямую", ("cam",))
+
+# Адрес потока из контекста iframe плеера: src у <video>, иначе последний запрос плейлиста
+# (hls.js/dash.js отдают <video> blob:-адрес), иначе MJPEG в <img>
+MEDIA_URL_JS = """
+var video = document.querySelector('video');
+var src = video && (video.currentSrc || video.src);
+if (src && src.indexOf('blob:') !== 0 && src.indexOf('data:') !== 0) return src;
+var names = performance.getEntriesByType('resource').map(function (e) { return e.name; });
+for (var i = names.length - 1; i >= 0; i--) {
+    if (/\\.(m3u8|mpd)(\\?|#|$)/i.test(names[i])) return names[i];
+}
+var img = document.querySelector('img[src*="mjpg"], img[src*="mjpeg"]');
+return img ? img.src : null;
+"""
+
+def available():
+    return av is not None
+
+# ----------------------------------------------------------------------
+# Найденный поток: адрес и то, что нужно серверу (Referer, User-Agent, cookies)
+# ----------------------------------------------------------------------
+class MediaSource:
+    def __init__(self, url, referer=None, user_agent=None, cookies=None):
+        self.url = url
+        self.referer = referer
+        self.user_agent = user_agent
+        self.cookies = cookies or []
+
+    def options(self):
+        # Опции ffmpeg для http; hls/dash передают их во все запросы сегментов
+        options = {"rw_timeout": str(int(STREAM_READ_TIMEOUT * 1_000_000))}
+        if self.referer:
+            options["referer"] = self.referer
+        if self.user_agent:
+            options["user_agent"] = self.user_agent
+        if self.cookies:
+            options["cookies"] = "".join(
+                f"{c['name']}={c['value']}; path={c.get('path', '/')}; domain={c.get('domain', '')}\n"
+                for c in self.cookies)
+        return options
+
+# ----------------------------------------------------------------------
+# Чтение потока в своём потоке: декодируются все кадры, хранится последний
+# ----------------------------------------------------------------------
+class StreamReader:
+    def __init__(self, source, cam_index):
+        self.source = source
+        self.cam_index = cam_index
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._first = threading.Event()
+        self.frame = None
+        self.seq = 0
+        self.frame_at = 0.0
+        self.error = None
+        self.container = None
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"ingest-cam{cam_index}")
+        self._thread.start()
+
+    def _run(self):
+        # Контейнер открывает и закрывает только этот поток: close() из другого потока
+        # во время чтения пакета в ffmpeg небезопасен
+        try:
+            self.container = av.open(self.source.url, options=self.source.options(),
+                                     timeout=(STREAM_OPEN_TIMEOUT, STREAM_READ_TIMEOUT))
+            if self._stopped.is_set():
+                return
+            stream = self.container.streams.video[0]
+            stream.thread_type = "AUTO"
+            for frame in self.container.decode(stream):
+                if self._stopped.is_set():
+                    break
+                with self._lock:
+                    self.frame = frame
+                    self.seq += 1
+                    self.frame_at = time.time()
+                INGEST_FRAMES.inc(cam=self.cam_index)
+                self._first.set()
+            else:
+                self.error = "поток завершился"
+        except Exception as e:
+            if not self._stopped.is_set():
+                self.error = str(e)
+                logging.warning(f"cam{self.cam_index}: ошибка видеопотока: {e}")
+        finally:
+            self._first.set()
+            if self.container is not None:
+                try:
+                    self.container.close()
+                except Exception:
+                    pass
+                self.container = None
+
+    def wait_first(self, timeout):
+        self._first.wait(timeout)
+        return self.seq > 0 and self.error is None
+
+    def latest(self):
+        with self._lock:
+            return self.frame, self.seq, self.frame_at
+
+    def alive(self):
+        return self._thread.is_alive() and self.error is None
+
+    def stop(self, wait=True):
+        # Чтение завершится на следующем кадре или по таймауту ffmpeg; контейнер и сокет
+        # закрывает поток чтения — ждём его, чтобы старое подключение не висело рядом с новым
+        self._stopped.set()
+        if wait and self._thread is not threading.current_thread():
+            self._thread.join(STREAM_READ_TIMEOUT + 1)
+            if self._thread.is_alive():
+                logging.warning(f"cam{self.cam_index}: чтение видеопотока не завершилось за {STREAM_READ_TIMEOUT} сек")
+
+# ----------------------------------------------------------------------
+# Тот же интерфейс, что у BrowserDriver: FrameCapture и CameraWorker не различают источники
+# ----------------------------------------------------------------------
+class StreamDriver:
+    def __init__(self, url, cam_index, source, quality=90):
+        self.url = url              # адрес страницы портала — для перезапуска камеры
+        self.cam_index = cam_index
+        self.source = source
+        self.driver = None
+        self.last_cropped = True    # рамки портала в потоке нет — не обрезаем
+        self.crop_x = 0
+        self.quality = quality
+        self.clip = None
+        self._jpeg = (0, None)      # (номер кадра, JPEG) — один кадр не кодируется дважды
+        self._open()
+
+    def _open(self):
+        reader = StreamReader(self.source, self.cam_index)
+        if reader.wait_first(STREAM_OPEN_TIMEOUT):
+            self.driver = reader
+            return True
+        # Не открылся за STREAM_OPEN_TIMEOUT — не ждём: переход на скриншоты не задерживается,
+        # поток чтения закроет подключение сам по таймауту ffmpeg
+        reader.stop(wait=False)
+        self.driver = None
+        return False
+
+    def get_iframe_size(self):
+        if not self.driver or not self.driver.alive():
+            return None
+        frame, _, _ = self.driver.latest()
+        if frame is None:
+            return None
+        return {"x": 0, "y": 0, "width": frame.width, "height": frame.height}
+
+    def capture_frame(self):
+        if not self.driver:
+            return None
+        frame, seq, frame_at = self.driver.latest()
+        if frame is None or time.time() - frame_at > STREAM_FRAME_TIMEOUT:
+            return None
+        if self._jpeg[0] == seq:
+            return self._jpeg[1]
+        buf = io.BytesIO()
+        with JPEG_ENCODE_SECONDS.time(path="ingest"):
+            frame.to_image().save(buf, format="JPEG", quality=self.quality)
+        JPEG_BYTES.observe(buf.tell(), path="ingest")
+        self._jpeg = (seq, buf.getvalue())
+        return self._jpeg[1]
+
+    def reload_via_url(self):
+        # Переподключение к тому же потоку; новый адрес ищет полный перезапуск камеры
+        logging.info(f"Переподключение к видеопотоку cam{self.cam_index}")
+        if self.driver:
+            self.driver.stop()
+        return self._open()
+
+    def quit(self):
+        if self.driver:
+            self.driver.stop()
+            self.driver = None
@@ -0,0 +1,37 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# web_server импортирует main, а тот при импорте открывает capture.log в текущем каталоге
+os.chdir(tempfile.mkdtemp(prefix="camserver_tests_"))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # capture/, recordings/, логи — во временном каталоге, не в репозитории
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def jpeg():
+    from PIL import Image
+    import io
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (90, 120, 150)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def cam(jpeg):
+    # Камера с одним кадром в общем FRAME_STORE; без url.yaml camera_exists смотрит на кадры
+    from frame_store import FRAME_STORE
+    cam_id = 900
+    FRAME_STORE.publish(cam_id, jpeg)
+    yield cam_id
+    FRAME_STORE.discard(cam_id)
@@ -0,0 +1,95 @@
+# tests/test_async_server.py
+import asyncio
+import threading
+import time
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+import async_server
+import web_server
+from frame_store import FRAME_STORE
+from web_server import mjpeg_part
+
+
+def run_server(handler_cancellation, scenario):
+    async def main():
+        app = async_server.create_app()
+        app[async_server.NOTIFIER] = async_server.FrameNotifier(asyncio.get_running_loop())
+        server = TestServer(app, handler_cancellation=handler_cancellation)
+        await server.start_server()
+        try:
+            async with aiohttp.ClientSession() as session:
+                return await scenario(server, session)
+        finally:
+            app[async_server.NOTIFIER].close()
+            await server.close()
+    return asyncio.run(main())
+
+# ----------------------------------------------------------------------
+# Повтор записи: отключение клиента во время чтения сегмента
+# ----------------------------------------------------------------------
+def test_replay_disconnect_waits_for_pending_read(monkeypatch):
+    reading = threading.Event()
+    closed = []
+    generators = []  # сильная ссылка: генератор закрывает обработчик, а не сборщик мусора
+
+    def fake_replay_frames(cam_id, start, end, speed, preset=None):
+        def frames():
+            try:
+                yield 0, mjpeg_part(b"\xff\xd8first\xff\xd9")
+                reading.set()
+                time.sleep(0.5)  # «чтение сегмента» в пуле потоков
+                yield 0, mjpeg_part(b"\xff\xd8second\xff\xd9")
+            finally:
+                closed.append(threading.current_thread().name)
+        generator = frames()
+        generators.append(generator)
+        return generator
+
+    monkeypatch.setattr(async_server, "replay_frames", fake_replay_frames)
+
+    async def scenario(server, session):
+        response = await session.get(server.make_url("/replay/cam1?from=-60"))
+        assert response.status == 200
+        await response.content.readuntil(b"first")
+        await asyncio.get_running_loop().run_in_executor(None, reading.wait, 2)
+        response.close()  # обрыв, пока next() ещё выполняется
+        deadline = time.time() + 3
+        while not closed and time.time() < deadline:
+            await asyncio.sleep(0.05)
+
+    run_server(True, scenario)
+    assert len(closed) == 1
+
+# ----------------------------------------------------------------------
+# Снимок: long-poll
+# ----------------------------------------------------------------------
+def test_snapshot_nan_timeout_does_not_hang(cam, monkeypatch):
+    monkeypatch.setattr(web_server, "SNAPSHOT_WAIT_TIMEOUT", 0.2)
+    etag = web_server.frame_etag(cam, FRAME_STORE.get(cam))
+
+    async def scenario(server, session):
+        url = server.make_url(f"/snapshot/cam{cam}?wait_newer_than={etag}&timeout=nan")
+        response = await asyncio.wait_for(session.get(url), 5)
+        return response.status
+
+    assert run_server(False, scenario) == 304
+
+# ----------------------------------------------------------------------
+# Поток: keep-alive для камеры со старым кадром
+# ----------------------------------------------------------------------
+def test_stream_keepalive_for_stale_camera(cam, monkeypatch):
+    monkeypatch.setattr(async_server, "KEEPALIVE_INTERVAL", 0.1)
+    FRAME_STORE.get(cam).timestamp -= 600
+
+    async def scenario(server, session):
+        response = await session.get(server.make_url(f"/stream/cam{cam}"))
+        parts = 0
+        while parts < 4:
+            await asyncio.wait_for(response.content.readuntil(b"--frame"), 2)
+            parts += 1
+        response.close()
+        return parts
+
+    assert run_server(False, scenario) == 4
@@ -0,0 +1,80 @@
+# tests/test_capture_process.py
+import pytest
+
+import capture_process
+from capture_process import FrameRing, RING_SLOTS, _SLOT
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create()
+    yield ring
+    ring.release()
+
+
+class TornBuffer(bytearray):
+    # Копия данных слота «перезаписывается» писателем прямо во время чтения
+    def __init__(self, data, on_copy):
+        super().__init__(data)
+        self.on_copy = on_copy
+
+    def __getitem__(self, key):
+        if isinstance(key, slice) and self.on_copy:
+            on_copy, self.on_copy = self.on_copy, None
+            on_copy()
+        return super().__getitem__(key)
+
+# ----------------------------------------------------------------------
+# Кольцо кадров в общей памяти
+# ----------------------------------------------------------------------
+def test_write_read_round_trip(ring):
+    assert ring.read() is None
+    assert ring.write(1, 100.5, "noconnect", b"frame-1")
+    frame = ring.read()
+    assert (frame.seq, frame.timestamp, frame.kind, frame.data) == (1, 100.5, "noconnect", b"frame-1")
+    assert ring.latest() == 1
+
+def test_overwritten_slot_is_not_returned(ring):
+    for seq in range(1, RING_SLOTS + 2):
+        ring.write(seq, float(seq), "live", b"frame-%d" % seq)
+    # Слот кадра 1 занят кадром RING_SLOTS + 1
+    assert ring.read(1) is None
+    assert ring.read(RING_SLOTS + 1).data == b"frame-%d" % (RING_SLOTS + 1)
+
+def test_slot_being_written_is_not_returned(ring):
+    ring.write(1, 1.0, "live", b"frame-1")
+    # Писатель пометил слот пустым и ещё копирует данные
+    _SLOT.pack_into(ring.buf, FrameRing._offset(1), 0, 0.0, 0, 0)
+    assert ring.read(1) is None
+
+def test_torn_read_is_discarded(ring):
+    ring.write(1, 1.0, "live", b"frame-1")
+    original = ring.buf
+    writer = FrameRing(ring.shm, False)
+
+    def overwrite():
+        writer.buf = ring.buf
+        writer.write(1 + RING_SLOTS, 2.0, "live", b"frame-X")
+
+    ring.buf = TornBuffer(original, overwrite)
+    try:
+        assert ring.read(1) is None
+        # Следующее чтение уже видит новый кадр целиком
+        assert ring.read(1 + RING_SLOTS).data == b"frame-X"
+    finally:
+        ring.buf = original
+
+def test_oversized_frame_is_skipped(ring, monkeypatch):
+    monkeypatch.setattr(capture_process, "RING_SLOT_BYTES", 4)
+    assert not ring.write(1, 1.0, "live", b"too big")
+    assert ring.read() is None
+
+def test_viewers_shared_through_header(ring):
+    other = FrameRing.attach(ring.name)
+    try:
+        ring.set_viewers(3)
+        assert other.viewers() == 3
+        ring.write(5, 5.0, "live", b"frame-5")
+        assert other.read().data == b"frame-5"
+    finally:
+        other.release()
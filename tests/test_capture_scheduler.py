@@ -0,0 +1,123 @@
+# tests/test_capture_scheduler.py
+import threading
+import time
+
+from capture_scheduler import CaptureScheduler
+
+
+def noop():
+    pass
+
+# ----------------------------------------------------------------------
+# Частота и дедлайны
+# ----------------------------------------------------------------------
+def test_target_fps_depends_on_viewers():
+    viewers = {1: 0, 2: 1}
+    scheduler = CaptureScheduler(2, active_fps=5, idle_fps=1, viewers=lambda cam_id: viewers[cam_id])
+    scheduler.add(1, noop)
+    scheduler.add(2, noop)
+    cams = scheduler._cams
+    assert scheduler.target_fps(cams[1]) == 1
+    assert scheduler.target_fps(cams[2]) == 5
+    scheduler.set_active_fps(2, 25)
+    assert scheduler.target_fps(cams[2]) == 25
+    scheduler.set_active_fps(1, 25)
+    assert scheduler.target_fps(cams[1]) == 1   # без зрителей — idle_fps
+    scheduler.set_fps(1, 10)
+    assert scheduler.target_fps(cams[1]) == 10
+
+def test_deadline_does_not_drift():
+    scheduler = CaptureScheduler(1, active_fps=5, idle_fps=2)
+    scheduler.add(1, noop)
+    cam = scheduler._cams[1]
+    assert scheduler._due(cam) == 0
+    with scheduler._cond:
+        scheduler._launch(cam, 100.0)
+    assert scheduler._due(cam) == 100.5
+    assert scheduler.wait_idle(cam, 2)
+    # Запуск чуть позже дедлайна: следующий дедлайн — от предыдущего, а не от момента запуска
+    with scheduler._cond:
+        scheduler._launch(cam, 100.6)
+    assert scheduler._due(cam) == 101.0
+    assert cam.overruns == 0
+
+def test_overrun_restarts_from_now():
+    scheduler = CaptureScheduler(1, active_fps=5, idle_fps=2)
+    scheduler.add(1, noop)
+    cam = scheduler._cams[1]
+    with scheduler._cond:
+        scheduler._launch(cam, 100.0)
+    assert scheduler.wait_idle(cam, 2)
+    # Отстали больше чем на период — не догоняем пропущенные запуски
+    with scheduler._cond:
+        scheduler._launch(cam, 102.0)
+    assert scheduler._due(cam) == 102.5
+    assert cam.overruns == 1
+
+def test_wake_makes_camera_due_now():
+    scheduler = CaptureScheduler(1, active_fps=5, idle_fps=2)
+    scheduler.add(1, noop)
+    cam = scheduler._cams[1]
+    with scheduler._cond:
+        scheduler._launch(cam, time.time())
+    scheduler.wake(1)
+    assert scheduler._due(cam) == 0
+
+# ----------------------------------------------------------------------
+# Очерёдность при занятом пуле
+# ----------------------------------------------------------------------
+def test_cameras_with_viewers_go_first():
+    order = []
+    release = threading.Event()
+
+    def task(cam_id):
+        def run():
+            order.append(cam_id)
+            release.wait(2)
+        return run
+
+    viewers = {1: 0, 2: 0, 3: 2}
+    scheduler = CaptureScheduler(1, active_fps=5, idle_fps=1, viewers=lambda cam_id: viewers[cam_id])
+    for cam_id in (1, 2, 3):
+        scheduler.add(cam_id, task(cam_id))
+    scheduler.start()
+    try:
+        deadline = time.time() + 2
+        while not order and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        # Один поток: запущена только камера со зрителями
+        assert order == [3]
+        assert scheduler.stats()["busy"] == 1
+    finally:
+        release.set()
+        for cam_id in (1, 2, 3):
+            scheduler.remove(cam_id)
+
+def test_achieved_rate_follows_target():
+    starts = []
+    scheduler = CaptureScheduler(2, active_fps=5, idle_fps=20)
+    scheduler.add(1, lambda: starts.append(time.time()))
+    scheduler.start()
+    try:
+        time.sleep(1.0)
+    finally:
+        scheduler.remove(1)
+    assert 12 <= len(starts) <= 23
+    assert scheduler.stats()["cams"] == {}
+
+def test_failing_task_frees_worker():
+    calls = []
+
+    def task():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    scheduler = CaptureScheduler(1, active_fps=5, idle_fps=20)
+    scheduler.add(1, task)
+    scheduler.start()
+    try:
+        time.sleep(0.3)
+    finally:
+        scheduler.remove(1)
+    assert len(calls) >= 3
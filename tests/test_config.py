@@ -0,0 +1,109 @@
+# tests/test_config.py
+import pytest
+
+import main
+from camera_control import CameraControl
+from main import ConfigManager
+
+
+@pytest.fixture
+def control(monkeypatch):
+    # Отдельный CameraControl: общий нужен веб-серверу в других тестах
+    control = CameraControl()
+    monkeypatch.setattr(main, "CAMERA_CONTROL", control)
+    return control
+
+
+def make_config(path, text, control):
+    path.write_text(text, encoding="utf-8")
+    config = ConfigManager(str(path))
+    for cam_id, url in config.cameras.items():
+        control.register(cam_id, url, config.settings.get(cam_id))
+    control.on_config_change = config.schedule_save
+    return config
+
+# ----------------------------------------------------------------------
+# Загрузка
+# ----------------------------------------------------------------------
+def test_load_url_list(workdir, control):
+    config = make_config(workdir / "url.yaml", "urls:\n  - http://a\n  - ''\n", control)
+    assert config.cameras == {1: "http://a", 2: None}
+    assert config.settings == {}
+
+def test_load_cameras_with_settings(workdir, control):
+    text = "cameras:\n  3: http://a\n  12: {url: http://b, interval: 1, quality: 70}\n"
+    config = make_config(workdir / "url.yaml", text, control)
+    assert config.cameras == {3: "http://a", 12: "http://b"}
+    assert config.settings == {12: {"interval": 1.0, "quality": 70}}
+
+# ----------------------------------------------------------------------
+# Перечитывание файла
+# ----------------------------------------------------------------------
+def test_reload_applies_only_changes(workdir, control):
+    path = workdir / "url.yaml"
+    config = make_config(path, "cameras:\n  1: http://a\n  2: http://b\n", control)
+    commands = []
+    control.on_command = commands.append
+
+    path.write_text("cameras:\n  1: http://a\n  2: {url: http://b2, quality: 60}\n  5: http://e\n",
+                    encoding="utf-8")
+    config.reload(config._stat())
+    assert control.urls() == {1: "http://a", 2: "http://b2", 5: "http://e"}
+    assert control.settings(2) == {"quality": 60}
+    assert commands == [2]   # URL сменился только у камеры 2
+    # Изменения из файла обратно в файл не пишутся
+    assert config._save_timer is None
+
+    path.write_text("cameras:\n  5: http://e\n", encoding="utf-8")
+    config.reload(config._stat())
+    assert control.urls() == {5: "http://e"}
+
+def test_reload_keeps_state_on_broken_file(workdir, control):
+    path = workdir / "url.yaml"
+    config = make_config(path, "urls:\n  - http://a\n", control)
+    path.write_text("urls: [http://a\n", encoding="utf-8")
+    stamp = config._stat()
+    config.reload(stamp)
+    assert control.urls() == {1: "http://a"}
+    assert config.cameras == {1: "http://a"}
+    # Битый файл не перечитывается на каждом шаге слежения
+    assert config._stamp == stamp
+
+# ----------------------------------------------------------------------
+# Запись изменений из API обратно в url.yaml
+# ----------------------------------------------------------------------
+def test_save_round_trip_keeps_comments(workdir, control):
+    path = workdir / "url.yaml"
+    config = make_config(path, "# камеры склада\nurls:\n  - http://a  # ворота\n  - http://b\n", control)
+    control.set_url(2, "http://b2")
+    control.add("http://c")
+    config.save()
+    text = path.read_text(encoding="utf-8")
+    assert "# камеры склада" in text and "# ворота" in text
+    assert ConfigManager(str(path)).cameras == {1: "http://a", 2: "http://b2", 3: "http://c"}
+    # Свою запись слежение не перечитывает
+    assert config._stamp == config._stat()
+    assert not (workdir / "url.yaml.tmp").exists()
+
+def test_save_switches_to_cameras_map(workdir, control):
+    path = workdir / "url.yaml"
+    config = make_config(path, "urls:\n  - http://a\n  - http://b\n", control)
+    control.remove(1)
+    control.set_settings(2, {"interval": 0.5, "crop": 10})
+    config.save()
+    reread = ConfigManager(str(path))
+    assert reread.cameras == {2: "http://b"}
+    assert reread.settings == {2: {"interval": 0.5, "crop": 10}}
+    assert "urls" not in reread.doc
+
+def test_api_changes_are_batched_into_one_save(workdir, control, monkeypatch):
+    path = workdir / "url.yaml"
+    config = make_config(path, "urls:\n  - http://a\n", control)
+    saves = []
+    monkeypatch.setattr(config, "save", lambda: saves.append(1))
+    control.set_url(1, "http://a2")
+    first = config._save_timer
+    control.add("http://b")
+    assert config._save_timer is first
+    first.join(2)
+    assert saves == [1]
@@ -0,0 +1,42 @@
+# tests/test_history.py
+from datetime import datetime
+from pathlib import Path
+
+import history
+from history import FrameHistory, INDEX_EXT, SEGMENT_EXT, _INDEX
+
+SEGMENT_TIME = datetime(2026, 1, 1, 12, 0, 0).timestamp()
+
+
+def write_segment(cam_id, entries, data):
+    folder = Path(history.RECORD_DIR) / f"cam{cam_id}"
+    folder.mkdir(parents=True, exist_ok=True)
+    base = folder / datetime.fromtimestamp(SEGMENT_TIME).strftime("%Y%m%d_%H%M%S")
+    Path(str(base) + INDEX_EXT).write_bytes(b"".join(_INDEX.pack(*e) for e in entries))
+    Path(str(base) + SEGMENT_EXT).write_bytes(data)
+
+# ----------------------------------------------------------------------
+# Повреждённые сегменты на диске: как отсутствующие, без исключений
+# ----------------------------------------------------------------------
+def test_empty_segment_is_treated_as_missing():
+    write_segment(1, [(SEGMENT_TIME + 1, 0, 10)], b"")
+    frames = FrameHistory()
+    assert list(frames.frames(1, SEGMENT_TIME, SEGMENT_TIME + 60)) == []
+    assert frames.frame_at(1, SEGMENT_TIME + 30) is None
+    assert not frames.has_frames(1, SEGMENT_TIME, SEGMENT_TIME + 60)
+
+def test_truncated_segment_returns_complete_frames():
+    # Второй кадр в индексе есть, а в .seg дописан не до конца; третья запись индекса оборвана
+    raw = b"".join(_INDEX.pack(*e) for e in [(SEGMENT_TIME + 1, 0, 4), (SEGMENT_TIME + 2, 4, 4)])
+    write_segment(1, [], b"abcdef")
+    folder = Path(history.RECORD_DIR) / "cam1"
+    next(folder.glob(f"*{INDEX_EXT}")).write_bytes(raw + raw[:5])
+    frames = FrameHistory()
+    assert list(frames.frames(1, SEGMENT_TIME, SEGMENT_TIME + 60)) == [(SEGMENT_TIME + 1, b"abcd")]
+    assert frames.frame_at(1, SEGMENT_TIME + 30) == (SEGMENT_TIME + 1, b"abcd")
+
+def test_snapshot_at_empty_segment_is_404(cam):
+    import web_server
+    write_segment(cam, [(SEGMENT_TIME + 1, 0, 10)], b"")
+    response = web_server.app.test_client().get(f"/snapshot/cam{cam}?at={SEGMENT_TIME + 30}")
+    assert response.status_code == 404
@@ -0,0 +1,27 @@
+# tests/test_mosaic.py
+import mosaic
+from frame_store import FRAME_STORE
+from mosaic import MosaicManager
+
+
+def test_retire_discards_composed_frame(cam):
+    manager = MosaicManager()
+    key = manager.ensure([cam])
+    assert FRAME_STORE.get(key) is not None
+    layout = manager._layouts[key]
+    layout.last_seen = 0
+    assert manager._retire(layout)
+    assert FRAME_STORE.get(key) is None
+    assert manager.stats() == {}
+
+def test_layout_limit(cam, monkeypatch):
+    monkeypatch.setattr(mosaic, "MOSAIC_MAX_LAYOUTS", 1)
+    manager = MosaicManager()
+    key = manager.ensure([cam])
+    assert manager.ensure([cam, cam]) is None
+    # Уже запущенная сборка по-прежнему доступна
+    assert manager.ensure([cam]) == key
+    layout = manager._layouts[key]
+    layout.last_seen = 0
+    manager._retire(layout)
+    assert manager.ensure([cam, cam]) is not None
@@ -0,0 +1,75 @@
+# tests/test_startup.py
+from startup import LaunchGate
+
+
+def make_gate(limit):
+    gate = LaunchGate(limit)
+    woken = []
+    gate.on_wake = woken.append
+    return gate, woken
+
+# ----------------------------------------------------------------------
+# Очередь запуска камер
+# ----------------------------------------------------------------------
+def test_limit_and_queue_order():
+    gate, _ = make_gate(2)
+    for cam_id in (1, 2, 3, 4):
+        gate.enqueue(cam_id)
+    # Очередь по времени постановки: 3 и 4 ждут, пока 1 и 2 не займут слоты
+    assert not gate.acquire(3)
+    assert gate.acquire(1)
+    assert not gate.acquire(3)
+    assert gate.acquire(2)
+    assert not gate.acquire(3)
+    assert gate.stats()["queued"] == [3, 4]
+    assert sorted(gate.stats()["launching"]) == [1, 2]
+
+def test_priority_goes_first():
+    gate, _ = make_gate(1)
+    gate.enqueue(1, priority=1)
+    gate.enqueue(2, priority=1)
+    gate.enqueue(3, priority=0)   # камера со зрителями
+    assert not gate.acquire(1)
+    assert gate.acquire(3)
+
+def test_release_wakes_launched_and_next():
+    gate, woken = make_gate(1)
+    for cam_id in (1, 2, 3):
+        gate.enqueue(cam_id)
+    assert gate.acquire(1)
+    gate.release(1)
+    # Запущенная камера — сразу за первым кадром, следующая в очереди — за слотом
+    assert woken == [1, 2]
+    assert gate.acquire(2)
+    assert gate.stats()["launches"] == 2
+
+def test_release_of_unknown_camera_only_wakes_queue():
+    gate, woken = make_gate(1)
+    gate.enqueue(5)
+    gate.release(9)
+    assert woken == [5]
+
+def test_cancel_pending_camera():
+    gate, woken = make_gate(1)
+    for cam_id in (1, 2, 3):
+        gate.enqueue(cam_id)
+    assert gate.acquire(1)
+    gate.cancel(2)
+    assert gate.stats()["queued"] == [3]
+    assert woken == []   # слот занят камерой 1 — будить некого
+    gate.release(1)
+    assert woken == [1, 3]
+    assert gate.acquire(3)
+
+def test_cancel_launching_camera_frees_slot():
+    gate, woken = make_gate(1)
+    gate.enqueue(1)
+    gate.enqueue(2)
+    assert gate.acquire(1)
+    # Камеру удалили или сменили URL во время запуска
+    gate.cancel(1)
+    assert woken == [1, 2]
+    assert gate.acquire(2)
+    # Повторная постановка уже запущенной камеры не занимает очередь
+    gate.enqueue(2)
+    assert gate.stats()["queued"] == []
@@ -0,0 +1,73 @@
+# tests/test_stream_clients.py
+import threading
+
+import pytest
+
+import stream_clients
+import web_server
+from frame_store import FRAME_STORE, Frame
+from stream_clients import StreamClient
+
+
+def make_frame(seq, timestamp):
+    return Frame(b"jpeg", seq, timestamp, "live")
+
+# ----------------------------------------------------------------------
+# Задержка и отставание клиента
+# ----------------------------------------------------------------------
+def test_old_frame_does_not_mark_new_client_behind():
+    client = StreamClient(1, 1)
+    now = client.started + 0.1
+    # Камера стоит 10 минут: кадр старый, но к клиенту ничего не копилось
+    client.record(make_frame(1, client.started - 600), 1000, now - 0.05, now)
+    assert client.lag < stream_clients.STREAM_MAX_LAG
+    assert not client.behind()
+
+def test_queued_frames_mark_client_behind_and_stall():
+    client = StreamClient(1, 1)
+    published = client.started + 1
+    now = published + stream_clients.STREAM_MAX_LAG + 1
+    client.record(make_frame(1, published), 1000, now - 0.05, now)
+    assert client.behind()
+    assert not client.stalled(now)
+    assert client.stalled(now + stream_clients.STREAM_STALL_TIMEOUT + 1)
+
+def test_caught_up_clears_behind():
+    client = StreamClient(1, 1)
+    published = client.started + 1
+    now = published + stream_clients.STREAM_MAX_LAG + 1
+    client.record(make_frame(1, published), 1000, now - 0.05, now)
+    client.caught_up()
+    assert not client.behind()
+
+def test_dropped_frames_counted_by_seq_gap():
+    client = StreamClient(1, 1)
+    now = client.started + 1
+    client.record(make_frame(3, now), 10, now, now)
+    client.record(make_frame(7, now), 10, now, now)
+    assert client.dropped == 3
+
+def test_fps_limit_delays_next_send():
+    client = StreamClient(1, 1, fps=2)
+    client.record(make_frame(1, client.started), 10, 100.0, 100.0)
+    assert client.delay(100.1) == pytest.approx(0.4)
+
+# ----------------------------------------------------------------------
+# Keep-alive для камеры со старым кадром
+# ----------------------------------------------------------------------
+def test_keepalive_continues_for_stale_camera(cam, monkeypatch):
+    monkeypatch.setattr(web_server, "KEEPALIVE_INTERVAL", 0.1)
+    FRAME_STORE.get(cam).timestamp -= 600
+    stream = web_server.generate_mjpeg(cam)
+    parts = []
+
+    def read():
+        parts.extend(next(stream) for _ in range(4))
+
+    # Без keep-alive next() ждал бы вечно — читаем в отдельном потоке с таймаутом
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    thread.join(2)
+    assert len(parts) == 4
+    assert all(part.startswith(b"--frame") for part in parts)
+    stream.close()
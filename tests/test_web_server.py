@@ -0,0 +1,57 @@
+# tests/test_web_server.py
+import threading
+
+import pytest
+
+import web_server
+from frame_store import FRAME_STORE
+
+
+@pytest.fixture
+def client():
+    return web_server.app.test_client()
+
+# ----------------------------------------------------------------------
+# Снимок: long-poll
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize("value, expected", [
+    ("nan", web_server.SNAPSHOT_WAIT_TIMEOUT),
+    ("inf", web_server.SNAPSHOT_WAIT_TIMEOUT),
+    ("-inf", web_server.SNAPSHOT_WAIT_TIMEOUT),
+    ("abc", web_server.SNAPSHOT_WAIT_TIMEOUT),
+    (None, web_server.SNAPSHOT_WAIT_TIMEOUT),
+    ("-3", 0),
+    ("1.5", 1.5),
+    ("1000", web_server.SNAPSHOT_WAIT_TIMEOUT),
+])
+def test_snapshot_wait_timeout(value, expected):
+    assert web_server.snapshot_wait_timeout(value) == expected
+
+def test_snapshot_nan_timeout_does_not_hang(client, cam, monkeypatch):
+    monkeypatch.setattr(web_server, "SNAPSHOT_WAIT_TIMEOUT", 0.2)
+    etag = web_server.frame_etag(cam, FRAME_STORE.get(cam))
+    result = {}
+
+    def fetch():
+        result["response"] = client.get(f"/snapshot/cam{cam}?wait_newer_than={etag}&timeout=nan")
+
+    thread = threading.Thread(target=fetch, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert result["response"].status_code == 304
+
+# ----------------------------------------------------------------------
+# Мозаика
+# ----------------------------------------------------------------------
+def test_mosaic_layout_rejects_unknown_cams(cam):
+    assert web_server.mosaic_layout({"cams": f"{cam}"}) == ([cam], None)
+    assert web_server.mosaic_layout({"cams": f"{cam},901"}) is None
+    assert web_server.mosaic_layout({"cams": "0"}) is None
+
+def test_mosaic_stream_unknown_cam(client, cam):
+    assert client.get("/stream/mosaic?cams=901").status_code == 400
+
+def test_mosaic_stream_layout_limit(client, cam, monkeypatch):
+    monkeypatch.setattr(web_server.MOSAIC, "ensure", lambda cams, cols=None: None)
+    assert client.get(f"/stream/mosaic?cams={cam}").status_code == 503
@@ -1,15 +1,27 @@
 # web_server.py
+import math
 import os
 import threading
 import time
-import shutil
 import flask
 import logging
 from flask import Flask, Response, render_template_string, request, jsonify
 from pathlib import Path
 from PIL import Image
 import io
-from queue import Queue
+from email.utils import formatdate
+from datetime import datetime
+
+from frame_store import FRAME_STORE, TranscodeCache
+from frame_pipeline import sniff_format, pipeline_stats
+from camera_control import CAMERA_CONTROL, SETTINGS_KEYS, normalize_settings
+from browser_pool import WARM_POOL
+from mosaic import MOSAIC, MOSAIC_MAX_CAMS
+from metrics import REGISTRY, JPEG_ENCODE_SECONDS, JPEG_BYTES, STREAM_BYTES, STREAM_FRAMES
+from history import FRAME_HISTORY
+from startup import READINESS
+from logs import setup_logging, log_stats
+from stream_clients import STREAM_CLIENTS, STREAM_STALL_TIMEOUT, client_limits, tune_socket
 
 # ----------------------------------------------------------------------
 # Импорт resource_path
@@ -24,32 +36,33 @@ except ImportError:
 # Конфигурация
 # ----------------------------------------------------------------------
 CAPTURE_ROOT = "capture"
-REFRESH_INTERVAL = 0.5
+KEEPALIVE_INTERVAL = 5  # сек, повтор последнего кадра для VLC при замёрзшей камере
+SNAPSHOT_WAIT_TIMEOUT = 25  # сек, максимум ожидания для /snapshot/camN?wait_newer_than=...
+REPLAY_MAX_SPEED = 16  # /replay/camN?speed=...
 JPEG_QUALITY = 80
+STREAM_WIDTHS = (320, 640, 1280)  # допустимые ширины ?width=..., больше — полный кадр
+STREAM_QUALITIES = (50, 70, 80, 90)  # допустимые ?quality=...
+TRANSCODE_CACHE_BYTES = 64 * 1024 * 1024
+WEB_BACKEND = "flask"  # "flask" — поток на клиента, "async" — aiohttp, корутина на клиента
 HOST = "0.0.0.0"
 PORT = 5000
 DEBUG = False
 
 # Глобальные переменные
-CAM_URLS = [None] * 9
+TRANSCODE_CACHE = TranscodeCache(TRANSCODE_CACHE_BYTES)
+BOOT_ID = format(int(time.time()), "x")  # номер кадра сбрасывается при перезапуске — ETag включает запуск
 LAST_UPDATE_TIME = 0
-URL_UPDATE_QUEUE = None
+CAPTURE_SCHEDULER = None
 
-def set_update_queue(queue: Queue):
-    global URL_UPDATE_QUEUE
-    URL_UPDATE_QUEUE = queue
-    print("[WEB] Очередь обновлений URL получена")
+def set_capture_scheduler(scheduler):
+    global CAPTURE_SCHEDULER
+    CAPTURE_SCHEDULER = scheduler
 
 # ----------------------------------------------------------------------
-# Flask + логирование
+# Flask (лог — через корневой логгер и общую очередь logs.py, без своего файла)
 # ----------------------------------------------------------------------
 app = Flask(__name__)
-
-# Логирование в файл
 if not DEBUG:
-    handler = logging.FileHandler('capture.log')
-    handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-    app.logger.addHandler(handler)
     app.logger.setLevel(logging.INFO)
 
 # ----------------------------------------------------------------------
@@ -72,9 +85,13 @@ INDEX_HTML = """
     </style>
 </head>
 <body>
-    <h1>VLC Потоки (9 камер)</h1>
+    <h1>VLC Потоки ({{ cams|length }} камер)</h1>
     <div class="grid">
-        {% for i in range(1, 10) %}
+        <div class="cam">
+            <h3>Все камеры (мозаика)</h3>
+            <a href="/stream/mosaic">http://{{ request.host }}/stream/mosaic</a>
+        </div>
+        {% for i in cams %}
         <div class="cam">
             <h3>Камера {{ i }}</h3>
             <a href="/stream/cam{{ i }}">http://{{ request.host }}/stream/cam{{ i }}</a>
@@ -88,115 +105,597 @@ INDEX_HTML = """
 # ----------------------------------------------------------------------
 # MJPEG
 # ----------------------------------------------------------------------
+def convert_to_jpeg(data):
+    # Захват уже публикует JPEG — отдаём как есть
+    if sniff_format(data) == "JPEG":
+        return data
+    try:
+        with JPEG_ENCODE_SECONDS.time(path="web"), Image.open(io.BytesIO(data)) as img:
+            img = img.convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        JPEG_BYTES.observe(buf.tell(), path="web")
+        return buf.getvalue()
+    except Exception as e:
+        app.logger.error(f"[JPEG] Ошибка: {e}")
+        return None
+
 def load_and_convert_to_jpeg(image_path):
     try:
         if not os.path.exists(image_path):
             app.logger.warning(f"Файл не найден: {image_path}")
             return None
-        with Image.open(image_path) as img:
-            img = img.convert("RGB")
-            buf = io.BytesIO()
-            img.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
-            return buf.getvalue()
+        with open(image_path, 'rb') as f:
+            return convert_to_jpeg(f.read())
     except Exception as e:
         app.logger.error(f"[JPEG] Ошибка: {e} | Файл: {image_path}")
         return None
 
-def generate_mjpeg(cam_id):
-    last_mtime = 0
-    nocam_path = resource_path(os.path.join("resource", "nocam.png"))
+_NOCAM_JPEG = None
 
-    while True:
-        path = os.path.join(CAPTURE_ROOT, f"cam{cam_id}", "current.png")
-        use_path = path
+def get_nocam_jpeg():
+    global _NOCAM_JPEG
+    if _NOCAM_JPEG is None:
+        _NOCAM_JPEG = load_and_convert_to_jpeg(resource_path(os.path.join("resource", "nocam.png")))
+    return _NOCAM_JPEG
 
-        if not os.path.exists(path):
-            use_path = nocam_path
-            if not os.path.exists(use_path):
-                time.sleep(REFRESH_INTERVAL)
-                continue
+# ----------------------------------------------------------------------
+# Камеры
+# ----------------------------------------------------------------------
+def camera_ids():
+    # Зарегистрированные камеры; без main.py (отдельный веб-сервер) — камеры с кадрами
+    return CAMERA_CONTROL.cameras() or sorted(c for c in FRAME_STORE.stats() if isinstance(c, int))
+
+def camera_exists(cam_id):
+    return CAMERA_CONTROL.exists(cam_id) or (not CAMERA_CONTROL.cameras() and FRAME_STORE.get(cam_id) is not None)
+
+# ----------------------------------------------------------------------
+# Варианты кадра: ширина/качество из фиксированного набора, LRU-кэш
+# ----------------------------------------------------------------------
+def stream_preset(args):
+    # None — полный кадр с JPEG_QUALITY (общий кэш кадра), иначе (ширина|None, качество)
+    width = quality = None
+    try:
+        if args.get('width'):
+            requested = int(args.get('width'))
+            width = next((w for w in STREAM_WIDTHS if w >= requested), None)
+        if args.get('quality'):
+            requested = int(args.get('quality'))
+            quality = min(STREAM_QUALITIES, key=lambda q: abs(q - requested))
+    except (TypeError, ValueError):
+        return None
+    if width is None and quality in (None, JPEG_QUALITY):
+        return None
+    return (width, quality or JPEG_QUALITY)
+
+def transcode_jpeg(data, width, quality):
+    try:
+        with JPEG_ENCODE_SECONDS.time(path="transcode"), Image.open(io.BytesIO(data)) as img:
+            if width and img.width > width:
+                height = max(1, round(img.height * width / img.width))
+                # JPEG декодируется сразу в уменьшенном масштабе
+                img.draft("RGB", (width, height))
+                img = img.convert("RGB").resize((width, height), Image.BILINEAR)
+            else:
+                img = img.convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=quality)
+        JPEG_BYTES.observe(buf.tell(), path="transcode")
+        return buf.getvalue()
+    except Exception as e:
+        app.logger.error(f"[JPEG] Ошибка перекодирования: {e}")
+        return None
+
+def get_variant_jpeg(cam_id, frame, preset=None):
+    _, jpeg_data = FRAME_STORE.get_jpeg(cam_id, convert_to_jpeg, frame)
+    if preset is None or not jpeg_data:
+        return jpeg_data
+    width, quality = preset
+    return TRANSCODE_CACHE.get((cam_id, frame.seq, width, quality),
+                               lambda: transcode_jpeg(jpeg_data, width, quality))
 
-        current_mtime = os.path.getmtime(use_path)
-        if current_mtime <= last_mtime:
-            time.sleep(REFRESH_INTERVAL)
-            continue
-        last_mtime = current_mtime
+def mjpeg_part(jpeg_data, cam_id=None):
+    part = (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n'
+            b'Content-Length: ' + str(len(jpeg_data)).encode() + b'\r\n\r\n' +
+            jpeg_data + b'\r\n')
+    if cam_id is not None:
+        STREAM_BYTES.inc(len(part), cam=cam_id)
+        STREAM_FRAMES.inc(cam=cam_id)
+    return part
+
+def generate_mjpeg(cam_id, preset=None, peer=None, limits=None):
+    # Клиент регистрируется при первом кадре: генератор, который так и не запустили, не утекает
+    client = STREAM_CLIENTS.register(cam_id, peer, limits)
+    FRAME_STORE.add_viewer(cam_id)
+    reason = None
+    try:
+        reason = yield from _generate_mjpeg(cam_id, preset, client)
+    finally:
+        FRAME_STORE.remove_viewer(cam_id)
+        STREAM_CLIENTS.unregister(client, reason or client.closed_reason)
+
+def _generate_mjpeg(cam_id, preset, client):
+    # Всегда самый свежий кадр: пока клиент принимает прошлый или ждёт своего лимита,
+    # промежуточные кадры пропускаются, а не копятся в очереди
+    last_seq = 0
+    jpeg_data = None
+    frame = FRAME_STORE.get(cam_id)
+
+    while True:
+        if frame is not None:
+            last_seq = frame.seq
+            new_jpeg = get_variant_jpeg(cam_id, frame, preset)
+            if new_jpeg:
+                jpeg_data = new_jpeg
+        else:
+            # frame is None после таймаута — keep-alive: повторяем последний кадр
+            client.caught_up()
+            if jpeg_data is None:
+                # Кадров ещё нет — отдаём заглушку
+                jpeg_data = get_nocam_jpeg()
 
-        jpeg_data = load_and_convert_to_jpeg(use_path)
         if jpeg_data:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n'
-                   b'Content-Length: ' + str(len(jpeg_data)).encode() + b'\r\n\r\n' +
-                   jpeg_data + b'\r\n')
+            part = mjpeg_part(jpeg_data, cam_id)
+            started = time.time()
+            try:
+                yield part
+            except GeneratorExit:
+                # Сервер закрыл поток после таймаута записи в сокет — клиент не читает
+                if time.time() - started >= STREAM_STALL_TIMEOUT:
+                    client.closed_reason = "stall"
+                raise
+            client.record(frame, len(part), started)
+            if client.stalled():
+                return "lag"
+
+        # Лимит кадров/с и полосы клиента
+        delay = client.delay()
+        if delay:
+            time.sleep(delay)
+
+        # Ждём публикации нового кадра без опроса
+        frame = FRAME_STORE.wait_newer(cam_id, last_seq, KEEPALIVE_INTERVAL)
+
+# ----------------------------------------------------------------------
+# Мозаика: /stream/mosaic?cams=1,2,5&cols=2
+# ----------------------------------------------------------------------
+def mosaic_layout(args):
+    # (камеры, столбцы) или None при ошибке в параметрах
+    try:
+        if args.get('cams'):
+            cams = [int(c) for c in args.get('cams').split(',') if c.strip()]
         else:
-            time.sleep(REFRESH_INTERVAL)
+            cams = camera_ids()[:MOSAIC_MAX_CAMS]
+        cols = int(args.get('cols')) if args.get('cols') else None
+    except (TypeError, ValueError):
+        return None
+    if not cams or len(cams) > MOSAIC_MAX_CAMS or not all(camera_exists(c) for c in cams):
+        return None
+    if cols is not None and cols < 1:
+        return None
+    return cams, cols
+
+# ----------------------------------------------------------------------
+# Снимок: ETag / условный GET / long-poll
+# ----------------------------------------------------------------------
+def frame_etag(cam_id, frame, preset=None):
+    suffix = f"-{preset[0] or 'full'}q{preset[1]}" if preset else ""
+    return f'"{BOOT_ID}-{cam_id}-{frame.seq}{suffix}"'
+
+def etag_seq(cam_id, etag):
+    # Номер кадра из ETag этого запуска; чужой/старый ETag — 0 (любой кадр новее)
+    prefix = f'"{BOOT_ID}-{cam_id}-'
+    etag = (etag or "").strip()
+    if etag.startswith(prefix) and etag.endswith('"'):
+        digits = etag[len(prefix):-1].split("-")[0]
+        if digits.isdigit():
+            return int(digits)
+    return 0
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def snapshot_response(cam_id, frame, if_none_match=None, preset=None):
+    # (код, заголовки, тело) — общий для Flask и async-сервера
+    if frame is None:
+        return 200, {"Content-Type": "image/jpeg", "Cache-Control": "no-store"}, get_nocam_jpeg() or b""
+
+    etag = frame_etag(cam_id, frame, preset)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(frame.timestamp, usegmt=True),
+        "Cache-Control": "no-cache",
+        "X-Frame-Kind": frame.kind,
+    }
+    # Совпадение — 304 без кодирования
+    if etag_matches(if_none_match, etag):
+        return 304, headers, b""
+
+    jpeg_data = get_variant_jpeg(cam_id, frame, preset)
+    if not jpeg_data:
+        return 503, {"Cache-Control": "no-store"}, b""
+    headers["Content-Type"] = "image/jpeg"
+    return 200, headers, jpeg_data
+
+def parse_time(value, default=None):
+    # unix-время, ISO 8601 (2024-05-01T12:00:00) или отрицательное число — секунд назад
+    if value is None or value == "":
+        return default
+    try:
+        number = float(value)
+        return time.time() + number if number <= 0 else number
+    except ValueError:
+        pass
+    return datetime.fromisoformat(value).timestamp()
+
+def history_snapshot_response(cam_id, at, preset=None):
+    item = FRAME_HISTORY.frame_at(cam_id, at)
+    if item is None:
+        return 404, {"Cache-Control": "no-store"}, b""
+    timestamp, jpeg_data = item
+    if preset:
+        jpeg_data = transcode_jpeg(jpeg_data, *preset)
+        if not jpeg_data:
+            return 503, {"Cache-Control": "no-store"}, b""
+    return 200, {
+        "Content-Type": "image/jpeg",
+        "Last-Modified": formatdate(timestamp, usegmt=True),
+        "X-Frame-Timestamp": f"{timestamp:.3f}",
+        "Cache-Control": "max-age=3600",
+    }, jpeg_data
+
+def snapshot_wait_timeout(value):
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        return SNAPSHOT_WAIT_TIMEOUT
+    # nan проходит через min/max как есть, и ожидание не кончается никогда
+    if not math.isfinite(timeout):
+        return SNAPSHOT_WAIT_TIMEOUT
+    return min(max(timeout, 0), SNAPSHOT_WAIT_TIMEOUT)
+
+@app.route('/snapshot/cam<int:cam_id>')
+def snapshot(cam_id):
+    if not camera_exists(cam_id):
+        return "Камера не найдена", 404
+
+    if request.args.get('at'):
+        try:
+            at = parse_time(request.args.get('at'))
+        except ValueError:
+            return "Неверный параметр at", 400
+        code, headers, body = history_snapshot_response(cam_id, at, stream_preset(request.args))
+        return Response(body, status=code, headers=headers)
+
+    frame = FRAME_STORE.get(cam_id)
+    wait_etag = request.args.get('wait_newer_than')
+    if wait_etag is not None:
+        # Long-poll: ждём кадр новее указанного ETag
+        seq = etag_seq(cam_id, wait_etag)
+        if frame is None or frame.seq <= seq:
+            newer = FRAME_STORE.wait_newer(cam_id, seq, snapshot_wait_timeout(request.args.get('timeout')))
+            frame = newer or FRAME_STORE.get(cam_id)
+
+    # Таймаут long-poll без нового кадра — тоже 304
+    if_none_match = ", ".join(filter(None, [request.headers.get('If-None-Match'), wait_etag]))
+    code, headers, body = snapshot_response(cam_id, frame, if_none_match, stream_preset(request.args))
+    return Response(body, status=code, headers=headers)
 
 # ----------------------------------------------------------------------
 # Маршруты
 # ----------------------------------------------------------------------
 @app.route('/')
 def index():
-    return render_template_string(INDEX_HTML)
+    return render_template_string(INDEX_HTML, cams=camera_ids())
 
 @app.route('/stream/cam<int:cam_id>')
 def mjpeg_stream(cam_id):
-    if cam_id < 1 or cam_id > 9:
+    if not camera_exists(cam_id):
         return "Камера не найдена", 404
+    limits = client_limits(request.args)
+    if limits is None:
+        return "Неверные fps/kbps", 400
+    tune_socket(request.environ.get('werkzeug.socket'))
     return Response(
-        generate_mjpeg(cam_id),
+        generate_mjpeg(cam_id, stream_preset(request.args), request.remote_addr, limits),
         mimetype='multipart/x-mixed-replace; boundary=frame',
         headers={'Cache-Control': 'no-cache'}
     )
 
-@app.route('/api/set_urls', methods=['POST'])
-def set_urls():
-    global CAM_URLS, LAST_UPDATE_TIME
+# ----------------------------------------------------------------------
+# Повтор записи: /replay/camN?from=...&to=...&speed=2
+# ----------------------------------------------------------------------
+def replay_range(args):
+    # (начало, конец, скорость) или None при ошибке в параметрах
+    try:
+        start = parse_time(args.get('from'), time.time() - 60)
+        end = parse_time(args.get('to'), time.time())
+        speed = min(max(float(args.get('speed') or 1), 0.1), REPLAY_MAX_SPEED)
+    except ValueError:
+        return None
+    if end < start:
+        return None
+    return start, end, speed
+
+def replay_frames(cam_id, start, end, speed, preset=None):
+    # (пауза перед кадром, часть MJPEG) с темпом исходной записи
+    previous = None
+    for timestamp, jpeg_data in FRAME_HISTORY.frames(cam_id, start, end):
+        if preset:
+            jpeg_data = transcode_jpeg(jpeg_data, *preset)
+            if not jpeg_data:
+                continue
+        delay = min((timestamp - previous) / speed, KEEPALIVE_INTERVAL) if previous else 0
+        previous = timestamp
+        # Без cam_id: повтор записи не учитывается в метриках живых потоков
+        yield max(0.0, delay), mjpeg_part(jpeg_data)
+
+def generate_replay(cam_id, start, end, speed, preset=None):
+    for delay, part in replay_frames(cam_id, start, end, speed, preset):
+        if delay:
+            time.sleep(delay)
+        yield part
+
+@app.route('/replay/cam<int:cam_id>')
+def replay(cam_id):
+    replay_args = replay_range(request.args)
+    if replay_args is None:
+        return "Неверные параметры from/to/speed", 400
+    start, end, speed = replay_args
+    if not FRAME_HISTORY.has_frames(cam_id, start, end):
+        return "Нет записи за этот период", 404
+    return Response(
+        generate_replay(cam_id, start, end, speed, stream_preset(request.args)),
+        mimetype='multipart/x-mixed-replace; boundary=frame',
+        headers={'Cache-Control': 'no-cache'}
+    )
+
+@app.route('/stream/mosaic')
+def mosaic_stream():
+    layout = mosaic_layout(request.args)
+    if layout is None:
+        return "Неверный список камер", 400
+    limits = client_limits(request.args)
+    if limits is None:
+        return "Неверные fps/kbps", 400
+    key = MOSAIC.ensure(*layout)
+    if key is None:
+        return "Слишком много мозаик, попробуйте позже", 503
+    tune_socket(request.environ.get('werkzeug.socket'))
+    return Response(
+        generate_mjpeg(key, stream_preset(request.args), request.remote_addr, limits),
+        mimetype='multipart/x-mixed-replace; boundary=frame',
+        headers={'Cache-Control': 'no-cache'}
+    )
+
+# ----------------------------------------------------------------------
+# Метрики Prometheus
+# ----------------------------------------------------------------------
+def _scheduler_fps(field):
+    if CAPTURE_SCHEDULER is None:
+        return {}
+    return {(cam_id,): info[field] for cam_id, info in CAPTURE_SCHEDULER.stats()["cams"].items()}
+
+REGISTRY.gauge("camserver_capture_fps", "Достигнутая частота захвата", ("cam",),
+               lambda: _scheduler_fps("achieved_fps"))
+REGISTRY.gauge("camserver_capture_target_fps", "Целевая частота захвата", ("cam",),
+               lambda: _scheduler_fps("target_fps"))
+REGISTRY.gauge("camserver_stream_clients", "Подключённых MJPEG-клиентов", ("cam",),
+               lambda: {(cam_id,): info["viewers"] for cam_id, info in FRAME_STORE.stats().items()})
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def stats_payload():
+    cams = FRAME_STORE.stats()
+    return {
+        "cams": {f"cam{cam_id}": info for cam_id, info in cams.items() if isinstance(cam_id, int)},
+        "encodes_total": sum(info["encodes"] for info in cams.values()),
+        "capture": CAPTURE_SCHEDULER.stats() if CAPTURE_SCHEDULER else None,
+        "pipeline": pipeline_stats(),
+        "warm_pool": WARM_POOL.stats(),
+        "transcode_cache": TRANSCODE_CACHE.stats(),
+        "mosaic": MOSAIC.stats(),
+        "history": FRAME_HISTORY.stats(),
+        "log": log_stats(),
+        "streams": STREAM_CLIENTS.stats(),
+    }
+
+@app.route('/api/stats')
+def stats():
+    return jsonify(stats_payload())
+
+def camera_status(cam_id):
+    status = CAMERA_CONTROL.status(cam_id)
+    if status is None:
+        return None
+    frame = FRAME_STORE.get(cam_id)
+    status["frame"] = {"seq": frame.seq, "kind": frame.kind, "timestamp": frame.timestamp} if frame else None
+    return status
+
+def cams_payload():
+    return {"cams": [camera_status(cam_id) for cam_id in CAMERA_CONTROL.cameras()]}
+
+def cam_payload(cam_id):
+    status = camera_status(cam_id)
+    if status is None:
+        return {"error": "Камера не найдена"}, 404
+    return status, 200
+
+def health_payload():
+    states = {}
+    for cam_id in CAMERA_CONTROL.cameras():
+        status = CAMERA_CONTROL.status(cam_id)
+        states[f"cam{cam_id}"] = status["health"] if status else None
+    return states
+
+@app.route('/api/cams', methods=['GET'])
+def list_cams():
+    return jsonify(cams_payload())
+
+@app.route('/api/health')
+def health():
+    return jsonify(health_payload())
+
+def ready_payload():
+    # /ready: 200 — все камеры запущены (живой кадр или уже переподключение), иначе 503
+    payload = READINESS.payload()
+    return payload, 200 if payload["ready"] else 503
+
+@app.route('/ready')
+def ready():
+    payload, code = ready_payload()
+    return jsonify(payload), code
+
+@app.route('/api/cams/<int:cam_id>', methods=['GET'])
+def get_cam(cam_id):
+    payload, code = cam_payload(cam_id)
+    return jsonify(payload), code
+
+def update_camera(cam_id, data):
+    # Общая логика PUT /api/cams/<N> для Flask и async-сервера: (ответ, код)
+    # url и/или настройки interval, quality, crop, priority; переданный null сбрасывает настройку
+    if not isinstance(data, dict) or not ({'url'} | set(SETTINGS_KEYS)) & set(data):
+        return {"error": "Ожидается JSON: {'url': '...', 'interval': 1, 'quality': 80, 'crop': 0}"}, 400
+    url = data.get('url') or None
+    if url is not None and not isinstance(url, str):
+        return {"error": "url должен быть строкой или null"}, 400
+    if not camera_exists(cam_id):
+        return {"error": "Камера не найдена"}, 404
+
+    settings = None
+    if set(SETTINGS_KEYS) & set(data):
+        merged = CAMERA_CONTROL.settings(cam_id)
+        merged.update({key: data[key] for key in SETTINGS_KEYS if key in data})
+        try:
+            settings = normalize_settings(merged)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+    try:
+        settings_changed = settings is not None and CAMERA_CONTROL.set_settings(cam_id, settings)
+        command = CAMERA_CONTROL.set_url(cam_id, url) if 'url' in data else None
+    except KeyError:
+        return {"error": "Камера не найдена"}, 404
+
+    logging.info(f"API запрос: cam{cam_id} → {data}")
+    if command is not None:
+        return {"status": "accepted", "command": command.to_dict()}, 202
+    if settings_changed:
+        return {"status": "updated", "cam": camera_status(cam_id)}, 200
+    return {"status": "unchanged", "cam": camera_status(cam_id)}, 200
+
+@app.route('/api/cams/<int:cam_id>', methods=['PUT'])
+def put_cam(cam_id):
+    payload, code = update_camera(cam_id, request.get_json(silent=True))
+    return jsonify(payload), code
+
+def add_camera(data):
+    # Общая логика POST /api/cams для Flask и async-сервера: (ответ, код)
+    if not isinstance(data, dict):
+        return {"error": "Ожидается JSON: {'url': '...', 'id': N}"}, 400
+    url = data.get('url') or None
+    cam_id = data.get('id')
+    if url is not None and not isinstance(url, str):
+        return {"error": "url должен быть строкой или null"}, 400
+    if cam_id is not None and (not isinstance(cam_id, int) or isinstance(cam_id, bool)):
+        return {"error": "id должен быть целым числом"}, 400
+    try:
+        settings = normalize_settings(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    try:
+        cam_id = CAMERA_CONTROL.add(url, cam_id, settings)
+    except ValueError as e:
+        return {"error": str(e)}, 409
+    logging.info(f"API запрос: добавлена cam{cam_id} → {url}")
+    return {"status": "created", "cam": camera_status(cam_id)}, 201
+
+def delete_camera(cam_id):
+    try:
+        CAMERA_CONTROL.remove(cam_id)
+    except KeyError:
+        return {"error": "Камера не найдена"}, 404
+    logging.info(f"API запрос: удалена cam{cam_id}")
+    return {"status": "removed", "cam": cam_id}, 200
+
+@app.route('/api/cams', methods=['POST'])
+def post_cam():
+    payload, code = add_camera(request.get_json(silent=True))
+    return jsonify(payload), code
+
+@app.route('/api/cams/<int:cam_id>', methods=['DELETE'])
+def del_cam(cam_id):
+    payload, code = delete_camera(cam_id)
+    return jsonify(payload), code
+
+def apply_url_list(data):
+    # Общая логика /api/set_urls для Flask и async-сервера: (ответ, код)
+    global LAST_UPDATE_TIME
     now = time.time()
     if now - LAST_UPDATE_TIME < 3:
-        return jsonify({"error": "Слишком частые запросы"}), 429
+        return {"error": "Слишком частые запросы"}, 429
 
-    try:
-        data = request.get_json()
-        if not data or 'urls' not in data:
-            return jsonify({"error": "Ожидается JSON: {'urls': [...]}"}), 400
+    if not data or 'urls' not in data:
+        return {"error": "Ожидается JSON: {'urls': [...]}"}, 400
 
-        urls = data['urls']
-        if not isinstance(urls, list) or len(urls) > 9:
-            return jsonify({"error": "urls должен быть списком до 9 элементов"}), 400
+    # Список по порядку камер (по возрастанию номера), недостающие — отключаются
+    cams = CAMERA_CONTROL.cameras()
+    urls = data['urls']
+    if not isinstance(urls, list) or len(urls) > len(cams):
+        return {"error": f"urls должен быть списком до {len(cams)} элементов"}, 400
 
-        new_urls = urls[:9] + [None] * (9 - len(urls))
-        CAM_URLS[:] = new_urls
-        LAST_UPDATE_TIME = now
+    new_urls = urls + [None] * (len(cams) - len(urls))
+    LAST_UPDATE_TIME = now
 
-        logging.info(f"API запрос: set_urls → {new_urls}")
+    logging.info(f"API запрос: set_urls → {new_urls}")
 
-        if URL_UPDATE_QUEUE is not None:
-            for i, url in enumerate(new_urls):
-                URL_UPDATE_QUEUE.put((i + 1, url))
-            print(f"[API] Отправлено 9 отдельных обновлений URL")
+    # Команды получают только камеры, у которых URL действительно изменился
+    commands = []
+    for cam_id, url in zip(cams, new_urls):
+        try:
+            command = CAMERA_CONTROL.set_url(cam_id, url or None)
+        except KeyError:
+            continue  # камеру удалили во время запроса
+        if command:
+            commands.append(command.to_dict())
+    print(f"[API] Отправлено обновлений URL: {len(commands)}")
 
-        return jsonify({
-            "status": "ok",
-            "updated": [f"cam{i+1}" for i, u in enumerate(new_urls) if u]
-        }), 200
+    return {
+        "status": "ok",
+        "updated": [f"cam{cam_id}" for cam_id, u in zip(cams, new_urls) if u],
+        "changed": commands,
+    }, 200
 
+@app.route('/api/set_urls', methods=['POST'])
+def set_urls():
+    try:
+        payload, code = apply_url_list(request.get_json())
+        return jsonify(payload), code
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/shutdown')
-def shutdown():
+def publish_shutdown_placeholders():
     nocam_path = resource_path(os.path.join("resource", "nocam.png"))
     if os.path.exists(nocam_path):
-        for cam_id in range(1, 10):
-            target = os.path.join(CAPTURE_ROOT, f"cam{cam_id}", "current.png")
+        with open(nocam_path, 'rb') as f:
+            nocam_data = f.read()
+        for cam_id in camera_ids():
             try:
-                if os.path.exists(os.path.dirname(target)):
-                    shutil.copy2(nocam_path, target)
-                    os.utime(target, None)  # ← ГАРАНТИЯ mtime
-                    app.logger.info(f"[SHUTDOWN] Заглушка -> cam{cam_id}")
+                FRAME_STORE.publish(cam_id, nocam_data, kind="nocam")
+                app.logger.info(f"[SHUTDOWN] Заглушка -> cam{cam_id}")
             except Exception as e:
                 app.logger.error(f"[SHUTDOWN] Ошибка: {e}")
 
+@app.route('/shutdown')
+def shutdown():
+    publish_shutdown_placeholders()
+
     # Даём генератору отправить кадр
     time.sleep(2)
 
@@ -209,18 +708,29 @@ def shutdown():
 # Запуск
 # ----------------------------------------------------------------------
 def run_server():
-    print(f"[WEB] VLC-потоки: http://localhost:{PORT}/stream/cam1 ... /stream/cam9")
+    print(f"[WEB] VLC-потоки: http://localhost:{PORT}/stream/cam<N>")
+    print(f"[WEB] Мозаика: http://localhost:{PORT}/stream/mosaic")
+    print(f"[WEB] Запись: http://localhost:{PORT}/replay/cam<N>?from=-60, /snapshot/cam<N>?at=...")
     print(f"[WEB] API: POST http://localhost:{PORT}/api/set_urls")
+    print(f"[WEB] API: GET/PUT/DELETE http://localhost:{PORT}/api/cams/<N>, POST /api/cams")
     print(f"[WEB] Завершение: http://localhost:{PORT}/shutdown")
     app.run(host=HOST, port=PORT, debug=DEBUG, threaded=True, use_reloader=False)
 
 def start_web_server():
-    thread = threading.Thread(target=run_server, daemon=True)
+    target = run_server
+    if WEB_BACKEND == "async":
+        try:
+            from async_server import run_async_server
+            target = run_async_server
+        except ImportError as e:
+            logging.error(f"async-сервер недоступен ({e}), используется Flask")
+    thread = threading.Thread(target=target, daemon=True)
     thread.start()
     time.sleep(1)
     return thread
 
 if __name__ == "__main__":
+    setup_logging()
     start_web_server()
     try:
         while True: time.sleep(1)